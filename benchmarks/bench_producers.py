@@ -0,0 +1,107 @@
+"""
+Random fill throughput of the pattern producers
+===============================================
+
+Aggregate bytes per second of random data given to concurrent writers,
+generated on the writing threads as the overwrite engine does without
+producers, and by the pattern producers with 1 to N processes. Nothing
+is written to disk, the writers only consume the buffers.
+
+Usage, with the package installed:
+
+    python benchmarks/bench_producers.py --writers 16 --seconds 5
+"""
+import argparse
+import os
+import threading
+import time
+
+from usody_sanitize import buffers
+from usody_sanitize.engine import _ring_chunks
+from usody_sanitize.producers import PatternProducers
+
+CHUNK_SIZE = 4 * 1024 * 1024
+
+
+def consume(chunks, deadline: float, totals: list) -> None:
+    consumed = 0
+    for view in chunks:
+        # Touch the chunk like a write would read it.
+        view[0]
+        consumed += len(view)
+        if time.monotonic() > deadline:
+            break
+    chunks.close()
+    totals.append(consumed)
+
+
+def threads_chunks(lease: buffers.Lease):
+    while True:
+        view = lease.get()
+        view[:] = os.urandom(len(view))
+        yield view
+
+
+def threads_fill(writers: int, seconds: float) -> float:
+    pool = buffers.BufferPool(budget=writers * CHUNK_SIZE,
+                              min_size=CHUNK_SIZE)
+    totals = []
+    deadline = time.monotonic() + seconds
+
+    def run():
+        with pool.lease(CHUNK_SIZE) as lease:
+            consume(threads_chunks(lease), deadline, totals)
+
+    return measure(run, writers, totals, seconds)
+
+
+def producers_fill(processes: int, writers: int, seconds: float) -> float:
+    producers = PatternProducers(
+        processes, size=writers * 4 * CHUNK_SIZE, slot_size=CHUNK_SIZE)
+    producers.start()
+    totals = []
+    deadline = time.monotonic() + seconds
+    cancelled = threading.Event()
+
+    def run():
+        # The arena has room for the rings of all the writers.
+        with producers.ring() as ring:
+            consume(_ring_chunks(ring, cancelled), deadline, totals)
+
+    try:
+        return measure(run, writers, totals, seconds)
+    finally:
+        producers.stop()
+
+
+def measure(run, writers: int, totals: list, seconds: float) -> float:
+    threads = [threading.Thread(target=run) for _ in range(writers)]
+    start = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(totals) / (time.monotonic() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument('--writers', type=int, default=16)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--max-processes', type=int,
+                        default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    print(f"{args.writers} writers, chunks of {CHUNK_SIZE} bytes.")
+    print(f"{'generator':>20} {'MB/s':>10}")
+    rate = threads_fill(args.writers, args.seconds)
+    print(f"{'writing threads':>20} {rate / 1000 ** 2:>10.0f}")
+    processes = 1
+    while processes <= args.max_processes:
+        rate = producers_fill(processes, args.writers, args.seconds)
+        print(f"{f'{processes} producers':>20} {rate / 1000 ** 2:>10.0f}")
+        processes *= 2
+
+
+if __name__ == '__main__':
+    main()
@@ -35,6 +35,18 @@ LSBLK = b"""{
 }
 """
 
+# Mock `nvme id-ctrl /dev/nvme0nX_fake --output-format=json` command, the
+# controller only supports the format with user data erase.
+NVME_ID_CTRL = b"""{
+  "vid": 5197,
+  "sn": "S3EWNX0K216135N",
+  "mn": "Samsung SSD 960 PRO 512GB",
+  "oacs": 6,
+  "fna": 0,
+  "sanicap": 0
+}
+"""
+
 FIRST_READ_BLOCK_stdout = b"""000000000000000000000000000000000000000000000000000000000000
 000000000000000000000000000000000000000000000000000000000000
 000000000000000000000000000000000000000000000000000000000000
@@ -108,6 +120,7 @@ WRITE_BLOCK_stderr = b"""1+0 records in
 def subprocess_run():
     yield MagicMock(stdout=SMARTCTL)
     yield MagicMock(stdout=LSBLK)
+    yield MagicMock(stdout=NVME_ID_CTRL)
     assert False, ("`read_lsblk_and_smartctl_generator` has been called more"
                    " times than expected")
 
@@ -106,9 +106,36 @@ WRITE_BLOCK_STDERR = b"""1+0 records in
 512 bytes copied, 0.000158826 s, 3.2 MB/s"""
 
 
+# Mock `hdparm -I /dev/sdX_fake` command, the disk has no sanitize
+# feature set.
+HDPARM_IDENTIFY = b"""
+/dev/sdX_fake:
+
+ATA device, with non-removable media
+\tModel Number:       WDC WD3200BEVT-22A23T0
+\tSerial Number:      WD-WXE1A40V9447
+Commands/features:
+\tEnabled\tSupported:
+\t   *\tSMART feature set
+\t    \tSecurity Mode feature set
+\t   *\tPower Management feature set
+\t   *\tWrite cache
+Security:
+\tMaster password revision code = 65534
+\t\tsupported
+\tnot\tenabled
+\tnot\tlocked
+\t\tfrozen
+\tnot\texpired: security count
+\t\tsupported: enhanced erase
+\t84min for SECURITY ERASE UNIT. 84min for ENHANCED SECURITY ERASE UNIT.
+"""
+
+
 def subprocess_run():
     yield MagicMock(stdout=SMARTCTL)
     yield MagicMock(stdout=LSBLK)
+    yield MagicMock(stdout=HDPARM_IDENTIFY)
     assert False, "`subprocess_run` has been called more times than expected"
 
 
@@ -0,0 +1,134 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from usody_sanitize import ata, schemas, steps
+
+FROZEN_IDENTIFY = """
+/dev/sda:
+
+ATA device, with non-removable media
+Commands/features:
+\tEnabled\tSupported:
+\t    \tSecurity Mode feature set
+Security:
+\t\tsupported
+\tnot\tenabled
+\tnot\tlocked
+\t\tfrozen
+\t\tsupported: enhanced erase
+\t84min for SECURITY ERASE UNIT. 84min for ENHANCED SECURITY ERASE UNIT.
+"""
+
+SANITIZE_IDENTIFY = """
+/dev/sdb:
+
+ATA device, with non-removable media
+Commands/features:
+\tEnabled\tSupported:
+\t   *\tSANITIZE feature set
+\t   *\tCRYPTO SCRAMBLE EXT command
+\t   *\tBLOCK ERASE EXT command
+Security:
+\t\tsupported
+\tnot\tenabled
+\tnot\tlocked
+\tnot\tfrozen
+\t\tsupported: enhanced erase
+\t2min for SECURITY ERASE UNIT. 2min for ENHANCED SECURITY ERASE UNIT.
+"""
+
+LARGE_HDD_IDENTIFY = """
+/dev/sdc:
+
+ATA device, with non-removable media
+Security:
+\t\tsupported
+\tnot\tenabled
+\tnot\tlocked
+\tnot\tfrozen
+\t\tsupported: enhanced erase
+\tmore than 508min for SECURITY ERASE UNIT. more than 508min for ENHANCED SECURITY ERASE UNIT.
+"""
+
+
+class TestAtaActions(unittest.TestCase):
+
+    def test_parse_identify(self):
+        capabilities = ata.parse_identify(FROZEN_IDENTIFY)
+        self.assertTrue(capabilities.security)
+        self.assertTrue(capabilities.frozen)
+        self.assertFalse(capabilities.sanitize)
+        self.assertEqual(84 * 60, capabilities.enhanced_erase_time)
+        # Frozen security and no sanitize, nothing can be used.
+        self.assertEqual([], ata.plan_actions(capabilities))
+        self.assertIsNone(ata.parse_identify(""))
+
+    def test_plan_by_estimates(self):
+        capabilities = ata.parse_identify(SANITIZE_IDENTIFY)
+        self.assertFalse(capabilities.frozen)
+        self.assertEqual(
+            [ata.SANITIZE_CRYPTO, ata.SECURITY_ERASE_ENHANCED,
+             ata.SANITIZE_BLOCK, ata.SECURITY_ERASE],
+            ata.plan_actions(capabilities))
+
+    def test_parse_sanitize_status(self):
+        status = ata.parse_sanitize_status(
+            "Sanitize status:\n"
+            "    State:    SD2 Sanitize operation In Process\n"
+            "    Progress: 0x4000 (25%)\n")
+        self.assertEqual(ata.STATE_IN_PROCESS, status['state'])
+        self.assertEqual(0x4000, status['progress'])
+
+    def test_capped_estimates(self):
+        capabilities = ata.parse_identify(LARGE_HDD_IDENTIFY)
+        self.assertEqual(508 * 60, capabilities.security_erase_time)
+        self.assertTrue(capabilities.security_erase_time_capped)
+        self.assertTrue(capabilities.enhanced_erase_time_capped)
+        # The erase may take longer than any timeout from the estimate.
+        self.assertIsNone(ata.timeout(capabilities, ata.SECURITY_ERASE))
+        self.assertIsNone(
+            ata.timeout(capabilities, ata.SECURITY_ERASE_ENHANCED))
+
+        capabilities = ata.parse_identify(SANITIZE_IDENTIFY)
+        self.assertFalse(capabilities.security_erase_time_capped)
+        self.assertEqual(ata.settings.ata_min_timeout,
+                         ata.timeout(capabilities, ata.SECURITY_ERASE))
+
+    def test_no_action_after_a_security_erase(self):
+        executed = []
+
+        async def erasure_command(command):
+            executed.append(command)
+            failed = "--security-erase-enhanced" in command
+            return schemas.Exec(command=command, stdout="not\tfrozen",
+                                return_code=1 if failed else 0,
+                                success=not failed)
+
+        with mock.patch.object(ata.commands, "erasure_command",
+                               erasure_command):
+            step = asyncio.run(steps.erase_ssd_hdparm(
+                "/dev/sdc", ata.parse_identify(LARGE_HDD_IDENTIFY)))
+
+        self.assertFalse(step.success)
+        self.assertEqual(1, sum("--security-erase" in c for c in executed))
+
+    def test_security_erase_timeout(self):
+        async def erasure_command(command):
+            if "--security-erase" in command:
+                await asyncio.sleep(60)
+            return schemas.Exec(command=command, stdout="not\tfrozen",
+                                return_code=0, success=True)
+
+        step_commands = []
+        with mock.patch.object(ata.commands, "erasure_command",
+                               erasure_command):
+            success = asyncio.run(ata.security_erase(
+                "/dev/sda", step_commands, timeout_seconds=0.05))
+
+        self.assertFalse(success)
+        self.assertFalse(step_commands[-1].success)
+        self.assertIn("--security-erase", step_commands[-1].command)
+        self.assertIn("timed out", step_commands[-1].description)
+        self.assertIn("does not abort", step_commands[-1].description)
+
@@ -0,0 +1,74 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from usody_sanitize import blkdev, steps
+
+
+class TestBlockDevice(unittest.TestCase):
+
+    def test_queue_capabilities(self):
+        with tempfile.TemporaryDirectory() as sys_block:
+            queue = Path(sys_block) / "sda" / "queue"
+            queue.mkdir(parents=True)
+            (queue / "logical_block_size").write_text("512\n")
+            (queue / "discard_max_bytes").write_text("2147450880\n")
+            (queue / "write_zeroes_max_bytes").write_text("0\n")
+            (queue / "zoned").write_text("host-managed\n")
+            (queue / "nr_zones").write_text("not a number\n")
+
+            capabilities = blkdev.get_queue_capabilities(
+                "/dev/sda", sys_block=sys_block)
+
+        self.assertEqual(512, capabilities.logical_block_size)
+        self.assertTrue(capabilities.discard)
+        self.assertFalse(capabilities.write_zeroes)
+        self.assertTrue(capabilities.is_zoned)
+        # Missing and invalid values keep their defaults.
+        self.assertEqual(0, capabilities.nr_zones)
+        self.assertEqual(0, capabilities.discard_granularity)
+
+    def test_ranges(self):
+        ranges = []
+
+        def ioctl(fd, request, arg):
+            self.assertEqual(blkdev.BLKZEROOUT, request)
+            ranges.append(blkdev.struct.unpack("QQ", arg))
+
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(bytes(2500))
+            fh.flush()
+            operation = blkdev.RangeOperation(
+                fh.name, "blkzeroout", range_size=1000)
+            with mock.patch.object(blkdev.fcntl, "ioctl", ioctl):
+                self.assertTrue(asyncio.run(operation.run()))
+
+        self.assertEqual([(0, 1000), (1000, 1000), (2000, 500)], ranges)
+        self.assertEqual(2500, operation.bytes_done)
+
+    def test_unsupported_operation(self):
+        def ioctl(fd, request, arg):
+            raise OSError(95, "Operation not supported")
+
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(bytes(2500))
+            fh.flush()
+            operation = blkdev.RangeOperation(
+                fh.name, "blksecdiscard", range_size=1000)
+            with mock.patch.object(blkdev.fcntl, "ioctl", ioctl):
+                self.assertFalse(asyncio.run(operation.run()))
+
+        self.assertEqual(0, operation.bytes_done)
+        self.assertIn("not supported", operation.error)
+
+    def test_erasure_tools(self):
+        # A plain discard leaves the data readable, it is not a tool.
+        self.assertNotIn("blkdiscard", steps.TOOLS)
+        self.assertIn("blksecdiscard", steps.TOOLS)
+        self.assertIn("blkzeroout", steps.TOOLS)
+
+
+if __name__ == '__main__':
+    unittest.main()
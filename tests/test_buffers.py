@@ -0,0 +1,64 @@
+import threading
+import unittest
+
+from usody_sanitize.buffers import BufferPool
+
+MIN_SIZE = 64 * 1024
+
+
+class TestBufferPool(unittest.TestCase):
+
+    def test_chunk_size_shrinks_with_leases(self):
+        pool = BufferPool(budget=8 * MIN_SIZE, min_size=MIN_SIZE)
+        with pool.lease(8 * MIN_SIZE) as first:
+            self.assertEqual(8 * MIN_SIZE, len(first.get()))
+            with pool.lease(8 * MIN_SIZE) as second:
+                with pool.lease(8 * MIN_SIZE) as third:
+                    # The first lease swaps its buffer on its next chunk.
+                    self.assertEqual(2 * MIN_SIZE, len(first.get()))
+                    self.assertEqual(2 * MIN_SIZE, len(second.get()))
+                    self.assertEqual(2 * MIN_SIZE, len(third.get()))
+                    self.assertLessEqual(pool.allocated, pool.budget)
+        self.assertEqual(0, pool.leases)
+
+    def test_buffers_are_reused(self):
+        pool = BufferPool(budget=4 * MIN_SIZE, min_size=MIN_SIZE)
+        with pool.lease(MIN_SIZE) as lease:
+            view = lease.get()
+            self.assertIs(view, lease.get())
+            first = view.obj
+        with pool.lease(MIN_SIZE) as lease:
+            self.assertIs(first, lease.get().obj)
+        self.assertEqual(MIN_SIZE, pool.allocated)
+
+    def test_waits_for_the_budget(self):
+        pool = BufferPool(budget=MIN_SIZE, min_size=MIN_SIZE)
+        leased = threading.Event()
+
+        def lease_buffer():
+            with pool.lease(MIN_SIZE) as lease:
+                lease.get()
+                leased.set()
+
+        with pool.lease(MIN_SIZE) as lease:
+            lease.get()
+            thread = threading.Thread(target=lease_buffer)
+            thread.start()
+            self.assertFalse(leased.wait(0.2))
+        thread.join(5)
+        self.assertTrue(leased.is_set())
+        self.assertEqual(MIN_SIZE, pool.allocated)
+
+    def test_cancelled_while_waiting(self):
+        pool = BufferPool(budget=MIN_SIZE, min_size=MIN_SIZE)
+        cancelled = threading.Event()
+        cancelled.set()
+        with pool.lease(MIN_SIZE) as lease:
+            lease.get()
+            with pool.lease(MIN_SIZE, cancelled) as waiting:
+                self.assertIsNone(waiting.get())
+        self.assertEqual(0, pool.leases)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import contextlib
+import io
+import os
+import signal
+import unittest
+
+from usody_sanitize import cmd_client
+
+
+class TestRunCoroutine(unittest.TestCase):
+
+    def test_signals_cancel_the_erasures(self):
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            cancelled = []
+
+            async def erasure():
+                asyncio.get_running_loop().call_later(
+                    0.05, os.kill, os.getpid(), signum)
+                try:
+                    await asyncio.sleep(60)
+                except asyncio.CancelledError:
+                    cancelled.append(signum)
+                    raise
+
+            with self.assertRaises(SystemExit):
+                cmd_client.run_coroutine(erasure())
+            self.assertEqual([signum], cancelled)
+
+
+class TestParseArgs(unittest.TestCase):
+
+    def test_history_subcommand(self):
+        args = cmd_client.parse_args(
+            ["-o", "/var/lib/sanitize", "history", "--serial", "A1"])
+        self.assertEqual("history", args.command)
+        self.assertEqual("A1", args.serial)
+        self.assertEqual("/var/lib/sanitize", args.output)
+
+        args = cmd_client.parse_args(["history", "--database", "jobs.db"])
+        self.assertEqual("jobs.db", args.database)
+        self.assertEqual(".", args.output)
+
+    def test_erasure_needs_disks(self):
+        self.assertEqual(["/dev/sda"],
+                         cmd_client.parse_args(["-d", "/dev/sda"]).device)
+        with self.assertRaises(SystemExit), \
+                contextlib.redirect_stderr(io.StringIO()):
+            cmd_client.parse_args(["-m", "BASIC"])
+
+
+if __name__ == '__main__':
+    unittest.main()
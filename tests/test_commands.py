@@ -0,0 +1,76 @@
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+from usody_sanitize import commands
+
+# Keeps the CPU busy and writing to disk for a second.
+BUSY_WRITER = """
+import os, sys, time
+with open(sys.argv[1], "wb") as fh:
+    deadline = time.monotonic() + 1
+    while time.monotonic() < deadline:
+        sum(range(100000))
+        fh.write(os.urandom(64 * 1024))
+        fh.flush()
+        os.fsync(fh.fileno())
+"""
+
+
+class TestResourceMonitor(unittest.TestCase):
+
+    def test_usage_of_a_command(self):
+        # Next to the tests, /tmp may not be backed by a disk.
+        with tempfile.NamedTemporaryFile() as script, \
+                tempfile.NamedTemporaryFile(
+                    dir=os.path.dirname(__file__)) as output:
+            script.write(BUSY_WRITER.encode())
+            script.flush()
+            cmd = asyncio.run(commands.erasure_command(
+                f"{sys.executable} {script.name} {output.name}"))
+
+        self.assertTrue(cmd.success)
+        usage = cmd.resource_usage
+        self.assertGreater(usage.cpu_user_time, 0)
+        self.assertGreater(usage.write_bytes, 0)
+        self.assertGreater(usage.max_rss, 0)
+        # The first samples are taken more often.
+        self.assertGreater(usage.samples, 3)
+
+    def test_cancel_kills_the_pipeline(self):
+        def running(argument):
+            for pid in os.listdir("/proc"):
+                try:
+                    with open(f"/proc/{pid}/cmdline", "rb") as _fh:
+                        cmdline = _fh.read().split(b"\0")
+                    with open(f"/proc/{pid}/stat") as _fh:
+                        state = _fh.read().rsplit(")", 1)[1].split()[0]
+                except (OSError, ValueError, IndexError):
+                    continue
+                if argument.encode() in cmdline and state != "Z":
+                    return True
+            return False
+
+        async def run():
+            task = asyncio.ensure_future(commands.erasure_command(
+                "sleep 61.25 | sleep 62.25"))
+            await asyncio.sleep(0.5)
+            self.assertTrue(running("61.25"))
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+        deadline = time.monotonic() + 5
+        while (running("61.25") or running("62.25")) \
+                and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertFalse(running("61.25"))
+        self.assertFalse(running("62.25"))
+
+
+if __name__ == '__main__':
+    unittest.main()
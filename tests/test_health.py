@@ -0,0 +1,62 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from usody_sanitize import health
+
+
+def ata_smart(reallocated=0, pending=0, crc_errors=0, passed=True):
+    return {
+        'smart_status': {'passed': passed},
+        'ata_smart_attributes': {'table': [
+            {'id': 5, 'raw': {'value': reallocated}},
+            {'id': 9, 'raw': {'value': 12000}},
+            {'id': 197, 'raw': {'value': pending}},
+            {'id': 199, 'raw': {'value': crc_errors}},
+        ]},
+    }
+
+
+class TestHealth(unittest.TestCase):
+
+    def test_parse_counters(self):
+        sample = health.parse_counters(ata_smart(reallocated=8, pending=2))
+        self.assertEqual((8, 2, 0, None, True),
+                         (sample.reallocated, sample.pending,
+                          sample.crc_errors, sample.media_errors,
+                          sample.passed))
+
+        sample = health.parse_counters(
+            {'nvme_smart_health_information_log': {'media_errors': 3}})
+        self.assertEqual(3, sample.media_errors)
+        self.assertIsNone(sample.reallocated)
+
+        sample = health.parse_counters({'scsi_grown_defect_list': 7})
+        self.assertEqual(7, sample.reallocated)
+
+    def test_check_thresholds(self):
+        baseline = health.parse_counters(ata_smart(reallocated=100))
+
+        self.assertIsNone(health.check(
+            baseline, health.parse_counters(ata_smart(reallocated=105))))
+        self.assertIn("reallocated", health.check(
+            baseline, health.parse_counters(ata_smart(reallocated=110))))
+        self.assertIn("self-assessment", health.check(
+            baseline, health.parse_counters(ata_smart(passed=False))))
+
+    def test_monitor_aborts(self):
+        polls = iter([{}, ata_smart(pending=1), ata_smart(pending=40)])
+
+        async def read_smart(dev_path):
+            return next(polls)
+
+        monitor = health.HealthMonitor("/dev/sda", ata_smart(), interval=0)
+        with mock.patch.object(health, 'read_smart', read_smart):
+            reason = asyncio.run(monitor.run())
+
+        self.assertIn("pending grew from 0 to 40", reason)
+        self.assertEqual([0, 1, 40], [s.pending for s in monitor.samples])
+
+
+if __name__ == '__main__':
+    unittest.main()
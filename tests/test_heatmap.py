@@ -0,0 +1,69 @@
+import asyncio
+import os
+import tempfile
+import unittest
+
+from usody_sanitize import steps
+from usody_sanitize.heatmap import RegionHistogram
+
+MiB = 1024 * 1024
+
+
+def hdd_throughput(region: int) -> float:
+    """Outer tracks are twice as fast as the inner ones."""
+    return 200 * MiB - region * MiB
+
+
+class TestRegionHistogram(unittest.TestCase):
+
+    def _write_disk(self, histogram, throughput):
+        for region in range(histogram.buckets):
+            histogram.record(region * histogram.bucket_size,
+                             histogram.bucket_size,
+                             histogram.bucket_size / throughput(region))
+
+    def test_healthy_hdd(self):
+        histogram = RegionHistogram(size=100 * 64 * MiB, buckets=100)
+        self._write_disk(histogram, hdd_throughput)
+
+        summary = histogram.summary()
+        self.assertFalse(summary.degraded)
+        self.assertEqual(100, len(summary.throughput))
+        self.assertEqual(200 * MiB, summary.throughput[0])
+
+    def test_slow_band(self):
+        histogram = RegionHistogram(size=100 * 64 * MiB, buckets=100)
+        self._write_disk(
+            histogram,
+            lambda r: hdd_throughput(r) / (3 if 40 <= r < 45 else 1))
+
+        summary = histogram.summary()
+        self.assertTrue(summary.degraded)
+        self.assertEqual([40, 41, 42, 43, 44], summary.degraded_regions)
+
+    def test_writes_across_regions(self):
+        histogram = RegionHistogram(size=1000, buckets=10)
+        histogram.record(offset=50, nbytes=200, seconds=2)
+
+        self.assertEqual([100, 100, 100, None], histogram.throughput()[:4])
+        self.assertEqual([50, 100, 50, 0], histogram._bytes[:4])
+
+    def test_without_data(self):
+        self.assertIsNone(RegionHistogram().summary())
+
+
+class TestNativeOverwrite(unittest.TestCase):
+
+    def test_overwrite_file(self):
+        with tempfile.NamedTemporaryFile() as _fh:
+            _fh.write(b"\x01" * 8 * MiB)
+            _fh.flush()
+
+            step = asyncio.run(steps.erase_native(_fh.name, pattern="zeros"))
+
+            self.assertTrue(step.success)
+            self.assertEqual(0, step.commands[0].return_code)
+            self.assertIsNotNone(step.heatmap)
+            with open(_fh.name, 'rb') as _check:
+                self.assertEqual(bytes(8 * MiB), _check.read())
+            self.assertEqual(8 * MiB, os.path.getsize(_fh.name))
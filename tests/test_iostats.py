@@ -0,0 +1,84 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from usody_sanitize import iostats
+
+MiB = 1024 * 1024
+
+
+class TestDiskStatsSampler(unittest.TestCase):
+
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.sys_block = Path(self._tmp.name)
+        (self.sys_block / "sda").mkdir()
+
+    def tearDown(self):
+        self._tmp.cleanup()
+
+    def _sample(self, sampler, now, write_ios, write_sectors, write_ticks,
+                time_in_queue, inflight):
+        stat = [0] * 17
+        stat[4], stat[6], stat[7], stat[10] = \
+            write_ios, write_sectors, write_ticks, time_in_queue
+        (self.sys_block / "sda" / "stat").write_text(
+            " ".join(str(v) for v in stat))
+        (self.sys_block / "sda" / "inflight").write_text(f"0 {inflight}")
+        with mock.patch.object(iostats.time, "time", return_value=now):
+            sampler.sample()
+
+    def test_summary(self):
+        sampler = iostats.DiskStatsSampler(
+            "/dev/sda", interval=1, sys_block=self.sys_block)
+        self.assertIsNone(sampler.summary())
+        # 1 MiB in 100 requests of 5 ms with 2 in the queue, then 2 MiB
+        # in 200 requests of 3 ms with 4 in the queue.
+        self._sample(sampler, 100, 0, 0, 0, 0, 3)
+        self._sample(sampler, 101, 100, 2048, 500, 2000, 7)
+        self._sample(sampler, 102, 300, 6144, 1100, 6000, 1)
+
+        summary = sampler.summary()
+        self.assertEqual(2, summary.duration)
+        self.assertEqual(3 * MiB, summary.write_bytes)
+        self.assertEqual(0, summary.read_bytes)
+        self.assertEqual(300, summary.write_ios)
+        self.assertEqual(1.5 * MiB, summary.throughput)
+        self.assertEqual(150, summary.iops)
+        self.assertAlmostEqual(1100 / 300, summary.avg_latency)
+        self.assertEqual(5, summary.peak_latency)
+        self.assertEqual(3, summary.avg_queue_depth)
+        self.assertEqual(7, summary.peak_queue_depth)
+        self.assertEqual([[1, MiB, 100, 5, 2], [2, 2 * MiB, 200, 3, 4]],
+                         summary.series)
+
+    def test_downsampling(self):
+        sampler = iostats.DiskStatsSampler(
+            "/dev/sda", interval=1, max_points=4, sys_block=self.sys_block)
+        for i in range(21):
+            self._sample(sampler, i, 10 * i, 2048 * i, 20 * i, 1000 * i, 1)
+            self.assertLessEqual(len(sampler._samples), 2 * 4 + 1)
+
+        summary = sampler.summary()
+        # The counters are cumulative, the totals are exact.
+        self.assertEqual(20, summary.duration)
+        self.assertEqual(20 * MiB, summary.write_bytes)
+        self.assertLessEqual(len(summary.series), 4 + 1)
+        self.assertEqual(20, summary.series[-1][0])
+        for point in summary.series:
+            self.assertEqual(MiB, point[1])
+            self.assertEqual(10, point[2])
+            self.assertEqual(2, point[3])
+            self.assertEqual(1, point[4])
+
+    def test_unreadable_counters(self):
+        sampler = iostats.DiskStatsSampler(
+            "/dev/nonexistent", sys_block=self.sys_block)
+        sampler.sample()
+        sampler.sample()
+        self.assertIsNone(sampler.summary())
+
+
+if __name__ == '__main__':
+    unittest.main()
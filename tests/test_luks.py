@@ -0,0 +1,54 @@
+import json
+import os
+import struct
+import tempfile
+import unittest
+
+from usody_sanitize import luks, schemas
+
+
+class TestLuksHeader(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp()
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def _write(self, data: bytes, offset: int = 0):
+        with open(self.path, "r+b") as fh:
+            fh.seek(offset)
+            fh.write(data)
+
+    def test_luks1(self):
+        header = bytearray(4096)
+        header[:8] = luks.MAGIC + struct.pack(">H", 1)
+        header[104:108] = struct.pack(">I", 4096)
+        self._write(bytes(header))
+        self.assertEqual(schemas.LuksHeader(version=1, header_size=2097152),
+                         luks.read_header(self.path))
+
+    def test_luks2(self):
+        metadata = json.dumps({
+            'segments': {'0': {'offset': "16777216"}},
+            'config': {'json_size': "12288", 'keyslots_size': "16744448"},
+        }).encode()
+        header = bytearray(16384)
+        header[:16] = luks.MAGIC + struct.pack(">HQ", 2, 16384)
+        header[4096:4096 + len(metadata)] = metadata
+        self._write(bytes(header))
+        self.assertEqual(16777216, luks.read_header(self.path).header_size)
+
+        # Primary header destroyed, the secondary one is still found.
+        self._write(bytes(4096))
+        self._write(luks.SECONDARY_MAGIC, 32768)
+        self.assertEqual(2, luks.read_header(self.path).version)
+
+    def test_detect_from_lsblk(self):
+        self._write(bytes(4096))
+        self.assertIsNone(luks.detect(self.path))
+        block = schemas.Block(path=self.path, rota=False,
+                              fstype="crypto_LUKS")
+        self.assertEqual(luks.DEFAULT_HEADER_SIZE,
+                         luks.detect(self.path, block).header_size)
@@ -0,0 +1,46 @@
+import unittest
+
+from usody_sanitize import utils
+from usody_sanitize.metrics import MetricsRegistry
+
+
+class TestMetrics(unittest.TestCase):
+
+    def test_shred_progress(self):
+        registry = MetricsRegistry()
+        device = registry.device("/dev/sdX_fake")
+        device.start_pass(1, 3)
+
+        utils.update_shred_progress(
+            device, "shred: /dev/sdX_fake: pass 1/1 (random)...")
+        utils.update_shred_progress(
+            device, "shred: /dev/sdX_fake: pass 1/1 (random)...350MiB/299GiB 0%")
+        utils.update_shred_progress(
+            device, "shred: /dev/sdX_fake: pass 1/1 (random)...1.0GiB/299GiB 0%")
+
+        self.assertEqual(1024 ** 3, device.bytes_written)
+        self.assertEqual(299 * 1024 ** 3, device.pass_bytes_total)
+
+        # A new pass keeps the bytes written by the previous ones.
+        device.start_pass(2, 3)
+        utils.update_shred_progress(
+            device, "shred: /dev/sdX_fake: pass 1/1 (random)...1.0GiB/299GiB 0%")
+        self.assertEqual(2 * 1024 ** 3, device.bytes_written)
+
+    def test_render(self):
+        registry = MetricsRegistry()
+        device = registry.device("/dev/sda")
+        device.serial_number = "S1"
+        device.running = True
+        device.start_pass(2, 3)
+        device.update_progress(4096, 8192)
+        registry.device("/dev/sdb").finish(False)
+
+        text = registry.render()
+        self.assertIn('sanitize_device_pass{device="/dev/sda",serial="S1"} 2',
+                      text)
+        self.assertIn('sanitize_device_bytes_written_total'
+                      '{device="/dev/sda",serial="S1"} 4096', text)
+        self.assertIn("sanitize_devices_running 1", text)
+        self.assertIn('sanitize_erasures_total{result="fail"} 1', text)
+        self.assertNotIn('sanitize_device_verification_result{', text)
@@ -0,0 +1,54 @@
+import asyncio
+import tempfile
+import unittest
+from pathlib import Path
+from types import SimpleNamespace
+from unittest import mock
+
+from usody_sanitize import multipath, schemas
+from usody_sanitize.engine import OverwriteEngine
+from usody_sanitize.erasure import deduplicate_erasures
+
+MAPS = {'/dev/dm-0': ['/dev/sdb', '/dev/sdc']}
+
+
+class TestMultipath(unittest.TestCase):
+
+    def test_collapse_paths(self):
+        with mock.patch.object(multipath, 'maps', return_value=MAPS):
+            self.assertEqual(
+                ['/dev/sda', '/dev/dm-0', '/dev/sdd'],
+                multipath.collapse(
+                    ['/dev/sda', '/dev/sdb', Path('/dev/sdc'), '/dev/sdd']))
+
+    def test_deduplicate_by_wwn(self):
+        def erasure(path, wwn, serial="S1"):
+            return SimpleNamespace(
+                path=Path(path),
+                device=schemas.Device(wwn=wwn, serial_number=serial))
+
+        erasures = [erasure('/dev/sdb', '0x5000C500A1'),
+                    erasure('/dev/sdc', '0x5000c500a1'),
+                    erasure('/dev/sdd', None, serial="S2")]
+        result = deduplicate_erasures(erasures)
+
+        self.assertEqual(['/dev/sdb', '/dev/sdd'],
+                         [e.path.as_posix() for e in result])
+        self.assertEqual(['/dev/sdc'], result[0].device.paths)
+
+    def test_striped_overwrite(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(b"\xff" * 1024 * 1024)
+            fh.flush()
+            engine = OverwriteEngine(fh.name, pattern="zeros",
+                                     chunk_size=64 * 1024,
+                                     paths=[fh.name, fh.name])
+
+            self.assertTrue(asyncio.run(engine.run()))
+            self.assertEqual(1024 * 1024, engine.bytes_written)
+            self.assertEqual(b"\0" * 1024 * 1024,
+                             Path(fh.name).read_bytes())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import tempfile
+import unittest
+from pathlib import Path
+
+from usody_sanitize import numa
+from usody_sanitize.config import settings
+
+
+class TestNuma(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.tmp_dir.name)
+        self.sys_nodes = root / "node"
+        self.sys_block = root / "block"
+        allowed = ",".join(str(c) for c in sorted(os.sched_getaffinity(0)))
+        for node, cpulist in ((0, "1000-1003"), (1, allowed)):
+            (self.sys_nodes / f"node{node}").mkdir(parents=True)
+            (self.sys_nodes / f"node{node}" / "cpulist").write_text(cpulist)
+        (self.sys_nodes / "online").write_text("0-1\n")
+
+        # The SCSI device of a disk behind an HBA on node 1.
+        pci = root / "devices" / "pci0000:80" / "0000:80:01.0"
+        scsi = pci / "host0" / "target0:0:0" / "0:0:0:0"
+        scsi.mkdir(parents=True)
+        (pci / "numa_node").write_text("1\n")
+        (self.sys_block / "sdb").mkdir(parents=True)
+        (self.sys_block / "sdb" / "device").symlink_to(scsi)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+        settings.numa_nodes = {}
+
+    def placement(self, dev_path):
+        return numa.placement(dev_path, sys_block=self.sys_block,
+                              sys_nodes=self.sys_nodes)
+
+    def test_parse_cpulist(self):
+        self.assertEqual([0, 1, 2, 3, 8, 10, 11],
+                         numa.parse_cpulist("0-3,8,10-11\n"))
+
+    def test_placement_on_the_node_of_the_controller(self):
+        place = self.placement("/dev/sdb")
+        self.assertEqual(1, place.node)
+        self.assertEqual(sorted(os.sched_getaffinity(0)), place.cpus)
+        self.assertEqual("sysfs", place.source)
+        # Unknown node.
+        self.assertIsNone(self.placement("/dev/sdc"))
+
+    def test_placement_from_config(self):
+        settings.numa_nodes = {"/dev/sdc": 1}
+        self.assertEqual("config", self.placement("/dev/sdc").source)
+
+    def test_single_node(self):
+        (self.sys_nodes / "online").write_text("0\n")
+        self.assertIsNone(self.placement("/dev/sdb"))
+
+
+if __name__ == '__main__':
+    unittest.main()
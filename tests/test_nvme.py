@@ -0,0 +1,36 @@
+import unittest
+
+from usody_sanitize import nvme, schemas
+
+
+class TestNvmeActions(unittest.TestCase):
+
+    def test_controller_path(self):
+        self.assertEqual("/dev/nvme0", nvme.controller_path("/dev/nvme0n1"))
+        self.assertEqual("/dev/nvme12",
+                         nvme.controller_path("/dev/nvme12n3"))
+
+    def test_plan_without_capabilities(self):
+        self.assertEqual([nvme.FORMAT_USER_DATA], nvme.plan_actions(None))
+
+    def test_plan_by_estimates(self):
+        capabilities = schemas.NvmeCapabilities(
+            controller="/dev/nvme0",
+            crypto_erase=True,
+            block_erase=True,
+            format=True,
+        )
+        self.assertEqual(
+            [nvme.SANITIZE_CRYPTO, nvme.SANITIZE_BLOCK,
+             nvme.FORMAT_USER_DATA],
+            nvme.plan_actions(capabilities))
+
+        # Reported estimates win over the defaults.
+        log = nvme.parse_sanitize_log(
+            '{"nvme0": {"sstat": 1, "time_crypto_erase": 120,'
+            ' "time_block_erase": 30, "time_over_write": 4294967295}}')
+        self.assertEqual(
+            [nvme.SANITIZE_BLOCK, nvme.SANITIZE_CRYPTO,
+             nvme.FORMAT_USER_DATA],
+            nvme.plan_actions(capabilities, log))
+        self.assertEqual(nvme.STATUS_SUCCESS, nvme.sanitize_status(log))
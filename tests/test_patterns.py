@@ -0,0 +1,120 @@
+import asyncio
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from pydantic import ValidationError
+
+from usody_sanitize import buffers, patterns, planner, schemas
+from usody_sanitize.engine import OverwriteEngine
+from usody_sanitize.methods import DOD_5220_22_M, GUTMANN
+
+CHUNK_SIZE = 64 * 1024
+SIZE = 320072933376
+
+
+class TestPatterns(unittest.TestCase):
+
+    def test_parse(self):
+        self.assertEqual(b"\x92\x49\x24", patterns.parse("hex:924924").data)
+        self.assertEqual(7, patterns.parse("random:seed=7").seed)
+        self.assertTrue(patterns.parse("random:seed=7:complement").complement)
+        self.assertIsNone(patterns.parse(None).data)
+        for spec in ("hex:5", "hex:zz", "ones", "random:seed=x"):
+            with self.assertRaises(ValueError):
+                patterns.parse(spec)
+
+    def test_resolve_complements(self):
+        self.assertEqual(
+            ["zeros", "hex:ff", "hex:924924", "hex:6db6db",
+             "random:seed=3", "random:seed=3:complement", "random:seed=3"],
+            patterns.resolve(
+                ["zeros", "complement", "hex:924924", "complement",
+                 "random:seed=3", "complement", "complement"]))
+
+    def test_method_validation(self):
+        with self.assertRaises(ValidationError):
+            schemas.Execution(tool="native", pattern="hex:f")
+        with self.assertRaises(ValidationError):
+            schemas.Method(name="Invalid", standard="", overwriting_steps=[
+                schemas.Execution(tool="native", pattern="random"),
+                schemas.Execution(tool="native", pattern="complement")])
+        self.assertEqual(35, len(GUTMANN.overwriting_steps))
+
+    def test_plan_standard(self):
+        device = schemas.Device(storage_medium="HDD")
+        plan = planner.plan("/dev/sda", DOD_5220_22_M, device, SIZE)
+        self.assertEqual(["zeros", "hex:ff", "random"],
+                         [s.pattern for s in plan.steps])
+        # Only the engine writes fixed patterns other than zeros.
+        self.assertEqual("native", plan.steps[1].tool)
+        self.assertEqual([], plan.steps[1].fallback)
+
+        shred = schemas.Method(name="Shred", standard="", overwriting_steps=[
+            schemas.Execution(tool="shred", pattern="hex:55")])
+        plan = planner.plan("/dev/sda", shred, device, SIZE)
+        self.assertEqual("native", plan.steps[0].tool)
+
+    def overwrite(self, pattern, size):
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(b"\x01" * size)
+            fh.flush()
+            engine = OverwriteEngine(fh.name, pattern=pattern,
+                                     chunk_size=CHUNK_SIZE)
+            self.assertTrue(asyncio.run(engine.run()))
+            with open(fh.name, "rb") as _fh:
+                return engine, _fh.read()
+
+    def test_engine_fixed_pattern(self):
+        size = 5 * CHUNK_SIZE + 4096
+        engine, data = self.overwrite("hex:924924", size)
+        # The chunks are a multiple of the pattern and the pages.
+        self.assertEqual(0, engine.chunk_size % (3 * patterns.PAGE_SIZE))
+        self.assertEqual((b"\x92\x49\x24" * size)[:size], data)
+
+    def test_tables_charged_to_the_budget(self):
+        pool = buffers.BufferPool(budget=4 * CHUNK_SIZE, min_size=4096)
+        pattern = patterns.parse("hex:55")
+        with mock.patch.object(buffers, "pool", pool):
+            with pool.lease(4 * CHUNK_SIZE) as lease, \
+                    patterns.table(pattern, CHUNK_SIZE) as table, \
+                    patterns.table(pattern, CHUNK_SIZE) as shared:
+                # Computed once for all the writers.
+                self.assertIs(table, shared)
+                self.assertEqual(b"\x55" * CHUNK_SIZE, bytes(table))
+                self.assertTrue(table.readonly)
+                self.assertEqual(CHUNK_SIZE, pool.reserved)
+                # The leases share what is left of the budget.
+                self.assertEqual(3 * CHUNK_SIZE, len(lease.get()))
+                self.assertLessEqual(pool.allocated, pool.budget)
+            # Unmapped when the last writer ends.
+            self.assertEqual({}, patterns._tables)
+            self.assertEqual(0, pool.reserved)
+            pool.clear()
+            self.assertEqual(0, pool.allocated)
+
+    def test_table_waits_for_the_budget(self):
+        pool = buffers.BufferPool(budget=CHUNK_SIZE, min_size=CHUNK_SIZE)
+        cancelled = threading.Event()
+        cancelled.set()
+        with mock.patch.object(buffers, "pool", pool), \
+                pool.lease(CHUNK_SIZE) as lease:
+            lease.get()
+            with patterns.table(patterns.parse("hex:55"), CHUNK_SIZE,
+                                cancelled) as table:
+                self.assertIsNone(table)
+            self.assertEqual({}, patterns._tables)
+            self.assertEqual(CHUNK_SIZE, pool.allocated)
+
+    def test_engine_seeded_complement(self):
+        size = 3 * CHUNK_SIZE + 512
+        _, data = self.overwrite("random:seed=11", size)
+        _, complement = self.overwrite("random:seed=11:complement", size)
+        _, again = self.overwrite("random:seed=11", size)
+        self.assertEqual(data, again)
+        self.assertEqual(data.translate(patterns.INVERT), complement)
+
+
+if __name__ == '__main__':
+    unittest.main()
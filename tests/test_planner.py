@@ -0,0 +1,48 @@
+import unittest
+
+from usody_sanitize import planner, schemas
+from usody_sanitize.methods import BASIC, ENHANCED
+
+SIZE = 320072933376
+
+
+class TestPlanner(unittest.TestCase):
+
+    def test_hdd_zeros_not_offloaded(self):
+        device = schemas.Device(storage_medium="HDD")
+        device.capabilities.queue = schemas.QueueCapabilities(
+            write_zeroes_max_bytes=33553920)
+        plan = planner.plan("/dev/sda", ENHANCED, device, SIZE)
+
+        # WRITE SAME writes the platters at the speed of the disk.
+        self.assertEqual(['badblocks', 'badblocks', 'shred'],
+                         [s.tool for s in plan.steps])
+        self.assertEqual(['native', 'blkzeroout'], plan.steps[-1].fallback)
+        self.assertAlmostEqual(SIZE / planner.settings.planner_hdd_throughput,
+                               plan.steps[-1].predicted_duration)
+        self.assertTrue(plan.verification_enabled)
+        self.assertEqual(sum(s.predicted_duration for s in plan.steps),
+                         plan.predicted_duration)
+
+    def test_ssd_keeps_verification(self):
+        device = schemas.Device(storage_medium="SSD")
+        plan = planner.plan("/dev/nvme0n1", BASIC, device, SIZE)
+
+        self.assertEqual('nvme', plan.steps[0].tool)
+        self.assertEqual(['blkzeroout'], plan.steps[0].fallback)
+        self.assertTrue(plan.verification_enabled)
+
+    def test_hdd_crypto_erase(self):
+        device = schemas.Device(storage_medium="HDD")
+        device.capabilities.ata = schemas.AtaCapabilities(
+            sanitize=True, crypto_scramble=True)
+        device.capabilities.luks = schemas.LuksHeader(header_size=16777216)
+
+        plan = planner.plan("/dev/sda", BASIC, device, SIZE)
+        self.assertEqual(['luks', 'hdparm'], [s.tool for s in plan.steps])
+        self.assertEqual(['shred', 'native'], plan.steps[1].fallback)
+
+        # Multi pass methods are not replaced.
+        plan = planner.plan("/dev/sda", ENHANCED, device, SIZE)
+        self.assertEqual(['luks', 'badblocks', 'badblocks', 'shred'],
+                         [s.tool for s in plan.steps])
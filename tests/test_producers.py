@@ -0,0 +1,94 @@
+import asyncio
+import contextlib
+import tempfile
+import time
+import unittest
+
+from usody_sanitize import producers
+from usody_sanitize.engine import OverwriteEngine
+
+SLOT_SIZE = 64 * 1024
+
+
+class TestPatternProducers(unittest.TestCase):
+
+    def setUp(self):
+        self.producers = producers.PatternProducers(
+            processes=2, size=8 * SLOT_SIZE, slot_size=SLOT_SIZE)
+        self.producers.start()
+
+    def tearDown(self):
+        self.producers.stop()
+
+    def wait_free(self, slots):
+        # The slots being filled are freed when the producers finish.
+        deadline = time.monotonic() + 10
+        while len(self.producers._free) < slots \
+                and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def use(self, ring, times=10):
+        for _ in range(times):
+            slot = ring.get()
+            with ring.view(slot) as view:
+                self.assertEqual(SLOT_SIZE, len(view))
+                self.assertNotEqual(bytes(SLOT_SIZE), bytes(view))
+            ring.release(slot)
+
+    def test_rings_share_the_arena(self):
+        with self.producers.ring(depth=6) as first, \
+                self.producers.ring(depth=6) as second:
+            self.assertEqual(6, len(first.slots))
+            self.assertEqual(2, len(second.slots))
+            # The first ring gives back the slots over its share.
+            self.use(first)
+            self.assertEqual(4, len(first.slots))
+            self.use(second)
+            self.assertEqual(4, len(second.slots))
+
+        self.wait_free(8)
+        with self.producers.ring(depth=8) as ring:
+            self.assertEqual(8, len(ring.slots))
+
+    def test_more_rings_than_slots(self):
+        with contextlib.ExitStack() as stack:
+            rings = [stack.enter_context(self.producers.ring(depth=4))
+                     for _ in range(10)]
+            # The writers beyond one per slot fill their own buffers.
+            self.assertEqual([None, None], rings[-2:])
+            rings = rings[:-2]
+            self.assertEqual([4, 4, 0, 0, 0, 0, 0, 0],
+                             [len(ring.slots) for ring in rings])
+            # The first rings give the slots over their share.
+            self.use(rings[0], times=3)
+            self.use(rings[1], times=3)
+            for ring in rings:
+                self.use(ring, times=2)
+            self.assertEqual([1] * 8, [len(ring.slots) for ring in rings])
+
+        self.wait_free(8)
+        with self.producers.ring(depth=4) as ring:
+            self.assertEqual(4, len(ring.slots))
+
+    def test_engine_writes_the_slots(self):
+        producers._producers = self.producers
+        try:
+            with tempfile.NamedTemporaryFile() as fh:
+                fh.write(bytes(20 * SLOT_SIZE + 512))
+                fh.flush()
+                engine = OverwriteEngine(fh.name, pattern="random",
+                                         chunk_size=SLOT_SIZE)
+                self.assertTrue(asyncio.run(engine.run()))
+                with open(fh.name, "rb") as _fh:
+                    data = _fh.read()
+        finally:
+            producers._producers = None
+
+        self.assertEqual(len(data), engine.bytes_written)
+        for offset in range(0, len(data), SLOT_SIZE):
+            self.assertNotEqual(bytes(len(data[offset:offset + SLOT_SIZE])),
+                                data[offset:offset + SLOT_SIZE])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import tempfile
+import unittest
+
+from usody_sanitize import scheduler, throughput
+
+
+class TestScheduler(unittest.TestCase):
+
+    def test_makespan(self):
+        self.assertEqual(0, scheduler.makespan([], 2))
+        self.assertEqual(5, scheduler.makespan([3, 5, 2], 0))
+        self.assertEqual(7, scheduler.makespan([3, 5, 2, 2], 2))
+        self.assertEqual(12, scheduler.makespan([3, 5, 2, 2], 1))
+
+    def test_limit_jobs(self):
+        running = []
+        peak = []
+
+        async def job(value):
+            running.append(value)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.remove(value)
+            return value
+
+        result = asyncio.run(
+            scheduler.Scheduler(jobs=2).run([job(i) for i in range(5)]))
+
+        self.assertEqual([0, 1, 2, 3, 4], result)
+        self.assertEqual(2, max(peak))
+
+    def test_longest_first(self):
+        started = []
+
+        async def job(value):
+            started.append(value)
+            await asyncio.sleep(0)
+            return value
+
+        result = asyncio.run(scheduler.Scheduler(jobs=1).run(
+            [job(i) for i in range(3)], durations=[5, 20, 10]))
+
+        self.assertEqual([0, 1, 2], result)
+        self.assertEqual([1, 2, 0], started)
+        self.assertEqual([1, 2, 0], scheduler.longest_first([5, 20, 10]))
+
+    def test_cancel_all_the_jobs(self):
+        cancelled = []
+        restored = []
+
+        async def job(value):
+            try:
+                await asyncio.sleep(60)
+            except asyncio.CancelledError:
+                cancelled.append(value)
+                raise
+            finally:
+                await asyncio.sleep(0)
+                restored.append(value)
+
+        async def run():
+            task = asyncio.ensure_future(scheduler.Scheduler(jobs=0).run(
+                [job(i) for i in range(3)]))
+            await asyncio.sleep(0.01)
+            task.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await task
+
+        asyncio.run(run())
+
+        self.assertEqual([0, 1, 2], sorted(cancelled))
+        self.assertEqual([0, 1, 2], sorted(restored))
+
+    def test_measure_read_throughput(self):
+        with tempfile.NamedTemporaryFile() as fh:
+            fh.write(b"\0" * 1024 * 1024)
+            fh.flush()
+            result = asyncio.run(throughput.measure_read_throughput(
+                fh.name, sample_size=256 * 1024, chunk_size=64 * 1024))
+
+        self.assertEqual(list(throughput.POSITIONS), list(result))
+        self.assertTrue(all(rate > 0 for rate in result.values()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,37 @@
+import unittest
+
+from usody_sanitize import scsi, schemas
+
+SG_OPCODES = """
+  Opcode  Service    CDB    RWCDLP,  Name
+  (hex)   action(h)  size   CDLP
+-----------------------------------------------
+   00                  6    0,0    Test Unit Ready
+   04                  6    0,0    Format Unit
+   48       2         10    0,0    Sanitize, block erase
+   48       3         10    0,0    Sanitize, cryptographic erase
+"""
+
+
+class TestScsiActions(unittest.TestCase):
+
+    def test_is_scsi(self):
+        sas = schemas.Block(path="/dev/sdb", rota=True, tran="sas")
+        self.assertTrue(scsi.is_scsi(sas, schemas.Smart()))
+        # SATA disk behind a SAS HBA.
+        self.assertFalse(scsi.is_scsi(
+            sas, schemas.Smart(device={'protocol': 'ATA'})))
+        self.assertTrue(scsi.is_scsi(
+            None, schemas.Smart(device={'protocol': 'SCSI'})))
+
+    def test_plan_actions(self):
+        capabilities = scsi.parse_opcodes(SG_OPCODES)
+        self.assertEqual(
+            [scsi.SANITIZE_CRYPTO, scsi.SANITIZE_BLOCK, scsi.FORMAT_UNIT],
+            scsi.plan_actions(capabilities))
+        self.assertIsNone(scsi.parse_opcodes(""))
+
+    def test_parse_progress(self):
+        self.assertEqual(
+            45.23, scsi.parse_progress("Progress indication: 45.23% done"))
+        self.assertIsNone(scsi.parse_progress("Sense key: No Sense"))
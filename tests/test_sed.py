@@ -0,0 +1,51 @@
+import asyncio
+import unittest
+
+from usody_sanitize import commands, sed, schemas, tracing
+
+
+class TestSedActions(unittest.TestCase):
+
+    def test_parse_discovery(self):
+        capabilities = sed.parse_discovery(
+            "/dev/nvme0 SED -2- Samsung SSD 960 EVO 250GB 2B7QCXE7")
+        self.assertEqual(["Opal 2.0"], capabilities.feature_sets)
+        self.assertEqual([sed.REVERT_TPER], sed.plan_actions(capabilities))
+
+        capabilities.psid = True
+        self.assertEqual([sed.PSID_REVERT, sed.REVERT_TPER],
+                         sed.plan_actions(capabilities))
+
+        self.assertIsNone(sed.parse_discovery("/dev/sda NO --- WDC"))
+
+    def test_pyrite_does_not_encrypt(self):
+        capabilities = sed.parse_discovery("/dev/sda SED --p- Drive")
+        self.assertFalse(capabilities.crypto_erase)
+        self.assertEqual([], sed.plan_actions(capabilities))
+
+    def test_security_supported(self):
+        self.assertFalse(sed.security_supported(schemas.Capabilities()))
+        self.assertTrue(sed.security_supported(schemas.Capabilities(
+            ata=schemas.AtaCapabilities(trusted_computing=True))))
+
+    def test_secrets_are_redacted(self):
+        tracer = tracing.Tracer("/dev/sda")
+        step_commands = []
+
+        async def run():
+            tracing.activate(tracer)
+            await sed.psid_revert("/dev/sda", "PSID0123456789", step_commands)
+            return await commands.erasure_command(
+                "echo secret PSID0123456789",
+                redact={"PSID0123456789": "<psid>"})
+
+        cmd = asyncio.run(run())
+        tracing.registry.remove(tracer)
+
+        self.assertEqual(
+            "sedutil-cli --yesIreallywanttoERASEALLmydatausingthePSID"
+            " <psid> /dev/sda", step_commands[0].command)
+        self.assertEqual("secret <psid>", cmd.stdout)
+        self.assertEqual(2, len(tracer.spans))
+        for span in tracer.spans:
+            self.assertNotIn("PSID0123456789", span.attributes['command'])
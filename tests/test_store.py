@@ -0,0 +1,119 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from usody_sanitize.store import JobStore
+
+
+def make_report(serial, result=True, model="MK3259GSXP"):
+    return {
+        'device_info': {
+            'serial_number': serial,
+            'wwn': f"0x5000{serial}",
+            'model': model,
+        },
+        'method': {'name': "Basic Erasure"},
+        'result': result,
+        'steps': [],
+    }
+
+
+class TestJobStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self.tmp_dir.name) / "sanitize.db"
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_batched_writes(self):
+        store = JobStore(self.path, batch_size=3)
+        store.add(make_report("A1"))
+        store.add(make_report("A2"))
+        self.assertEqual(2, len(store._pending))
+
+        store.add(make_report("A3"))
+        self.assertEqual([], store._pending)
+        store.close()
+
+        with JobStore(self.path) as store:
+            self.assertEqual(3, len(store.history()))
+
+    def test_same_day_runs_are_kept(self):
+        with JobStore(self.path) as store:
+            store.add(make_report("A1", result=False), created_at=1000.0)
+            store.add(make_report("A1", result=True), created_at=2000.0)
+            store.add(make_report("B1"), created_at=1500.0)
+
+            history = store.history(serial_number="A1")
+            self.assertEqual([2000.0, 1000.0],
+                             [r['created_at'] for r in history])
+            self.assertEqual([True, False], [r['result'] for r in history])
+
+    def test_filters(self):
+        with JobStore(self.path) as store:
+            store.add(make_report("A1", result=False))
+            store.add(make_report("A2", model="Other"))
+            store.add(make_report("A3"))
+
+            failed = store.history(result=False)
+            self.assertEqual(["A1"], [r['serial_number'] for r in failed])
+            self.assertEqual(
+                ["A2"],
+                [r['serial_number'] for r in store.history(model="Other")])
+            self.assertEqual(
+                ["A3"],
+                [r['serial_number'] for r in store.history(wwn="0x5000A3")])
+            self.assertEqual(1, len(store.history(limit=1)))
+
+    def test_full_report(self):
+        with JobStore(self.path) as store:
+            store.add(make_report("A1"))
+            record_id = store.history()[0]['id']
+
+            self.assertEqual(make_report("A1"), store.report(record_id))
+            self.assertIsNone(store.report(record_id + 1))
+
+    def test_throughput_history(self):
+        def erased(serial, seconds, firmware="GS002D", result=True):
+            report = make_report(serial, result=result)
+            report['device_info'].update(
+                connector="block:scsi:pci",
+                export_data={'smart': {'firmware_version': firmware,
+                                       'user_capacity': {'bytes': 1000}}})
+            report['steps'] = [{'duration': seconds}]
+            return report
+
+        with JobStore(self.path) as store:
+            store.add(erased("A1", 10))
+            store.add(erased("A2", 30))
+            store.add(erased("A3", 1, result=False))
+            store.add(erased("A4", 4, firmware="GS003D"))
+
+            self.assertEqual((50.0, 2), store.throughput(
+                "MK3259GSXP", "GS002D", "block:scsi:pci", "Basic Erasure"))
+            self.assertEqual((250.0, 1), store.throughput(
+                "MK3259GSXP", "GS003D", "block:scsi:pci", "Basic Erasure"))
+            # Any firmware of the model without an exact match.
+            self.assertEqual((3000 / 44, 3), store.throughput(
+                "MK3259GSXP", "GS004D", None, "Basic Erasure"))
+            self.assertEqual((None, 0), store.throughput(
+                "Other", "GS002D", "block:scsi:pci", "Basic Erasure"))
+
+    def test_history_uses_indexes(self):
+        with JobStore(self.path) as store:
+            plan = store._conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM sanitizations"
+                " WHERE serial_number = ? ORDER BY created_at DESC",
+                ("A1",)).fetchall()
+            self.assertIn("ix_sanitizations_serial_number", str(
+                [tuple(row) for row in plan]))
+
+    def test_unfiltered_history_uses_an_index(self):
+        with JobStore(self.path) as store:
+            plan = str([tuple(row) for row in store._conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM sanitizations"
+                " ORDER BY created_at DESC LIMIT ?", (50,)).fetchall()])
+        self.assertIn("ix_sanitizations_created_at", plan)
+        self.assertNotIn("TEMP B-TREE", plan)
@@ -0,0 +1,96 @@
+import asyncio
+import subprocess
+import time
+import unittest
+
+from usody_sanitize import commands, scheduler, thermal
+from usody_sanitize.config import settings
+
+
+def stopped(pid, timeout=2):
+    """Waits for the signal to stop the process."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        with open(f"/proc/{pid}/stat") as _fh:
+            if _fh.read().rsplit(")", 1)[1].split()[0] in "Tt":
+                return True
+        time.sleep(0.01)
+    return False
+
+
+class TestThermal(unittest.TestCase):
+
+    def test_parse_temperature(self):
+        self.assertEqual(41.0, thermal.parse_temperature(
+            {'temperature': {'current': 41}}))
+        self.assertIsNone(thermal.parse_temperature({}))
+
+    def test_pause_hot_drive(self):
+        monitor = thermal.ThermalMonitor("/dev/sdz", temperature=40)
+        proc = subprocess.Popen(["sleep", "10"])
+        try:
+            with monitor.pausable(lambda: [proc.pid]):
+                monitor.record(settings.thermal_max_temperature)
+                self.assertFalse(monitor.cool.is_set())
+                self.assertTrue(stopped(proc.pid))
+
+                # Hysteresis, it is still too hot.
+                monitor.record(settings.thermal_resume_temperature + 1)
+                self.assertFalse(monitor.cool.is_set())
+
+                monitor.record(settings.thermal_resume_temperature)
+                self.assertTrue(monitor.cool.is_set())
+        finally:
+            proc.kill()
+            proc.wait()
+
+        summary = monitor.summary()
+        self.assertEqual(1, summary.pauses)
+        self.assertEqual(settings.thermal_max_temperature,
+                         summary.max_temperature)
+        self.assertEqual(4, len(summary.series))
+
+    def test_scheduler_defers_hot_jobs(self):
+        started = []
+        hot = {0: 1}
+
+        async def job(value):
+            started.append(value)
+            return value
+
+        async def ready(index):
+            if hot.get(index):
+                hot[index] -= 1
+                return False
+            return True
+
+        result = asyncio.run(
+            scheduler.Scheduler(jobs=1, defer_interval=0).run(
+                [job(i) for i in range(3)], ready=ready))
+
+        self.assertEqual([0, 1, 2], result)
+        self.assertEqual(0, started[-1])
+
+    def test_only_overwrites_are_paused(self):
+        monitor = thermal.ThermalMonitor("/dev/sdz", temperature=40)
+        monitor.record(settings.thermal_max_temperature)
+        paused = []
+
+        async def check(cmd, proc):
+            paused.append(stopped(proc.pid, timeout=0.5))
+            monitor.record(settings.thermal_resume_temperature)
+
+        async def erase():
+            thermal.activate(monitor)
+            # A firmware erasure or a poll runs while the drive is hot.
+            await commands.erasure_command("sleep 1", process_manager=check)
+            monitor.record(settings.thermal_max_temperature)
+            await commands.erasure_command(
+                "sleep 1", process_manager=check, pausable=True)
+
+        asyncio.run(erase())
+        self.assertEqual([False, True], paused)
+
+
+if __name__ == '__main__':
+    unittest.main()
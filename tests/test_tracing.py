@@ -0,0 +1,82 @@
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+from usody_sanitize import tracing
+
+
+class TestTracing(unittest.TestCase):
+
+    def setUp(self):
+        patcher = mock.patch.object(tracing, "registry", [])
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_nested_spans(self):
+        tracer = tracing.Tracer("/dev/sda")
+        with tracer.span("erasure") as outer:
+            with tracer.span("shred", tracing.COMMAND, command="shred"):
+                sum(range(10000))
+
+        inner = tracer.spans[0]
+        # Spans are stored when they end, the inner one first.
+        self.assertEqual(["shred", "erasure"],
+                         [s.name for s in tracer.spans])
+        self.assertIs(outer, tracer.spans[1])
+        self.assertLessEqual(outer.start_time, inner.start_time)
+        self.assertGreaterEqual(outer.end_time, inner.end_time)
+        self.assertGreaterEqual(outer.duration, inner.duration)
+        self.assertEqual({'command': "shred"}, inner.attributes)
+        self.assertEqual([outer], tracer.phases())
+
+    def test_activated_tracer(self):
+        first = tracing.Tracer("/dev/sda")
+        second = tracing.Tracer("/dev/sdb")
+
+        async def erasure(tracer):
+            tracing.activate(tracer)
+            await asyncio.sleep(0)
+            with tracing.span("verification"):
+                await asyncio.sleep(0)
+
+        async def run():
+            await asyncio.gather(erasure(first), erasure(second))
+            # The context of each task is its own.
+            with tracing.span("unused"):
+                pass
+
+        asyncio.run(run())
+        self.assertEqual(["verification"], [s.name for s in first.spans])
+        self.assertEqual(["verification"], [s.name for s in second.spans])
+
+    def test_chrome_trace(self):
+        tracer = tracing.Tracer("/dev/sda")
+        with tracer.span("erasure", step=1):
+            pass
+        tracing.Tracer("/dev/sdb")
+
+        with tempfile.TemporaryDirectory() as path:
+            trace_path = os.path.join(path, "trace.json")
+            tracing.write_chrome_trace(trace_path)
+            with open(trace_path) as _fh:
+                trace = json.load(_fh)
+
+        events = trace['traceEvents']
+        self.assertEqual(
+            [("M", 1, "/dev/sda"), ("X", 1, None), ("M", 2, "/dev/sdb")],
+            [(e['ph'], e['tid'], e['args'].get('name')) for e in events])
+        span, event = tracer.spans[0], events[1]
+        self.assertEqual("erasure", event['name'])
+        self.assertEqual(tracing.PHASE, event['cat'])
+        self.assertEqual(os.getpid(), event['pid'])
+        self.assertEqual(int(span.start_time * 1_000_000), event['ts'])
+        self.assertEqual(int(span.duration * 1_000_000), event['dur'])
+        self.assertEqual(1, event['args']['step'])
+        self.assertIn('cpu_time', event['args'])
+
+
+if __name__ == '__main__':
+    unittest.main()
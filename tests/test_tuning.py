@@ -0,0 +1,69 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from usody_sanitize import tuning
+
+PROFILE = {
+    'scheduler': 'none',
+    'max_sectors_kb': 'max',
+    'read_ahead_kb': '0',
+    'missing': '1',
+}
+
+
+class TestQueueTuning(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmp_dir.name)
+        self.queue = self.root / "sys" / "sda" / "queue"
+        self.queue.mkdir(parents=True)
+        values = {
+            'scheduler': "[mq-deadline] kyber none",
+            'max_sectors_kb': "1280",
+            'max_hw_sectors_kb': "32767",
+            'read_ahead_kb': "128",
+        }
+        for name, value in values.items():
+            (self.queue / name).write_text(value)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def tuner(self):
+        return tuning.QueueTuner("/dev/sda", PROFILE,
+                                 state_dir=self.root / "state",
+                                 sys_block=self.root / "sys")
+
+    def test_apply_and_restore(self):
+        with self.tuner() as tuner:
+            self.assertEqual("none", (self.queue / "scheduler").read_text())
+            self.assertEqual("32767",
+                             (self.queue / "max_sectors_kb").read_text())
+            self.assertTrue(tuner.state_file.exists())
+
+        self.assertEqual("mq-deadline",
+                         (self.queue / "scheduler").read_text())
+        self.assertEqual("128", (self.queue / "read_ahead_kb").read_text())
+        self.assertFalse(tuner.state_file.exists())
+
+        summary = tuner.summary()
+        self.assertTrue(summary.restored)
+        self.assertEqual({'scheduler': 'none', 'max_sectors_kb': '32767',
+                          'read_ahead_kb': '0'}, summary.applied)
+        self.assertEqual("1280", summary.original['max_sectors_kb'])
+
+    def test_restore_after_crash(self):
+        crashed = self.tuner()
+        crashed.apply()
+        # The process died without restoring the queue.
+        tuning._applied.clear()
+
+        with self.tuner() as tuner:
+            self.assertEqual("1280", tuner.original['max_sectors_kb'])
+        self.assertEqual("1280", (self.queue / "max_sectors_kb").read_text())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,114 @@
+import asyncio
+import tempfile
+import unittest
+from unittest import mock
+
+from usody_sanitize import schemas, write_cache
+
+
+class TestWriteCache(unittest.TestCase):
+
+    def test_parse_setting(self):
+        self.assertTrue(write_cache.parse_setting(
+            write_cache.ATA, "\n/dev/sda:\n write-caching =  1 (on)"))
+        self.assertFalse(write_cache.parse_setting(
+            write_cache.SCSI,
+            "    /dev/sdb: SEAGATE   ST4000NM0023\n"
+            "WCE           0  [cha: y, def:  1, sav:  0]"))
+        self.assertTrue(write_cache.parse_setting(
+            write_cache.NVME, "get-feature:0x06 (Volatile Write Cache),"
+                              " Current value:0x00000001"))
+        self.assertIsNone(write_cache.parse_setting(write_cache.ATA, ""))
+
+    def test_enable_and_restore(self):
+        executed = []
+
+        async def erasure_command(command):
+            executed.append(command)
+            stdout = "write-caching =  0 (off)" if command.endswith(
+                "-W /dev/sda") else ""
+            return schemas.Exec(command=command, stdout=stdout,
+                                return_code=0, success=True)
+
+        async def run(cache):
+            async with cache:
+                pass
+
+        with tempfile.TemporaryDirectory() as state_dir, \
+                mock.patch.object(write_cache.commands, "erasure_command",
+                                  erasure_command), \
+                mock.patch.object(write_cache, "_fsync"):
+            cache = write_cache.WriteCache(
+                "/dev/sda", interval=0, state_dir=state_dir)
+            cache.kind = write_cache.ATA
+            asyncio.run(run(cache))
+            self.assertFalse(cache.state_file.exists())
+
+        self.assertEqual(["hdparm -W /dev/sda", "hdparm -W1 /dev/sda",
+                          "hdparm -W0 /dev/sda"], executed)
+        summary = cache.summary()
+        self.assertFalse(summary.original)
+        self.assertTrue(summary.enabled)
+        self.assertTrue(summary.restored)
+
+    def test_restore_at_exit_and_after_a_crash(self):
+        async def erasure_command(command):
+            stdout = "write-caching =  0 (off)" if command.endswith(
+                "-W /dev/sda") else ""
+            return schemas.Exec(command=command, stdout=stdout,
+                                return_code=0, success=True)
+
+        with tempfile.TemporaryDirectory() as state_dir, \
+                mock.patch.object(write_cache.commands, "erasure_command",
+                                  erasure_command), \
+                mock.patch.object(write_cache, "_fsync"), \
+                mock.patch.object(write_cache.subprocess, "run") as run:
+            run.return_value.returncode = 0
+            cache = write_cache.WriteCache(
+                "/dev/sda", interval=0, state_dir=state_dir)
+            cache.kind = write_cache.ATA
+            asyncio.run(cache.enable())
+            self.assertTrue(cache.state_file.exists())
+
+            # Killed by a signal, restored at exit.
+            write_cache.restore_all()
+            run.assert_called_once_with(["hdparm", "-W0", "/dev/sda"],
+                                        capture_output=True)
+            self.assertTrue(cache.restored)
+            self.assertFalse(cache.state_file.exists())
+
+            # Crashed, restored by the next run.
+            cache.state_file.write_text(
+                '{"dev_path": "/dev/sda", "kind": "ata"}')
+            asyncio.run(write_cache.WriteCache(
+                "/dev/sda", interval=0, state_dir=state_dir).enable())
+            self.assertEqual(2, run.call_count)
+            self.assertFalse(cache.state_file.exists())
+        write_cache._enabled.clear()
+
+    def test_barriers(self):
+        async def run(cache, step):
+            async with cache.checkpoints() as flushes:
+                await asyncio.sleep(0.25)
+            step.commands += flushes
+            await cache.barrier(step)
+
+        with tempfile.NamedTemporaryFile() as disk:
+            cache = write_cache.WriteCache(disk.name, interval=0.1)
+            step = schemas.Step(success=True)
+            asyncio.run(run(cache, step))
+
+        self.assertGreaterEqual(len(step.commands), 2)
+        self.assertTrue(all(cmd.success for cmd in step.commands))
+        self.assertTrue(step.durable)
+        self.assertTrue(step.success)
+
+        cache = write_cache.WriteCache("/nonexistent/disk", interval=0)
+        step = schemas.Step(success=True)
+        asyncio.run(run(cache, step))
+        self.assertFalse(step.durable)
+        self.assertFalse(step.success)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,115 @@
+import asyncio
+import errno
+import os
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from usody_sanitize import planner, schemas, zoned
+from usody_sanitize.methods import BASIC, ENHANCED
+
+ZONE_SIZE = 256 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class FileZones:
+    """Zoned device emulated on a file, the writes not done at the
+    write pointer of a sequential zone are rejected like the kernel does.
+    """
+
+    def __init__(self, zones=8, conventional=1, capacity=ZONE_SIZE,
+                 readonly=()):
+        self.zones = [
+            zoned.Zone(
+                start=i * ZONE_SIZE, length=ZONE_SIZE, wp=i * ZONE_SIZE,
+                type=zoned.ZONE_TYPE_CONVENTIONAL if i < conventional else 2,
+                cond=zoned.ZONE_COND_READONLY if i in readonly else 0xE,
+                capacity=ZONE_SIZE if i < conventional else capacity)
+            for i in range(zones)]
+        self.write_pointers = {z.start: z.start + z.capacity
+                               for z in self.zones}
+        self.resets = 0
+        self._lock = threading.Lock()
+
+    def report(self, fd):
+        return list(self.zones)
+
+    def reset(self, fd, zone):
+        with self._lock:
+            self.write_pointers[zone.start] = zone.start
+            self.resets += 1
+
+    def write(self, fd, data, offset):
+        zone = self.zones[offset // ZONE_SIZE]
+        if zone.type != zoned.ZONE_TYPE_CONVENTIONAL:
+            with self._lock:
+                wp = self.write_pointers[zone.start]
+                if offset != wp or offset + len(data) > \
+                        zone.start + zone.capacity:
+                    raise OSError(errno.EIO, "Unaligned write command")
+                self.write_pointers[zone.start] = offset + len(data)
+        return os.pwrite(fd, data, offset)
+
+
+class TestZoned(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_file = tempfile.NamedTemporaryFile()
+        self.tmp_file.write(b"\xff" * 8 * ZONE_SIZE)
+        self.tmp_file.flush()
+        self.path = self.tmp_file.name
+
+    def tearDown(self):
+        self.tmp_file.close()
+
+    def test_overwrite_zones(self):
+        zones = FileZones(capacity=192 * 1024)
+        engine = zoned.ZonedOverwriteEngine(
+            self.path, pattern="zeros", chunk_size=CHUNK_SIZE,
+            zones_in_flight=3, zones=zones)
+
+        self.assertTrue(asyncio.run(engine.run()), engine.error)
+        self.assertEqual(8, engine.zones_written)
+        self.assertEqual(7, zones.resets)
+        data = Path(self.path).read_bytes()
+        # Only the capacity of each zone is writable.
+        for zone in zones.zones:
+            self.assertEqual(
+                b"\0" * zone.capacity,
+                data[zone.start:zone.start + zone.capacity])
+        self.assertEqual(ZONE_SIZE + 7 * 192 * 1024, engine.bytes_written)
+
+    def test_random_writes_rejected(self):
+        zones = FileZones()
+        fd = os.open(self.path, os.O_WRONLY)
+        try:
+            with self.assertRaises(OSError):
+                zones.write(fd, b"\0" * CHUNK_SIZE, ZONE_SIZE)
+        finally:
+            os.close(fd)
+
+    def test_readonly_zones_fail(self):
+        engine = zoned.ZonedOverwriteEngine(
+            self.path, pattern="zeros", chunk_size=CHUNK_SIZE,
+            zones=FileZones(readonly=(3,)))
+
+        self.assertFalse(asyncio.run(engine.run()))
+        self.assertIn("read-only", engine.error)
+
+    def test_plan_zoned_device(self):
+        device = schemas.Device(storage_medium="HDD")
+        device.capabilities.queue = schemas.QueueCapabilities(
+            zoned="host-managed", write_zeroes_max_bytes=33553920)
+
+        plan = planner.plan("/dev/sdb", ENHANCED, device, 8 * ZONE_SIZE)
+        self.assertEqual(['zoned'] * 3, [s.tool for s in plan.steps])
+
+        device.storage_medium = "SSD"
+        plan = planner.plan("/dev/nvme0n2", BASIC, device, 8 * ZONE_SIZE)
+        self.assertEqual('nvme', plan.steps[0].tool)
+        self.assertEqual(['zoned'], plan.steps[0].fallback)
+
+
+if __name__ == '__main__':
+    unittest.main()
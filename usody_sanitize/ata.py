@@ -0,0 +1,295 @@
+"""
+ATA
+===
+
+Firmware erasures of ATA devices with `hdparm`. The identify data
+(`hdparm -I`) tells which of them are supported and how long the device
+expects them to take:
+
+- Sanitize feature set: `CRYPTO SCRAMBLE`, `BLOCK ERASE` and
+  `OVERWRITE`. They run in the background on the device, so they are
+  started and then the progress is polled with `--sanitize-status`.
+- Security feature set: `SECURITY ERASE UNIT`, normal or enhanced, with
+  the time estimated by the device. It blocks until the erasure ends and
+  it can not be used when the security is frozen.
+"""
+import asyncio
+import logging
+import re
+import time
+from typing import List, Optional, Tuple
+
+from usody_sanitize import schemas, commands, metrics, utils
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+SANITIZE_CRYPTO = "sanitize-crypto"
+SANITIZE_BLOCK = "sanitize-block"
+SANITIZE_OVERWRITE = "sanitize-overwrite"
+SECURITY_ERASE_ENHANCED = "security-erase-enhanced"
+SECURITY_ERASE = "security-erase"
+
+# `hdparm` options of each sanitize action.
+SANITIZE_OPTIONS = {
+    SANITIZE_CRYPTO: "--sanitize-crypto-scramble",
+    SANITIZE_BLOCK: "--sanitize-block-erase",
+    SANITIZE_OVERWRITE: "--sanitize-overwrite hex:00000000",
+}
+# Seconds used when the device does not report the estimate.
+DEFAULT_ESTIMATES = {
+    SANITIZE_CRYPTO: 60,
+    SANITIZE_BLOCK: 10 * 60,
+    SECURITY_ERASE_ENHANCED: 60 * 60,
+    SECURITY_ERASE: 2 * 60 * 60,
+    SANITIZE_OVERWRITE: 24 * 60 * 60,
+}
+# Preferred order when the estimates are equal: crypto erases first.
+RANK = [
+    SANITIZE_CRYPTO,
+    SECURITY_ERASE_ENHANCED,
+    SANITIZE_BLOCK,
+    SECURITY_ERASE,
+    SANITIZE_OVERWRITE,
+]
+
+# Sanitize device states printed by `hdparm --sanitize-status`.
+STATE_IDLE = 0
+STATE_FROZEN = 1
+STATE_IN_PROCESS = 2
+STATE_FAILED = 3
+STATE_SUCCEEDED = 4
+
+# Temporal password used by the security erase.
+PASSWORD = "Usody"
+
+
+def _minutes(text: Optional[str]) -> Optional[int]:
+    return int(text) * 60 if text else None
+
+
+def parse_identify(output: str) -> Optional[schemas.AtaCapabilities]:
+    """Parses the features and the erase estimates of `hdparm -I`, None
+    if it is not an ATA device.
+    """
+    if not output or "ATA device" not in output:
+        return None
+
+    security = output.split("Security:", 1)[1] if "Security:" in output \
+        else ""
+    # E.g.: `2min for SECURITY ERASE UNIT. 2min for ENHANCED SECURITY ...`
+    # Large disks report the maximum, `more than 508min for ...`.
+    normal = re.search(r"(more than )?(\d+)min for SECURITY ERASE UNIT",
+                       security)
+    enhanced = re.search(
+        r"(more than )?(\d+)min for ENHANCED SECURITY ERASE UNIT", security)
+
+    return schemas.AtaCapabilities(
+        security=bool(re.search(r"^\s*supported\s*$", security, re.M)),
+        frozen=bool(re.search(r"^\s*frozen\s*$", security, re.M)),
+        enhanced_erase="supported: enhanced erase" in security,
+        security_erase_time=_minutes(normal and normal.group(2)),
+        enhanced_erase_time=_minutes(enhanced and enhanced.group(2)),
+        security_erase_time_capped=bool(normal and normal.group(1)),
+        enhanced_erase_time_capped=bool(enhanced and enhanced.group(1)),
+        sanitize="SANITIZE feature set" in output,
+        crypto_scramble="CRYPTO SCRAMBLE EXT command" in output,
+        block_erase="BLOCK ERASE EXT command" in output,
+        overwrite="OVERWRITE EXT command" in output,
+        trusted_computing="Trusted Computing feature set" in output,
+    )
+
+
+def get_capabilities(dev_path: str) -> Optional[schemas.AtaCapabilities]:
+    return parse_identify(commands.get_hdparm_identify(dev_path))
+
+
+def estimate(capabilities: schemas.AtaCapabilities, action: str) -> int:
+    """Seconds expected for the action. The device only estimates the
+    security erases, a sanitize block erase or overwrite takes about
+    the same as the enhanced or normal erase of the same device. A
+    capped estimate is the least time of the action.
+    """
+    return _reported(capabilities, action)[0] or DEFAULT_ESTIMATES[action]
+
+
+def _reported(capabilities: schemas.AtaCapabilities,
+              action: str) -> Tuple[Optional[int], bool]:
+    if action in (SECURITY_ERASE_ENHANCED, SANITIZE_BLOCK):
+        return (capabilities.enhanced_erase_time,
+                capabilities.enhanced_erase_time_capped)
+    if action in (SECURITY_ERASE, SANITIZE_OVERWRITE):
+        return (capabilities.security_erase_time,
+                capabilities.security_erase_time_capped)
+    return None, False
+
+
+def timeout(capabilities: Optional[schemas.AtaCapabilities],
+            action: str) -> Optional[float]:
+    """Seconds to wait for the action, None without a limit when the
+    device only reports that it takes more than its maximum estimate.
+    """
+    if capabilities is None:
+        return settings.ata_min_timeout
+    if _reported(capabilities, action)[1]:
+        return None
+    return max(settings.ata_min_timeout,
+               estimate(capabilities, action) * settings.ata_timeout_factor)
+
+
+def erase_issued(step_commands: List[schemas.Exec]) -> bool:
+    """A SECURITY ERASE UNIT was sent to the device. Until it finishes
+    the drive is busy and locked, no other action can be tried.
+    """
+    return any("--security-erase" in cmd.command for cmd in step_commands)
+
+
+def plan_actions(
+        capabilities: Optional[schemas.AtaCapabilities],
+) -> List[str]:
+    """Supported erasure actions, the fastest first. Without the
+    identify data only the security erase is tried, as before knowing
+    the capabilities.
+    """
+    if capabilities is None:
+        return [SECURITY_ERASE]
+
+    security = capabilities.security and not capabilities.frozen
+    supported = {
+        SANITIZE_CRYPTO: capabilities.sanitize
+        and capabilities.crypto_scramble,
+        SANITIZE_BLOCK: capabilities.sanitize and capabilities.block_erase,
+        SANITIZE_OVERWRITE: capabilities.sanitize and capabilities.overwrite,
+        SECURITY_ERASE_ENHANCED: security and capabilities.enhanced_erase,
+        SECURITY_ERASE: security,
+    }
+    actions = [action for action in RANK if supported[action]]
+    return sorted(actions, key=lambda a: (
+        estimate(capabilities, a), RANK.index(a)))
+
+
+def parse_sanitize_status(output: str) -> dict:
+    """Parses `hdparm --sanitize-status`, the progress is the numerator
+    of a fraction of 65536.
+    """
+    state = re.search(r"SD(\d)", output or "")
+    progress = re.search(r"Progress:\s*0x([0-9a-fA-F]+)", output or "")
+    return {
+        'state': int(state.group(1)) if state else None,
+        'progress': int(progress.group(1), 16) if progress else None,
+        'completed': "Completed Without Error" in (output or ""),
+    }
+
+
+async def sanitize(
+        dev_path: str,
+        action: str,
+        step_commands: List[schemas.Exec],
+        poll_interval: float = settings.ata_poll_interval,
+        timeout_seconds: Optional[float] = settings.ata_min_timeout,
+) -> bool:
+    """Starts a sanitize action and waits polling its status, without a
+    limit if `timeout_seconds` is None.
+    """
+    device_metrics = metrics.registry.device(dev_path)
+    cmd = await commands.erasure_command(
+        f"hdparm --yes-i-know-what-i-am-doing"
+        f" {SANITIZE_OPTIONS[action]} {dev_path}")
+    cmd.description = f"Start the {action} on the device."
+    step_commands.append(cmd)
+    if not cmd.success:
+        return False
+
+    # Only the first and the last poll are kept on the report.
+    first_poll = last_poll = None
+    loop = asyncio.get_running_loop()
+    deadline = None if timeout_seconds is None \
+        else loop.time() + timeout_seconds
+    while True:
+        await asyncio.sleep(poll_interval)
+        last_poll = await commands.erasure_command(
+            f"hdparm --sanitize-status {dev_path}")
+        first_poll = first_poll or last_poll
+        status = parse_sanitize_status(last_poll.stdout)
+
+        if status['state'] == STATE_IN_PROCESS:
+            if status['progress'] is not None:
+                device_metrics.update_progress(status['progress'], 65536)
+            if deadline is not None and loop.time() > deadline:
+                last_poll.success = False
+                last_poll.description = "Sanitize timed out."
+                break
+            continue
+
+        last_poll.success = last_poll.success and (
+            status['state'] == STATE_SUCCEEDED or status['completed'])
+        last_poll.description = "Sanitize finished on state" \
+                                f" SD{status['state']}."
+        break
+
+    if first_poll is not last_poll:
+        first_poll.description = "Sanitize progress."
+        step_commands.append(first_poll)
+    step_commands.append(last_poll)
+    return last_poll.success
+
+
+async def security_erase(
+        dev_path: str,
+        step_commands: List[schemas.Exec],
+        enhanced: bool = False,
+        timeout_seconds: Optional[float] = settings.ata_min_timeout,
+) -> bool:
+    """Sets a temporal password and erases the device with SECURITY
+    ERASE UNIT, it fails if the security is frozen or the erase does not
+    finish in `timeout_seconds`, None without a limit.
+    """
+    cmd1 = await commands.erasure_command(f"hdparm -I {dev_path}")
+    cmd1.description = "Verify that the SSD disc is not frozen."
+    cmd1.success = bool(utils.find_text("(not[\t ]*frozen)", cmd1.stdout))
+    step_commands.append(cmd1)
+    if cmd1.success is False:
+        return False
+
+    cmd2 = await commands.erasure_command(
+        f"hdparm --user-master u --security-set-pass {PASSWORD} {dev_path}")
+    cmd2.description = "Set a temporal password to lock the device."
+    cmd2.success = cmd2.return_code == 0
+    step_commands.append(cmd2)
+    if cmd2.success is False:
+        return False
+
+    option = "--security-erase-enhanced" if enhanced else "--security-erase"
+    command = f"hdparm --user-master {option} {PASSWORD} {dev_path}"
+    try:
+        cmd3 = await asyncio.wait_for(
+            commands.erasure_command(command), timeout_seconds)
+    except asyncio.TimeoutError:
+        cmd3 = schemas.Exec(command=command)
+        cmd3.end_time = time.time()
+        cmd3.description = "Security erase timed out after" \
+                           f" {timeout_seconds} seconds. hdparm was" \
+                           " killed, but that does not abort the" \
+                           " SECURITY ERASE UNIT command: the drive" \
+                           " keeps erasing and stays locked with the" \
+                           f" temporal password `{PASSWORD}` until it" \
+                           " finishes."
+        cmd3.success = False
+        step_commands.append(cmd3)
+        logger.error(f"{dev_path}: {cmd3.description}")
+        return False
+    cmd3.description = "Erase the SSD changing the encryption key."
+    cmd3.success = cmd3.return_code == 0 or cmd3.return_code == 22
+    step_commands.append(cmd3)
+    if cmd3.success is False:
+        return False
+
+    cmd4 = await commands.erasure_command(f"hdparm -I {dev_path}")
+    cmd4.description = "Check the drive security is set to disabled"
+    # Todo: Enable this pre-validation.
+    # if utils.find_text(" *(not *enabled) *", cmd4.output):
+    #     cmd4.success = True
+    # else:
+    #     cmd4.success = False
+    step_commands.append(cmd4)
+    return all(cmd.success for cmd in (cmd1, cmd2, cmd3, cmd4))
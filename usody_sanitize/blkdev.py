@@ -0,0 +1,127 @@
+"""
+Block Device
+============
+
+Erasures offloaded to the device through the kernel block layer
+ioctls, and the capabilities of the device queue to know which of them
+are supported.
+
+- `BLKSECDISCARD`: discards the blocks and erases any copy of them.
+- `BLKDISCARD`: discards the blocks, the data is not guaranteed to be
+  erased, only used before another erasure.
+- `BLKZEROOUT`: writes zeros, offloaded to the device (WRITE ZEROES /
+  WRITE SAME) when supported, otherwise the kernel writes them.
+"""
+import asyncio
+import fcntl
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Optional, Union
+
+from usody_sanitize import schemas, metrics
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# linux/fs.h
+BLKDISCARD = 0x1277
+BLKSECDISCARD = 0x127D
+BLKZEROOUT = 0x127F
+
+OPERATIONS = {
+    'blkdiscard': BLKDISCARD,
+    'blksecdiscard': BLKSECDISCARD,
+    'blkzeroout': BLKZEROOUT,
+}
+
+
+def get_queue_capabilities(
+        dev_path: Union[str, Path],
+        sys_block: Union[str, Path] = "/sys/block",
+) -> schemas.QueueCapabilities:
+    """Reads the discard and write zeroes limits and the zoned model of
+    the device from `/sys/block/<dev>/queue`. Missing values are left as
+    their defaults.
+    """
+    queue = Path(sys_block) / Path(dev_path).name / "queue"
+    values = {}
+    for field, info in schemas.QueueCapabilities.model_fields.items():
+        try:
+            with open(queue / field) as _fh:
+                values[field] = info.annotation(_fh.read().strip())
+        except (OSError, ValueError):
+            pass
+    return schemas.QueueCapabilities(**values)
+
+
+class RangeOperation:
+    """Runs a block ioctl over the whole device in ranges, to report
+    the progress and allow cancelling it between ranges.
+
+    :param str dev_path: Path to the device.
+    :param str operation: `blkdiscard`, `blksecdiscard` or `blkzeroout`.
+    :param int range_size: Bytes of each ioctl request.
+
+    Example:
+    >>> await RangeOperation("/dev/sda", "blkzeroout").run()
+    """
+
+    def __init__(
+            self,
+            dev_path: str,
+            operation: str,
+            range_size: int = settings.ioctl_range_size,
+    ):
+        self.dev_path = dev_path
+        self.operation = operation
+        self.request = OPERATIONS[operation]
+        self.range_size = range_size
+        self.size: Optional[int] = None
+        self.bytes_done = 0
+        self.error: Optional[str] = None
+        self._metrics = metrics.registry.device(dev_path)
+        self._cancelled = threading.Event()
+
+    async def run(self) -> bool:
+        """Returns True if the operation finished on the whole device."""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, self._run)
+        except asyncio.CancelledError:
+            self._cancelled.set()
+            raise
+
+    def _run(self) -> bool:
+        try:
+            fd = os.open(self.dev_path, os.O_WRONLY)
+        except OSError as ex:
+            self.error = str(ex)
+            return False
+
+        try:
+            self.size = os.lseek(fd, 0, os.SEEK_END)
+            while self.bytes_done < self.size:
+                if self._cancelled.is_set():
+                    self.error = "Cancelled."
+                    return False
+
+                length = min(self.range_size, self.size - self.bytes_done)
+                fcntl.ioctl(fd, self.request,
+                            struct.pack("QQ", self.bytes_done, length))
+                self.bytes_done += length
+                self._metrics.update_progress(self.bytes_done, self.size)
+
+            os.fsync(fd)
+        except OSError as ex:
+            # EOPNOTSUPP when the device does not support the operation.
+            self.error = str(ex)
+            logger.warning(f"{self.dev_path}: {self.operation} failed at"
+                           f" byte {self.bytes_done}: {ex}")
+            return False
+        finally:
+            os.close(fd)
+
+        return True
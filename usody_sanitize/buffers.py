@@ -0,0 +1,227 @@
+"""
+Buffers
+=======
+
+Pool of the page aligned buffers used for the in-process I/O of all the
+devices, under a memory budget for the whole station. Diskless stations
+boot from RAM, so 60 drives written at once with large buffers each
+could run out of memory.
+
+- The buffers are anonymous maps, page aligned as required by
+  `O_DIRECT`, optionally backed by huge pages. They are reused between
+  passes and devices instead of allocated on each one.
+- Each lease gets a buffer of at most a fair share of the budget, the
+  chunk size shrinks down to `buffer_pool_min_chunk_size` as more
+  devices are written at the same time. The holders of larger buffers
+  swap them on their next chunk.
+- When the budget is exhausted, a lease waits until a buffer is returned
+  instead of allocating more memory.
+- Buffers shared by many writers, like the tables of the fixed
+  patterns, are reserved with their exact size. They are charged to the
+  budget and lower the share of the leases while they are mapped.
+"""
+import collections
+import contextlib
+import logging
+import mmap
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# linux/mman.h, not exported by the `mmap` module.
+MAP_HUGETLB = 0x40000
+HUGE_PAGE_SIZE = 2 * 1024 * 1024
+
+
+class Lease:
+    """Buffer of a writer, resized to its share of the budget of the pool
+    before each chunk.
+    """
+
+    def __init__(self, pool: "BufferPool", preferred: int,
+                 cancelled: Optional[threading.Event] = None,
+                 node: Optional[int] = None):
+        self.pool = pool
+        self.preferred = preferred
+        self.cancelled = cancelled
+        self.node = node
+        self._buffer: Optional[mmap.mmap] = None
+        self._view: Optional[memoryview] = None
+
+    def get(self) -> Optional[memoryview]:
+        """View of the buffer for the next chunk, the same one while the
+        share does not change. None if the lease is cancelled while
+        waiting for the budget.
+        """
+        size = self.pool.chunk_size(self.preferred)
+        if self._view is not None and len(self._view) == size:
+            return self._view
+        with self.pool._condition:
+            self.release()
+            self._buffer = self.pool._take(
+                self.preferred, self.cancelled, self.node)
+        if self._buffer is not None:
+            self._view = memoryview(self._buffer)
+        return self._view
+
+    def release(self) -> None:
+        with self.pool._condition:
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            if self._buffer is not None:
+                self.pool._free[len(self._buffer), self.node].append(
+                    self._buffer)
+                self._buffer = None
+                self.pool._condition.notify_all()
+
+
+class BufferPool:
+    """Page aligned buffers shared by all the devices.
+
+    :param int budget: Bytes of all the buffers allocated at once.
+    :param int min_size: Smallest buffer given to a lease.
+    :param bool hugepages: Back the buffers with huge pages when
+        possible.
+
+    Example:
+    >>> with pool.lease(4 * 1024 * 1024) as lease:
+    ...     while offset < end:
+    ...         offset += os.pwrite(fd, lease.get(), offset)
+    """
+
+    def __init__(
+            self,
+            budget: int = settings.buffer_pool_budget,
+            min_size: int = settings.buffer_pool_min_chunk_size,
+            hugepages: bool = settings.buffer_pool_hugepages,
+    ):
+        self.budget = budget
+        self.min_size = min_size
+        self.hugepages = hugepages
+        # Bytes mapped, leased, reserved or free.
+        self.allocated = 0
+        self.leases = 0
+        # Bytes of the reserved buffers, mapped or waiting for the budget.
+        self.reserved = 0
+        # Free buffers by size and NUMA node of their pages.
+        self._free: Dict[Tuple[int, Optional[int]], List[mmap.mmap]] = \
+            collections.defaultdict(list)
+        self._condition = threading.Condition(threading.RLock())
+
+    def chunk_size(self, preferred: int) -> int:
+        """Size of the buffer of a lease, its fair share of the budget, a
+        multiple of the minimum size.
+        """
+        share = (self.budget - self.reserved) // max(self.leases, 1)
+        size = min(preferred, share) // self.min_size * self.min_size
+        return max(size, self.min_size)
+
+    @contextlib.contextmanager
+    def lease(
+            self,
+            preferred: int,
+            cancelled: Optional[threading.Event] = None,
+            node: Optional[int] = None,
+    ):
+        """Leases buffers of at most `preferred` bytes, see `Lease`. With
+        a NUMA `node` the buffers are only reused by the leases of the
+        same node.
+        """
+        with self._condition:
+            self.leases += 1
+        lease = Lease(self, preferred, cancelled, node)
+        try:
+            yield lease
+        finally:
+            lease.release()
+            with self._condition:
+                self.leases -= 1
+                self._condition.notify_all()
+
+    @contextlib.contextmanager
+    def reserve(
+            self,
+            size: int,
+            cancelled: Optional[threading.Event] = None,
+    ):
+        """Maps a buffer of `size` bytes out of the leases, unmapped on
+        exit. It yields None if `cancelled` is set while waiting for the
+        budget.
+        """
+        buffer = None
+        try:
+            with self._condition:
+                # The leases swap to smaller buffers on their next chunk.
+                self.reserved += size
+                while True:
+                    self._release(size)
+                    if self.allocated + size <= self.budget \
+                            or not self.allocated:
+                        buffer = self._allocate(size)
+                        self.allocated += size
+                        break
+                    if cancelled is not None and cancelled.is_set():
+                        break
+                    self._condition.wait(1)
+            yield buffer
+        finally:
+            with self._condition:
+                self.reserved -= size
+                if buffer is not None:
+                    buffer.close()
+                    self.allocated -= size
+                self._condition.notify_all()
+
+    def _take(
+            self,
+            preferred: int,
+            cancelled: Optional[threading.Event],
+            node: Optional[int] = None,
+    ) -> Optional[mmap.mmap]:
+        while True:
+            size = self.chunk_size(preferred)
+            if self._free[size, node]:
+                return self._free[size, node].pop()
+            self._release(size)
+            if self.allocated + size <= self.budget or not self.allocated:
+                buffer = self._allocate(size)
+                self.allocated += size
+                return buffer
+            if cancelled is not None and cancelled.is_set():
+                return None
+            self._condition.wait(1)
+
+    def _release(self, size: int) -> None:
+        """Unmaps other free buffers until `size` fits."""
+        for (other, _), buffers in self._free.items():
+            while buffers and self.allocated + size > self.budget:
+                buffers.pop().close()
+                self.allocated -= other
+
+    def _allocate(self, size: int) -> mmap.mmap:
+        if self.hugepages and size % HUGE_PAGE_SIZE == 0:
+            try:
+                return mmap.mmap(
+                    -1, size,
+                    flags=mmap.MAP_PRIVATE | mmap.MAP_ANONYMOUS | MAP_HUGETLB)
+            except OSError as ex:
+                logger.debug(f"Huge pages not reserved ({ex}), using"
+                             f" transparent huge pages.")
+            buffer = mmap.mmap(-1, size)
+            with contextlib.suppress(AttributeError, OSError):
+                buffer.madvise(mmap.MADV_HUGEPAGE)
+            return buffer
+        # Anonymous maps are page aligned and filled with zeros.
+        return mmap.mmap(-1, size)
+
+    def clear(self) -> None:
+        """Unmaps the free buffers."""
+        with self._condition:
+            self._release(self.budget + 1)
+
+
+pool = BufferPool()
@@ -1,30 +1,54 @@
 import argparse
 import asyncio
+import contextlib
 import datetime
 import json
 import logging
 import pathlib
+import signal
 import sys
+from typing import Optional
 
 try:
-    from usody_sanitize.erasure import DefaultMethods, auto_erase_disks
+    from usody_sanitize.erasure import (
+        DefaultMethods, auto_erase_disks, plan_disks)
 except ModuleNotFoundError:
     sys.path.append(
         pathlib.Path(__file__).parent.parent.absolute().as_posix()
     )
-    from usody_sanitize.erasure import DefaultMethods, auto_erase_disks
+    from usody_sanitize.erasure import (
+        DefaultMethods, auto_erase_disks, plan_disks)
 
 from usody_sanitize import __version__ as app_version
+from usody_sanitize import metrics, tracing
+from usody_sanitize.config import settings
+from usody_sanitize.store import JobStore
 
 logging.getLogger("CMD")
 
 
-def parse_args():
+def add_store_args(parser, subcommand=False):
+    """Options of the output path and the job store, shared by the
+    subcommands. Given after a subcommand, they override the ones given
+    before it.
+    """
+    parser.add_argument('-o', '--output',
+                        default=argparse.SUPPRESS if subcommand else ".",
+                        help='set the output path to save the log file'
+                             ' and the job store')
+    parser.add_argument('--database',
+                        default=argparse.SUPPRESS if subcommand else None,
+                        help='path to the job store database'
+                             f' (default: <output>/{settings.database_name})')
+
+
+def parse_args(argv=None):
     parser = argparse.ArgumentParser(description='sanitize a disk')
     parser.add_argument('-m', '--method', type=str, help='sanitize method',
-                        choices=['BASIC', 'BASELINE', 'ENHANCED'])
+                        choices=[m.name for m in DefaultMethods])
 
-    disk = parser.add_mutually_exclusive_group(required=True)
+    # Required without a subcommand, checked after parsing.
+    disk = parser.add_mutually_exclusive_group()
     disk.add_argument('-d', '--device', type=str, action='append',
                       help='path to the /dev/{disk} E.G.: /dev/sda')
     disk.add_argument('-a', '--all', action='store_true',
@@ -33,6 +57,14 @@ def parse_args():
     parser.add_argument('--confirm', action='store_const', const=True,
                         help='confirm to sanitize disks before proceed')
 
+    parser.add_argument('--dry-run', dest='dry_run', action='store_true',
+                        help='only read the disks to predict the duration'
+                             ' of the erasures, nothing is written')
+    parser.add_argument('-j', '--jobs', type=int, default=None,
+                        help='maximum erasures running at the same time,'
+                             ' 0 means no limit'
+                             f' (default: {settings.max_jobs})')
+
     parser.add_argument('--version', action='version', version=app_version,
                         help='show the version of usody_sanitize')
 
@@ -41,20 +73,125 @@ def parse_args():
                                  'CRITICAL'],
                         help='set the logging level (default: %(default)s)')
 
-    parser.add_argument('-o', '--output', default=".",
-                        help='set the output path to save the log file')
+    add_store_args(parser)
+
+    parser.add_argument('--metrics-port', type=int, default=None,
+                        help='serve Prometheus metrics on this local port')
+    parser.add_argument('--metrics-address', default='127.0.0.1',
+                        help='address of the metrics endpoint'
+                             ' (default: %(default)s)')
+    parser.add_argument('--metrics-textfile', default=None,
+                        help='write Prometheus metrics periodically into'
+                             ' this file for the textfile collector')
+
+    parser.add_argument('--tune-queue', dest='tune_queue',
+                        action='store_true',
+                        help='tune the block queue of the disks for the'
+                             ' erasure, the original values are restored')
+
+    parser.add_argument('--write-cache', dest='write_cache',
+                        action='store_true',
+                        help='enable the volatile write cache of the disks'
+                             ' for the erasure, flushing it at the end of'
+                             ' each pass, the original setting is restored')
+
+    parser.add_argument('--no-numa', dest='numa_affinity',
+                        action='store_false',
+                        help='do not pin the erasure of each disk to the'
+                             ' NUMA node of its controller')
+
+    parser.add_argument('--pattern-producers', dest='pattern_producers',
+                        type=int, default=None, metavar='N',
+                        help='processes generating the random data of the'
+                             ' native overwrite, -1 one per core')
+
+    parser.add_argument('--psid', action='append', default=[],
+                        metavar='SERIAL=PSID',
+                        help='PSID of a self encrypting drive to revert it'
+                             ' even when it is owned, can be repeated')
+
+    parser.add_argument('--trace', default=None, metavar='FILE',
+                        help='save the timing of each phase as a Chrome'
+                             ' trace JSON file')
+    parser.add_argument('--profile', action='store_true',
+                        help='profile CPU time and memory, the results are'
+                             ' saved in the output path')
+
+    subcommands = parser.add_subparsers(dest='command', metavar='command')
+    history = subcommands.add_parser(
+        'history', help='query the sanitize history from the job store',
+        description='query the sanitize history from the job store')
+    history.add_argument('--serial', type=str, help='disk serial number')
+    history.add_argument('--wwn', type=str, help='disk World Wide Name')
+    history.add_argument('--model', type=str, help='disk model')
+    history.add_argument('--date', type=str, help='date as YYYY-MM-DD')
+    history.add_argument('--result', choices=['pass', 'fail'],
+                         help='only show passed or failed erasures')
+    history.add_argument('--limit', type=int, default=50,
+                         help='maximum records to show'
+                              ' (default: %(default)s)')
+    history.add_argument('--report', type=int, metavar='ID',
+                         help='print the full report with the given id')
+    history.add_argument('--json', action='store_true',
+                         help='print the records as JSON')
+    add_store_args(history, subcommand=True)
 
-    return parser.parse_args()
+    args = parser.parse_args(argv)
+    if args.command is None and not (args.device or args.all):
+        parser.error('one of the arguments -d/--device -a/--all is'
+                     ' required')
+    return args
 
 
 def run_cmd():
     args = parse_args()
+    if args.command == 'history':
+        return run_history(args)
+
     configure_loggers(args.log_level)
 
+    profiler = tracing.Profiler(args.output) if args.profile \
+        else contextlib.nullcontext()
+    with profiler:
+        if args.dry_run:
+            run_dry_run(args)
+        else:
+            run_erasures(args)
+
+    if args.trace:
+        tracing.write_chrome_trace(args.trace)
+
+
+def run_erasures(args):
+    station_tracer = tracing.Tracer("station")
+    settings.queue_tuning = settings.queue_tuning or args.tune_queue
+    settings.write_cache = settings.write_cache or args.write_cache
+    settings.numa_affinity = settings.numa_affinity and args.numa_affinity
+    if args.pattern_producers is not None:
+        settings.pattern_producers = args.pattern_producers
+    for psid in args.psid:
+        serial_number, _, value = psid.partition('=')
+        settings.sed_psids[serial_number] = value
+
+    # Expose the metrics while the erasures are running.
+    if args.metrics_port:
+        metrics.start_http_server(args.metrics_port, args.metrics_address)
+    textfile_writer = metrics.TextfileWriter(
+        args.metrics_textfile, settings.metrics_textfile_interval
+    ).start() if args.metrics_textfile else None
+
     # Run erasures.
-    result = run_coroutine(
-        auto_erase_disks(args.method, args.device, confirm=args.confirm)
-    )
+    history = open_history(args)
+    try:
+        result = run_coroutine(
+            auto_erase_disks(args.method, args.device, confirm=args.confirm,
+                             jobs=args.jobs, history=history)
+        )
+    finally:
+        if history:
+            history.close()
+        if textfile_writer:
+            textfile_writer.stop()
     logging.debug(json.dumps(result, indent=4))
 
     if not result:
@@ -69,12 +206,97 @@ def run_cmd():
     # Export the output to a file.
     for item in result:
         item_serial_number = item.get('device_info', {}).get('serial_number')
-        current_date = datetime.datetime.now().date().isoformat()
+        current_date = datetime.datetime.now().strftime("%Y-%m-%d_%H%M%S")
 
         file_name = f"{current_date}_{item_serial_number}.json"
-        with open(output_path / file_name, 'w') as _fh:
+        with station_tracer.span("serialization", file=file_name), \
+                open(output_path / file_name, 'w') as _fh:
             json.dump(item, _fh, indent=4)
 
+    # Record the results on the job store.
+    with station_tracer.span("job_store"), \
+            JobStore(get_database_path(args)) as store:
+        for item in result:
+            store.add(item)
+
+
+def run_dry_run(args):
+    history = open_history(args)
+    try:
+        result = run_coroutine(
+            plan_disks(args.method, args.device, args.jobs, history))
+    finally:
+        if history:
+            history.close()
+    logging.debug(json.dumps(result, indent=4))
+
+    for device in result['devices']:
+        rate = device['read_throughput']
+        print(f"{device['path']}  {device['model']}"
+              f"  {device['serial_number']}"
+              f"  {' '.join(s['tool'] for s in device['plan']['steps'])}"
+              f"  read {format_rate(rate.get('start'))}"
+              f" / {format_rate(rate.get('middle'))}"
+              f" / {format_rate(rate.get('end'))}"
+              f"  {format_duration(device['predicted_duration'])}")
+    print(f"Method {result['method']}, {len(result['devices'])} disks,"
+          f" {result['jobs'] or 'unlimited'} jobs:"
+          f" {format_duration(result['predicted_duration'])}")
+
+
+def format_rate(rate) -> str:
+    return f"{(rate or 0) / 1000 ** 2:.0f} MB/s"
+
+
+def format_duration(seconds: float) -> str:
+    return str(datetime.timedelta(seconds=round(seconds)))
+
+
+def run_history(args):
+    database_path = get_database_path(args)
+    if not database_path.exists():
+        sys.exit(f"Job store `{database_path}` not found.")
+
+    with JobStore(database_path) as store:
+        if args.report is not None:
+            report = store.report(args.report)
+            if report is None:
+                sys.exit(f"Report {args.report} not found.")
+            print(json.dumps(report, indent=4))
+            return
+
+        records = store.history(
+            serial_number=args.serial,
+            wwn=args.wwn,
+            model=args.model,
+            date=args.date,
+            result=None if args.result is None else args.result == 'pass',
+            limit=args.limit,
+        )
+
+    if args.json:
+        print(json.dumps(records, indent=4))
+        return
+
+    for record in records:
+        created_at = datetime.datetime.fromtimestamp(record['created_at'])
+        print(f"{record['id']:>8}  {created_at:%Y-%m-%d %H:%M:%S}"
+              f"  {'PASS' if record['result'] else 'FAIL'}"
+              f"  {record['serial_number']}  {record['wwn'] or '-'}"
+              f"  {record['model']}  {record['method']}")
+
+
+def open_history(args) -> Optional[JobStore]:
+    """Opens the job store to predict the durations, if it exists."""
+    database_path = get_database_path(args)
+    return JobStore(database_path) if database_path.exists() else None
+
+
+def get_database_path(args) -> pathlib.Path:
+    if args.database:
+        return pathlib.Path(args.database)
+    return pathlib.Path(args.output) / settings.database_name
+
 
 def configure_loggers(level="INFO"):
     logging.basicConfig(
@@ -86,12 +308,23 @@ def configure_loggers(level="INFO"):
 
 
 def run_coroutine(coro):
-    """Forces to run the function in a new async loop."""
+    """Forces to run the function in a new async loop. `SIGINT`,
+    `SIGTERM` and `SIGHUP` cancel it, so the erasures stop their writes
+    and restore the devices.
+    """
     loop = asyncio.new_event_loop()
+    task = loop.create_task(coro)
+    signals = (signal.SIGINT, signal.SIGTERM, signal.SIGHUP)
+    for signum in signals:
+        loop.add_signal_handler(signum, task.cancel)
 
     try:
-        return loop.run_until_complete(coro)
+        return loop.run_until_complete(task)
+    except asyncio.CancelledError:
+        sys.exit("Process interrupted by a signal.")
     finally:
+        for signum in signals:
+            loop.remove_signal_handler(signum)
         loop.close()
 
 
@@ -1,12 +1,16 @@
 import asyncio
+import contextlib
 import json
 import logging
+import os
+import signal
 import subprocess
 import time
 from pathlib import Path
-from typing import Optional, List, Any
+from typing import Optional, List, Any, Dict
 
-from usody_sanitize import schemas, exceptions
+from usody_sanitize import schemas, exceptions, tracing, thermal, numa
+from usody_sanitize.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -41,15 +45,132 @@ class MountedVolumes:
         return False
 
 
+class ResourceMonitor:
+    """Samples from `/proc` the resources used by a running command and
+    all its child processes.
+
+    The asyncio event loop reaps the command when it ends, so the
+    `wait4` resource usage is not available; the values of each process
+    are kept from its last sample instead. They are lower bounds: the
+    CPU time and I/O of each process after its last sample are not
+    counted. The first samples are taken more often, so the short
+    commands are not recorded as using nothing.
+    """
+    clock_ticks = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+
+    def __init__(
+            self,
+            pid: int,
+            interval: float = settings.resource_sample_interval,
+    ):
+        self.pid = pid
+        self.interval = interval
+        self.samples = 0
+        self._processes: Dict[int, dict] = {}
+
+    async def run(self) -> None:
+        """Samples the process tree until it is cancelled, doubling the
+        time between samples up to `interval`.
+        """
+        delay = self.interval / 64
+        while True:
+            self.sample()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.interval)
+
+    def sample(self) -> None:
+        for pid in self._process_tree(self.pid):
+            usage = self._read_process(pid)
+            if usage:
+                self._processes[pid] = usage
+        self.samples += 1
+
+    def usage(self) -> schemas.ResourceUsage:
+        processes = self._processes.values()
+        return schemas.ResourceUsage(
+            cpu_user_time=sum(p['utime'] for p in processes),
+            cpu_system_time=sum(p['stime'] for p in processes),
+            max_rss=max((p['rss'] for p in processes), default=0),
+            read_bytes=sum(p['read_bytes'] for p in processes),
+            write_bytes=sum(p['write_bytes'] for p in processes),
+            samples=self.samples,
+        )
+
+    @staticmethod
+    def _process_tree(pid: int) -> List[int]:
+        pids = [pid]
+        for parent in pids:
+            try:
+                tasks = os.listdir(f"/proc/{parent}/task")
+            except OSError:
+                continue
+            for tid in tasks:
+                try:
+                    with open(f"/proc/{parent}/task/{tid}/children") as _fh:
+                        pids.extend(int(c) for c in _fh.read().split())
+                except (OSError, ValueError):
+                    pass
+        return pids
+
+    def _read_process(self, pid: int) -> Optional[dict]:
+        try:
+            with open(f"/proc/{pid}/stat") as _fh:
+                # The command name can contain spaces, skip it.
+                fields = _fh.read().rsplit(")", 1)[1].split()
+            usage = {
+                'utime': int(fields[11]) / self.clock_ticks,
+                'stime': int(fields[12]) / self.clock_ticks,
+                'rss': 0,
+                'read_bytes': 0,
+                'write_bytes': 0,
+            }
+
+            with open(f"/proc/{pid}/status") as _fh:
+                for line in _fh:
+                    if line.startswith("VmHWM:"):
+                        usage['rss'] = int(line.split()[1]) * 1024
+
+            # Per thread I/O does not include the waited children, they
+            # are sampled on their own.
+            for tid in os.listdir(f"/proc/{pid}/task"):
+                with open(f"/proc/{pid}/task/{tid}/io") as _fh:
+                    for line in _fh:
+                        key, value = line.split(":")
+                        if key in ('read_bytes', 'write_bytes'):
+                            usage[key] += int(value)
+        except (OSError, ValueError, IndexError):
+            # The process ended or /proc is not available.
+            return self._processes.get(pid)
+
+        return usage
+
+
+def _kill_tree(pid: int) -> None:
+    for child in reversed(ResourceMonitor._process_tree(pid)):
+        try:
+            os.kill(child, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
 def get_disks():
     """Simple way to get the disks that we support. """
     return [p for p in Path('/dev').glob('sd?')] + \
         [p for p in Path('/dev').glob('nvme?n?')]
 
 
+def _redact(text: Optional[str], redact: Dict[str, str]) -> Optional[str]:
+    for secret, placeholder in redact.items():
+        if text and secret:
+            text = text.replace(secret, placeholder)
+    return text
+
+
 async def erasure_command(
         command: str,
         process_manager: Optional[Any] = None,
+        redact: Optional[Dict[str, str]] = None,
+        pausable: bool = False,
 ) -> schemas.Exec:
     """Runs the command given, but it returns a `schemas.Exec`
     object with the command executed details.
@@ -58,24 +179,54 @@ async def erasure_command(
         on the system.
     :param process_manager: Async function to allow manipulating the
         command process while it is still running.
+    :param Dict[str, str] redact: Secrets of the command, like a PSID,
+        replaced by their placeholder in the recorded command, output
+        and trace span.
+    :param bool pausable: The command only overwrites the disk, it is
+        stopped while the device is hot. Firmware erasures, their polls
+        and the queries must not be stopped, it would count against
+        their timeouts.
 
     :return:
     """
     if isinstance(command, list):
         command = ' '.join(command)
-
-    cmd = schemas.Exec(command=command)
-    proc = await asyncio.create_subprocess_shell(
-        cmd.command,
-        stdout=asyncio.subprocess.PIPE,
-        stderr=asyncio.subprocess.PIPE,
-    )
-
-    if process_manager:
-        await process_manager(cmd, proc)
-
-    await proc.wait()
+    redact = redact or {}
+
+    cmd = schemas.Exec(command=_redact(command, redact))
+    with tracing.span(command.split(' ', 1)[0], tracing.COMMAND,
+                      command=cmd.command):
+        proc = await asyncio.create_subprocess_shell(
+            command,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+        )
+        # The processes it starts inherit the CPUs.
+        numa.pin(proc.pid, numa.current())
+        monitor = ResourceMonitor(proc.pid)
+        monitor_task = asyncio.create_task(monitor.run())
+
+        try:
+            if pausable:
+                paused = thermal.pausable(
+                    lambda: ResourceMonitor._process_tree(proc.pid))
+            else:
+                paused = contextlib.nullcontext()
+            with paused:
+                if process_manager:
+                    await process_manager(cmd, proc)
+
+                await proc.wait()
+        except asyncio.CancelledError:
+            # The erasure was aborted, do not leave the tool running,
+            # nor the commands of a pipeline.
+            if proc.returncode is None:
+                _kill_tree(proc.pid)
+            raise
+        finally:
+            monitor_task.cancel()
     cmd.end_time = time.time()
+    cmd.resource_usage = monitor.usage()
 
     if cmd.stdout is None:
         stdout = await proc.stdout.read()
@@ -84,6 +235,8 @@ async def erasure_command(
     if cmd.stderr is None:
         stderr = await proc.stderr.read()
         cmd.stderr = stderr.decode('UTF-8').rstrip()
+    cmd.stdout = _redact(cmd.stdout, redact)
+    cmd.stderr = _redact(cmd.stderr, redact)
 
     cmd.return_code = proc.returncode
     cmd.success = proc.returncode == 0
@@ -164,6 +317,121 @@ def get_smart_info(dev_path):
     return smart_json
 
 
+def get_nvme_id_ctrl(dev_path):
+    """
+    Get the NVMe controller identify data using
+    `nvme id-ctrl /dev/nvmeX --output-format=json`.
+
+    Args:
+        dev_path (str): Path to a NVMe device or controller
+
+    Returns:
+        dict: Identify controller data, empty if it is not available
+    """
+
+    # Build command
+    command = ["nvme", "id-ctrl", dev_path, "--output-format=json"]
+
+    # Run command
+    try:
+        proc = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=10,
+        )
+        return json.loads(proc.stdout.decode('utf-8').strip() or "{}")
+    except (OSError, ValueError, subprocess.TimeoutExpired) as ex:
+        logger.warning(f"{dev_path}: NVMe identify data not available: {ex}")
+        return {}
+
+
+def get_hdparm_identify(dev_path):
+    """
+    Get the ATA identify data of a device using `hdparm -I /dev/sdX`.
+
+    Args:
+        dev_path (str): Path to a device
+
+    Returns:
+        str: Output of hdparm, empty if it is not available
+    """
+
+    # Build command
+    command = ["hdparm", "-I", dev_path]
+
+    # Run command
+    try:
+        proc = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=10,
+        )
+        return proc.stdout.decode('utf-8', errors='replace')
+    except (OSError, subprocess.TimeoutExpired) as ex:
+        logger.warning(f"{dev_path}: ATA identify data not available: {ex}")
+        return ""
+
+
+def get_sg_opcodes(dev_path):
+    """
+    Get the operation codes supported by a SCSI device using
+    `sg_opcodes --no-inquiry /dev/sdX`.
+
+    Args:
+        dev_path (str): Path to a device
+
+    Returns:
+        str: Output of sg_opcodes, empty if it is not available
+    """
+
+    # Build command
+    command = ["sg_opcodes", "--no-inquiry", dev_path]
+
+    # Run command
+    try:
+        proc = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=10,
+        )
+        return proc.stdout.decode('utf-8', errors='replace')
+    except (OSError, subprocess.TimeoutExpired) as ex:
+        logger.warning(f"{dev_path}: SCSI operation codes not available: {ex}")
+        return ""
+
+
+def get_sed_discovery(dev_path):
+    """
+    Get the TCG Level 0 discovery of a device using
+    `sedutil-cli --isValidSED /dev/sdX`.
+
+    Args:
+        dev_path (str): Path to a device
+
+    Returns:
+        str: Output of sedutil-cli, empty if it is not available
+    """
+
+    # Build command
+    command = ["sedutil-cli", "--isValidSED", dev_path]
+
+    # Run command
+    try:
+        proc = subprocess.run(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            timeout=10,
+        )
+        return proc.stdout.decode('utf-8', errors='replace')
+    except (OSError, subprocess.TimeoutExpired) as ex:
+        logger.warning(f"{dev_path}: TCG discovery not available: {ex}")
+        return ""
+
+
 def get_lsblk_info(dev_path):
     """
     Get device information using `lsblk -JOad /dev/sdexample`.
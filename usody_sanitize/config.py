@@ -1,8 +1,130 @@
+from typing import Dict
+
 from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
     sectors_to_validate: int = 10
 
+    # Job store.
+    database_name: str = "sanitize.db"
+    store_batch_size: int = 500
+    # Past erasures used to predict the throughput of a drive.
+    history_samples: int = 10
+
+    # Seconds between samples of the resources used by each command.
+    resource_sample_interval: float = 1
+
+    # Device I/O statistics sampled on each step.
+    iostats_interval: float = 1
+    iostats_max_points: int = 300
+
+    # Write performance per disk region.
+    heatmap_buckets: int = 100
+    heatmap_min_regions: int = 10
+    degraded_zone_ratio: float = 0.5
+
+    # In-process overwrite engine.
+    engine_chunk_size: int = 4 * 1024 * 1024
+    # Bytes of all the I/O buffers of the station, the chunks shrink
+    # down to the min size as more devices are written at once.
+    buffer_pool_budget: int = 1024 * 1024 * 1024
+    buffer_pool_min_chunk_size: int = 256 * 1024
+    buffer_pool_hugepages: bool = False
+    # Processes generating the random patterns of the engine, 0 uses
+    # the writing threads and -1 one process per core. They fill rings
+    # of `pattern_ring_depth` slots on an arena of shared memory.
+    pattern_producers: int = 0
+    pattern_arena_size: int = 256 * 1024 * 1024
+    pattern_ring_depth: int = 4
+    # Zones of a zoned device written at the same time.
+    zoned_zones_in_flight: int = 4
+
+    # Bytes of each discard / zero out ioctl request.
+    ioctl_range_size: int = 1024 * 1024 * 1024
+
+    # NVMe sanitize.
+    nvme_poll_interval: float = 10
+    nvme_sanitize_timeout: float = 24 * 60 * 60
+
+    # ATA sanitize, the timeout is the estimate of the device multiplied
+    # by the factor, or the minimum if it is lower.
+    ata_poll_interval: float = 10
+    ata_timeout_factor: float = 2
+    ata_min_timeout: float = 30 * 60
+
+    # SCSI sanitize and format unit.
+    scsi_poll_interval: float = 10
+    scsi_timeout: float = 24 * 60 * 60
+
+    # PSIDs of self encrypting drives by serial number.
+    sed_psids: Dict[str, str] = {}
+
+    # Throughput assumed by the planner to estimate the cost of each
+    # implementation, bytes per second.
+    planner_hdd_throughput: float = 120 * 1000 ** 2
+    planner_ssd_throughput: float = 400 * 1000 ** 2
+    planner_write_zeroes_throughput: float = 4 * 1000 ** 3
+    planner_discard_throughput: float = 50 * 1000 ** 3
+
+    # Erasures running at the same time, 0 means no limit.
+    max_jobs: int = 0
+
+    # Bytes read at each position of the device by the dry run.
+    dry_run_sample_size: int = 64 * 1024 * 1024
+
+    # SMART health polled during the erasure, a counter growing by its
+    # threshold aborts the erasure, 0 disables the threshold.
+    smart_poll_interval: float = 600
+    smart_poll_timeout: float = 60
+    smart_max_concurrent_polls: int = 2
+    smart_max_reallocated_growth: int = 10
+    smart_max_pending_growth: int = 10
+    smart_max_crc_errors_growth: int = 50
+    smart_max_media_errors_growth: int = 1
+
+    # Drive temperature in Celsius polled during the erasure, the writes
+    # are paused above the max until it cools down to the resume one.
+    thermal_poll_interval: float = 30
+    thermal_max_temperature: float = 55
+    thermal_resume_temperature: float = 50
+    thermal_max_points: int = 300
+    # Seconds to wait before starting again a hot drive.
+    thermal_defer_interval: float = 60
+
+    # Spread the writes of the native engine across the paths of a
+    # dual-ported drive without dm-multipath.
+    multipath_striping: bool = False
+
+    # Block queue values set while a device is erased, only with
+    # `queue_tuning`. `max` is the limit of the hardware.
+    queue_tuning: bool = False
+    queue_tuning_profile: Dict[str, str] = {
+        'scheduler': 'none',
+        'max_sectors_kb': 'max',
+        'nr_requests': '256',
+        'read_ahead_kb': '0',
+    }
+    # Original values saved to restore them after a crash.
+    queue_tuning_state_dir: str = "/run/usody_sanitize"
+
+    # Volatile write cache enabled while a device is erased, only with
+    # `write_cache`, flushed at the end of each pass and every interval
+    # of seconds, 0 disables the checkpoints.
+    write_cache: bool = False
+    write_cache_flush_interval: float = 15 * 60
+    # State of the devices with the cache enabled, to restore it after a
+    # crash.
+    write_cache_state_dir: str = "/run/usody_sanitize"
+
+    # Pin the erasure of each device to the CPUs of the NUMA node of its
+    # controller, the node can be set by device path.
+    numa_affinity: bool = True
+    numa_nodes: Dict[str, int] = {}
+
+    # Metrics.
+    metrics_stall_seconds: float = 120
+    metrics_textfile_interval: float = 15
+
 
-settings = Settings()
\ No newline at end of file
+settings = Settings()
@@ -0,0 +1,239 @@
+"""
+Overwrite Engine
+================
+
+In-process overwrite of a whole device, without external tools. The
+device is written sequentially in chunks with `O_DIRECT`, so the time
+of each write is the real time of the device, and recorded on a
+`RegionHistogram` to find the degraded zones of the disk.
+
+The writes are blocking, each engine runs them on its own thread.
+"""
+import asyncio
+import contextlib
+import errno
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Optional, Tuple
+
+from usody_sanitize import (
+    buffers, heatmap, metrics, numa, patterns, producers, thermal,
+)
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class OverwriteEngine:
+    """Overwrites a device with a pattern.
+
+    :param str dev_path: Path to the device.
+    :param str pattern: Pattern spec, see `patterns`.
+    :param int chunk_size: Bytes written on each request, aligned to the
+        length of fixed patterns. The slot size with the pattern
+        producers, less when the memory budget of the buffer pool is
+        shared by many devices.
+    :param List[str] paths: Paths to the same device, like the two ports
+        of a SAS drive, each one writes a range of the device.
+
+    Example:
+    >>> engine = OverwriteEngine("/dev/sda", pattern="zeros")
+    >>> await engine.run()
+    """
+
+    def __init__(
+            self,
+            dev_path: str,
+            pattern: str = "random",
+            chunk_size: int = settings.engine_chunk_size,
+            paths: Optional[List[str]] = None,
+    ):
+        self.dev_path = dev_path
+        # Paths to the same device to spread the writes across.
+        self.paths = paths or [dev_path]
+        self.pattern = pattern or "random"
+        self._pattern = patterns.parse(self.pattern)
+        self.chunk_size = patterns.chunk_size(self._pattern, chunk_size)
+        self.size: Optional[int] = None
+        self.bytes_written = 0
+        self.error: Optional[str] = None
+        self.heatmap = heatmap.RegionHistogram()
+        self._metrics = metrics.registry.device(dev_path)
+        self._cancelled = threading.Event()
+        self._lock = threading.Lock()
+        self._thermal = thermal.current()
+        self._placement = numa.current()
+
+    async def run(self) -> bool:
+        """Overwrites the whole device, returns True if all the bytes
+        have been written and flushed to the device.
+        """
+        loop = asyncio.get_running_loop()
+        executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix=f"overwrite-{self.dev_path}")
+        try:
+            return await loop.run_in_executor(executor, self._overwrite)
+        except asyncio.CancelledError:
+            self._cancelled.set()
+            raise
+        finally:
+            executor.shutdown(wait=False)
+
+    def _open(self, path: str) -> int:
+        try:
+            return os.open(path, os.O_WRONLY | getattr(os, "O_DIRECT", 0))
+        except OSError as ex:
+            # Some devices and file systems do not support `O_DIRECT`.
+            if ex.errno != errno.EINVAL:
+                raise
+            logger.warning(f"{path}: O_DIRECT not supported,"
+                           f" using buffered writes ({ex}).")
+            return os.open(path, os.O_WRONLY)
+
+    def _overwrite(self) -> bool:
+        try:
+            fds = [self._open(path) for path in self.paths]
+        except OSError as ex:
+            self.error = str(ex)
+            logger.error(f"{self.dev_path}: {ex}")
+            return False
+
+        try:
+            self.size = os.lseek(fds[0], 0, os.SEEK_END)
+            self.heatmap.size = self.size
+
+            # Each path writes a contiguous range of the device.
+            ranges = _split(self.size, len(fds), self.chunk_size)
+            if len(fds) == 1:
+                self._overwrite_range(fds[0], *ranges[0])
+            else:
+                with ThreadPoolExecutor(max_workers=len(fds)) as executor:
+                    for future in [
+                        executor.submit(self._overwrite_range, fd, start, end)
+                        for fd, (start, end) in zip(fds, ranges)
+                    ]:
+                        future.result()
+
+            for fd in fds:
+                os.fsync(fd)
+        except OSError as ex:
+            self.error = str(ex)
+            logger.error(f"{self.dev_path}: Overwrite failed after"
+                         f" {self.bytes_written} bytes: {ex}")
+            return False
+        finally:
+            for fd in fds:
+                os.close(fd)
+
+        if self._cancelled.is_set():
+            self.error = "Cancelled."
+            return False
+        return True
+
+    def _overwrite_range(self, fd: int, offset: int, end: int) -> None:
+        # On the CPUs of the NUMA node of the controller, if any.
+        numa.pin(0, self._placement)
+        try:
+            with self._chunks() as chunks:
+                while offset < end:
+                    if self._thermal:
+                        self._thermal.wait_cool(self._cancelled)
+                    if self._cancelled.is_set():
+                        return
+                    view = next(chunks, None)
+                    if view is None:
+                        return
+
+                    length = min(len(view), end - offset)
+                    if self._pattern.seed is not None:
+                        patterns.fill(self._pattern, view[:length], offset)
+                    start = time.perf_counter()
+                    written = self._write(fd, view[:length], offset)
+                    elapsed = time.perf_counter() - start
+
+                    with self._lock:
+                        self.heatmap.record(offset, written, elapsed)
+                        self.bytes_written += written
+                        self._metrics.update_progress(
+                            self.bytes_written, self.size)
+                    offset += written
+        except OSError:
+            # Stop the writes of the other threads.
+            self._cancelled.set()
+            raise
+
+    @contextlib.contextmanager
+    def _chunks(self):
+        """Buffers filled with the pattern for each write, page aligned
+        as required by `O_DIRECT`. The fixed patterns are shared tables,
+        the random data comes from the pattern producers when they are
+        started.
+        """
+        pattern_producers = producers.current() \
+            if self._pattern.spec == patterns.RANDOM else None
+        with contextlib.ExitStack() as stack:
+            ring = None
+            if pattern_producers:
+                # None when the arena is taken by other writers.
+                ring = stack.enter_context(pattern_producers.ring())
+            if self._pattern.data:
+                chunks = _table_chunks(stack.enter_context(patterns.table(
+                    self._pattern, self.chunk_size, self._cancelled)))
+            elif ring:
+                chunks = _ring_chunks(ring, self._cancelled)
+            else:
+                # Smaller than the chunk size while many devices are
+                # written at once.
+                lease = stack.enter_context(buffers.pool.lease(
+                    self.chunk_size, self._cancelled,
+                    self._placement.node if self._placement else None))
+                chunks = self._pattern_chunks(lease)
+            stack.callback(chunks.close)
+            yield chunks
+
+    def _pattern_chunks(self, lease: buffers.Lease) -> Iterator[memoryview]:
+        while True:
+            view = lease.get()
+            if view is None:
+                return
+            # The seeded patterns are filled by position when written.
+            if self._pattern.seed is None:
+                view[:] = os.urandom(len(view))
+            yield view
+
+    def _write(self, fd: int, data, offset: int) -> int:
+        return os.pwrite(fd, data, offset)
+
+
+def _table_chunks(table: Optional[memoryview]) -> Iterator[memoryview]:
+    while table is not None:
+        yield table
+
+
+def _ring_chunks(
+        ring: producers.Ring,
+        cancelled: threading.Event,
+) -> Iterator[memoryview]:
+    """Slots filled by the producers, each one is given back after it is
+    written.
+    """
+    while True:
+        slot = ring.get(cancelled)
+        if slot is None:
+            return
+        try:
+            with ring.view(slot) as view:
+                yield view
+        finally:
+            ring.release(slot)
+
+
+def _split(size: int, parts: int, alignment: int) -> List[Tuple[int, int]]:
+    """Splits the device in contiguous ranges aligned to the chunks."""
+    step = -(-size // parts // alignment) * alignment or alignment
+    return [(min(i * step, size), min((i + 1) * step, size))
+            if i < parts - 1 else (min(i * step, size), size)
+            for i in range(parts)]
@@ -1,16 +1,25 @@
-import asyncio
 import logging
 import sys
 from enum import Enum
 from typing import List, Union, Optional
 
-from usody_sanitize import schemas, commands
+from usody_sanitize import (
+    schemas, commands, scheduler, multipath, metrics, producers,
+)
+from usody_sanitize.config import settings
 from usody_sanitize.methods import (
     BASIC,
     BASELINE,
     ENHANCED,
+    DOD_5220_22_M,
+    DOD_5220_22_M_ECE,
+    GUTMANN,
+    VSITR,
+    SCHNEIER,
+    RCMP_TSSIT_OPS_II,
 )
 from usody_sanitize.sanitize import ErasureProcess
+from usody_sanitize.store import JobStore
 
 logger = logging.getLogger(__name__)
 
@@ -19,22 +28,33 @@ class DefaultMethods(Enum):
     """An enumeration class representing default methods.
 
     This class defines three default methods: BASIC, BASELINE, and ENHANCED. These methods
-    can be used to specify the default behavior in different scenarios.
+    can be used to specify the default behavior in different scenarios. The multi-pass
+    overwrite standards can be selected by name too.
 
     Attributes:
         BASIC: Represents the basic default method.
         BASELINE: Represents the baseline default method.
         ENHANCED: Represents the enhanced default method.
+        DOD_5220_22_M, DOD_5220_22_M_ECE, GUTMANN, VSITR, SCHNEIER, RCMP_TSSIT_OPS_II:
+            The multi-pass overwrite standards of `methods`.
     """
     BASIC = BASIC
     BASELINE = BASELINE
     ENHANCED = ENHANCED
+    DOD_5220_22_M = DOD_5220_22_M
+    DOD_5220_22_M_ECE = DOD_5220_22_M_ECE
+    GUTMANN = GUTMANN
+    VSITR = VSITR
+    SCHNEIER = SCHNEIER
+    RCMP_TSSIT_OPS_II = RCMP_TSSIT_OPS_II
 
 
 async def auto_erase_disks(
         method: Optional[Union[schemas.Method, str]] = None,
         disks: Optional[List[str]] = None,
         confirm: bool = False,
+        jobs: Optional[int] = None,
+        history: Optional[JobStore] = None,
 ) -> Optional[List[dict]]:
     """
     The `auto_erase_disks` method is used to automatically erase selected disks using a specified sanitizing method.
@@ -45,6 +65,10 @@ async def auto_erase_disks(
     - `disks` (Optional[List[str]]): The list of disks to be erased. Default is `None`, which means
       all available disks will be selected.
     - `confirm` (bool): Boolean value indicating whether to confirm the erasure before starting. Default is `False`.
+    - `jobs` (Optional[int]): Maximum erasures running at the same time. Default is `None`, which means
+      the `max_jobs` setting.
+    - `history` (Optional[JobStore]): Job store with the past erasures, to predict the duration of each one
+      and start the longest ones first.
 
     Returns:
     - `Optional[List[dict]]`: List of dictionaries representing the erasure results. Each dictionary contains
@@ -75,16 +99,62 @@ async def auto_erase_disks(
     method = set_sanitize_method(method)
     selected_disks = get_disks_to_erase(disks)
     erasures = [erasure for erasure in (ErasureProcess(d, method) for d in selected_disks) if not erasure.error]
+    erasures = deduplicate_erasures(erasures)
     confirm_erasures(erasures, confirm)  # Do confirmation prompt if needed.
 
-    # Start erasure tasks.
-    running_tasks = [asyncio.create_task(erase.run()) for erase in erasures]
-    [await task for task in running_tasks]
+    # Start erasure tasks, the longest ones first.
+    durations = [erase.predict_duration(history) for erase in erasures]
+    producers.start()
+    try:
+        await scheduler.Scheduler(jobs).run(
+            [erase.run() for erase in erasures], durations,
+            ready=lambda i: erasures[i].is_cool())
+    finally:
+        producers.stop()
 
     # Show erasures' results.
     return [r.export() for r in erasures]
 
 
+async def plan_disks(
+        method: Optional[Union[schemas.Method, str]] = None,
+        disks: Optional[List[str]] = None,
+        jobs: Optional[int] = None,
+        history: Optional[JobStore] = None,
+) -> dict:
+    """Plans the erasure of the selected disks without writing to them.
+
+    The read throughput of each disk is measured to predict the duration
+    of its plan, the past erasures of the same drive model are preferred
+    when there are any. The batch duration takes into account the
+    erasures running at the same time, the longest ones first.
+
+    :param method: The sanitizing method, like `auto_erase_disks`.
+    :param disks: The list of disks, all available disks by default.
+    :param jobs: Maximum erasures running at the same time.
+    :param history: Job store with the past erasures.
+    :return: dict with the plan of each disk and the batch duration.
+    """
+    method = set_sanitize_method(method)
+    erasures = deduplicate_erasures([
+        erasure for erasure in
+        (ErasureProcess(d, method) for d in get_disks_to_erase(disks))
+        if not erasure.error])
+
+    # Only read, the measures run one after the other to not disturb
+    # each other on shared controllers.
+    devices = [await erasure.dry_run(history) for erasure in erasures]
+    durations = [d['predicted_duration'] for d in devices]
+    jobs = settings.max_jobs if jobs is None else jobs
+    return {
+        'method': method.name,
+        'jobs': jobs,
+        'devices': devices,
+        'predicted_duration': scheduler.makespan(
+            [durations[i] for i in scheduler.longest_first(durations)], jobs),
+    }
+
+
 def set_sanitize_method(method: Optional[Union[DefaultMethods, str]]):
     """
     Set the sanitizing method for data processing.
@@ -116,11 +186,33 @@ def set_sanitize_method(method: Optional[Union[DefaultMethods, str]]):
 
 
 def get_disks_to_erase(disks):
-    selected_disks = disks or commands.get_disks()
+    selected_disks = multipath.collapse(disks or commands.get_disks())
     logger.debug(f"Disks: {disks}")
     return selected_disks
 
 
+def deduplicate_erasures(erasures: List[ErasureProcess]) -> List[ErasureProcess]:
+    """Keeps a single erasure for each drive. The other paths of a
+    dual-ported drive, found by WWN or serial number, are added to the
+    device of the first one.
+    """
+    selected = {}
+    result = []
+    for erasure in erasures:
+        key = multipath.identity(erasure.device)
+        if key is None or key not in selected:
+            selected[key] = erasure
+            result.append(erasure)
+            continue
+
+        first = selected[key]
+        first.device.paths.append(erasure.path.as_posix())
+        metrics.registry.devices.pop(erasure.path.as_posix(), None)
+        logger.warning(f"{erasure.path}: Another path of {first.path},"
+                       f" erasing the drive only once.")
+    return result
+
+
 def confirm_erasures(erasures: List[ErasureProcess], confirm: bool):
     """
     Asks for a user input to confirm the erasure
@@ -0,0 +1,162 @@
+"""
+Health
+======
+
+SMART counters polled while the device is being erased. A dying drive
+keeps growing its reallocated and pending sectors during a long
+overwrite and may take a day to fail. When the growth of a counter since
+the start of the erasure crosses its threshold, the erasure is aborted
+and the drive is marked for physical destruction.
+
+- ATA: attributes 5 (reallocated sectors), 197 (pending sectors) and
+  199 (UDMA CRC errors).
+- NVMe: media and data integrity errors of the health log.
+- SCSI: grown defect list.
+
+`smartctl` is run with a limit of polls at the same time on the whole
+station, the first poll is done after one interval because the counters
+of the probe are the baseline.
+"""
+import asyncio
+import json
+import logging
+import weakref
+from typing import List, Optional
+
+from usody_sanitize import schemas
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# ATA attribute id of each counter.
+ATA_ATTRIBUTES = {
+    5: 'reallocated',
+    197: 'pending',
+    199: 'crc_errors',
+}
+COUNTERS = ('reallocated', 'pending', 'crc_errors', 'media_errors')
+
+# Semaphore of the running loop limiting the polls of the station.
+_limiters = weakref.WeakKeyDictionary()
+
+
+def parse_counters(smart: Optional[dict]) -> schemas.HealthSample:
+    """Reads the health counters from the `smartctl -aj` output, the
+    ones not reported by the device are None.
+    """
+    smart = smart or {}
+    sample = schemas.HealthSample()
+
+    for attribute in (smart.get('ata_smart_attributes') or {}).get(
+            'table', []):
+        counter = ATA_ATTRIBUTES.get(attribute.get('id'))
+        raw = (attribute.get('raw') or {}).get('value')
+        if counter and isinstance(raw, int):
+            # Only the lower 32 bits hold the counter on some vendors.
+            setattr(sample, counter, raw & 0xFFFFFFFF)
+
+    nvme_log = smart.get('nvme_smart_health_information_log') or {}
+    if 'media_errors' in nvme_log:
+        sample.media_errors = nvme_log['media_errors']
+
+    if 'scsi_grown_defect_list' in smart:
+        sample.reallocated = smart['scsi_grown_defect_list']
+
+    status = smart.get('smart_status') or {}
+    if 'passed' in status:
+        sample.passed = bool(status['passed'])
+    return sample
+
+
+def check(
+        baseline: schemas.HealthSample,
+        sample: schemas.HealthSample,
+) -> Optional[str]:
+    """Returns why the drive is failing, None while it is healthy."""
+    if sample.passed is False:
+        return "SMART overall health self-assessment failed"
+
+    for counter in COUNTERS:
+        threshold = getattr(settings, f"smart_max_{counter}_growth")
+        start, current = getattr(baseline, counter), getattr(sample, counter)
+        if not threshold or start is None or current is None:
+            continue
+        if current - start >= threshold:
+            return f"{counter} grew from {start} to {current}" \
+                   f" during the erasure"
+    return None
+
+
+def _limiter() -> asyncio.Semaphore:
+    loop = asyncio.get_running_loop()
+    if loop not in _limiters:
+        _limiters[loop] = asyncio.Semaphore(
+            settings.smart_max_concurrent_polls)
+    return _limiters[loop]
+
+
+async def read_smart(dev_path: str) -> dict:
+    """Runs `smartctl -aj` without blocking the loop, {} on failure."""
+    async with _limiter():
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "smartctl", "-aj", dev_path,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            stdout, _ = await asyncio.wait_for(
+                proc.communicate(), settings.smart_poll_timeout)
+            return json.loads(stdout.decode('utf-8'))
+        except asyncio.TimeoutError:
+            proc.kill()
+            logger.warning(f"{dev_path}: `smartctl` timed out.")
+        except (OSError, ValueError) as ex:
+            logger.debug(f"{dev_path}: SMART not readable: {ex}")
+    return {}
+
+
+class HealthMonitor:
+    """Polls the SMART counters of a device until they cross a
+    threshold.
+
+    Example:
+    >>> monitor = HealthMonitor("/dev/sda", smart)
+    >>> reason = await monitor.run()
+    >>> report.health = monitor.samples
+    """
+
+    def __init__(
+            self,
+            dev_path: str,
+            smart: Optional[dict] = None,
+            interval: float = settings.smart_poll_interval,
+    ):
+        self.dev_path = dev_path
+        self.interval = interval
+        self.baseline = parse_counters(smart)
+        self.samples: List[schemas.HealthSample] = [
+            self.baseline.model_copy()]
+
+    async def run(self) -> str:
+        """Polls the device and returns the reason to abort the erasure.
+        Runs until it is cancelled while the drive is healthy.
+        """
+        while True:
+            await asyncio.sleep(self.interval)
+            smart = await read_smart(self.dev_path)
+            if not smart:
+                continue
+
+            sample = parse_counters(smart)
+            self.samples.append(sample)
+            self._fill_baseline(sample)
+            reason = check(self.baseline, sample)
+            if reason:
+                logger.error(f"{self.dev_path}: {reason}.")
+                return reason
+
+    def _fill_baseline(self, sample: schemas.HealthSample) -> None:
+        """Counters missing on the probe start with their first poll."""
+        for counter in COUNTERS:
+            if getattr(self.baseline, counter) is None:
+                setattr(self.baseline, counter, getattr(sample, counter))
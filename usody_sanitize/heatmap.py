@@ -0,0 +1,120 @@
+"""
+Region Heatmap
+==============
+
+Write throughput and latency per LBA region of a device, recorded while
+overwriting it. A drive with a failing head or a weak zone still passes
+the overwrite but it is much slower on some bands, those regions are
+flagged as degraded zones on the report.
+
+HDDs are naturally slower on the inner tracks, so each region is
+compared against the linear trend of all the regions instead of the
+average of the whole disk.
+"""
+import logging
+from typing import List, Optional
+
+from usody_sanitize import schemas
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class RegionHistogram:
+    """Accumulates the bytes written and the time spent on a fixed
+    number of regions of a device.
+
+    Example:
+    >>> histogram = RegionHistogram(size=320072933376)
+    >>> histogram.record(offset=0, nbytes=1048576, seconds=0.01)
+    >>> histogram.summary().degraded
+    """
+
+    def __init__(
+            self,
+            size: Optional[int] = None,
+            buckets: int = settings.heatmap_buckets,
+    ):
+        self.size = size
+        self.buckets = buckets
+        self._bytes = [0] * buckets
+        self._seconds = [0.0] * buckets
+        self._max_latency = [0.0] * buckets
+
+    @property
+    def bucket_size(self) -> int:
+        return -(-self.size // self.buckets) if self.size else 0
+
+    def record(self, offset: int, nbytes: int, seconds: float) -> None:
+        """Records a write of `nbytes` at `offset` that took `seconds`.
+        Writes crossing several regions are split proportionally.
+        """
+        if not self.size or nbytes <= 0:
+            return
+
+        bucket_size = self.bucket_size
+        end = min(offset + nbytes, self.size)
+        while offset < end:
+            index = offset // bucket_size
+            chunk = min(end, (index + 1) * bucket_size) - offset
+            self._bytes[index] += chunk
+            self._seconds[index] += seconds * chunk / nbytes
+            offset += chunk
+
+        index = min((end - 1) // bucket_size, self.buckets - 1)
+        self._max_latency[index] = max(self._max_latency[index], seconds)
+
+    def throughput(self) -> List[Optional[float]]:
+        """Bytes per second of each region, None if nothing was
+        recorded on it.
+        """
+        return [
+            b / s if b and s > 0 else None
+            for b, s in zip(self._bytes, self._seconds)
+        ]
+
+    def degraded_regions(
+            self,
+            ratio: float = settings.degraded_zone_ratio,
+    ) -> List[int]:
+        """Regions with a throughput below `ratio` times the expected
+        one on that position of the disk.
+        """
+        points = [(i, t) for i, t in enumerate(self.throughput())
+                  if t is not None]
+        if len(points) < settings.heatmap_min_regions:
+            return []
+
+        # Least squares fit of the throughput across the disk.
+        n = len(points)
+        mean_x = sum(i for i, _ in points) / n
+        mean_y = sum(t for _, t in points) / n
+        variance = sum((i - mean_x) ** 2 for i, _ in points)
+        slope = sum((i - mean_x) * (t - mean_y) for i, t in points) \
+            / variance if variance else 0.0
+
+        return [
+            i for i, t in points
+            if t < ratio * (mean_y + slope * (i - mean_x))
+        ]
+
+    def summary(self) -> Optional[schemas.RegionHeatmap]:
+        if not self.size or not any(self._bytes):
+            return None
+
+        degraded = self.degraded_regions()
+        if degraded:
+            logger.warning(f"Degraded zones detected on regions {degraded}.")
+
+        return schemas.RegionHeatmap(
+            buckets=self.buckets,
+            bucket_size=self.bucket_size,
+            throughput=[
+                None if t is None else round(t) for t in self.throughput()
+            ],
+            max_latency=[
+                round(s * 1000, 3) if s else None for s in self._max_latency
+            ],
+            degraded=bool(degraded),
+            degraded_regions=degraded,
+        )
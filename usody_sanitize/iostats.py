@@ -0,0 +1,148 @@
+"""
+I/O Statistics
+==============
+
+Samples the kernel block layer counters of a device
+(`/sys/block/<dev>/stat` and `/sys/block/<dev>/inflight`) while a step
+is running, to know the real device throughput, IOPS, latency and
+queue depth instead of the progress reported by the erasure tools.
+"""
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional, Union
+
+from usody_sanitize import schemas
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# The stat file always counts 512 bytes sectors.
+SECTOR_SIZE = 512
+
+
+class DiskStatsSampler:
+    """Samples the block layer counters of a device.
+
+    Example:
+    >>> async with DiskStatsSampler("/dev/sda") as sampler:
+    ...     step = await steps.erase_hdd_shred("/dev/sda")
+    >>> step.io_stats = sampler.summary()
+    """
+
+    def __init__(
+            self,
+            dev_path: Union[str, Path],
+            interval: float = settings.iostats_interval,
+            max_points: int = settings.iostats_max_points,
+            sys_block: Union[str, Path] = "/sys/block",
+    ):
+        self.name = Path(dev_path).name
+        self.sys_block = Path(sys_block)
+        self.interval = interval
+        self.max_points = max_points
+        # Cumulative counters: (time, read_ios, read_sectors, read_ticks,
+        # write_ios, write_sectors, write_ticks, time_in_queue).
+        self._samples: List[tuple] = []
+        self._peak_latency = 0.0
+        self._peak_queue_depth = 0
+        self._task: Optional[asyncio.Task] = None
+
+    async def __aenter__(self):
+        self.sample()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self._task.cancel()
+        self.sample()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            self.sample()
+
+    def sample(self) -> None:
+        try:
+            with open(self.sys_block / self.name / "stat") as _fh:
+                stat = [int(v) for v in _fh.read().split()]
+            with open(self.sys_block / self.name / "inflight") as _fh:
+                inflight = sum(int(v) for v in _fh.read().split())
+        except (OSError, ValueError):
+            return
+
+        sample = (time.time(), stat[0], stat[2], stat[3],
+                  stat[4], stat[6], stat[7], stat[10])
+        self._peak_queue_depth = max(self._peak_queue_depth, inflight)
+
+        if self._samples:
+            latency = _latency(self._samples[-1], sample)
+            if latency is not None:
+                self._peak_latency = max(self._peak_latency, latency)
+        self._samples.append(sample)
+
+        # Counters are cumulative, dropping samples only lowers the
+        # resolution of the time series.
+        if len(self._samples) > 2 * self.max_points:
+            self._samples = self._samples[::2]
+            if self._samples[-1] is not sample:
+                self._samples.append(sample)
+
+    def summary(self) -> Optional[schemas.IOStats]:
+        """Returns the statistics of the sampled period, or None if the
+        device counters could not be read.
+        """
+        if len(self._samples) < 2:
+            return None
+
+        first, last = self._samples[0], self._samples[-1]
+        duration = last[0] - first[0]
+        read_ios, write_ios = last[1] - first[1], last[4] - first[4]
+        read_bytes = (last[2] - first[2]) * SECTOR_SIZE
+        write_bytes = (last[5] - first[5]) * SECTOR_SIZE
+
+        stride = max(1, -(-(len(self._samples) - 1) // self.max_points))
+        points = self._samples[::stride]
+        if points[-1] is not last:
+            points.append(last)
+
+        series = []
+        for previous, current in zip(points, points[1:]):
+            elapsed = current[0] - previous[0]
+            if elapsed <= 0:
+                continue
+            ios = current[1] - previous[1] + current[4] - previous[4]
+            sectors = current[2] - previous[2] + current[5] - previous[5]
+            series.append([
+                round(current[0] - first[0], 3),
+                round(sectors * SECTOR_SIZE / elapsed),
+                round(ios / elapsed, 1),
+                round(_latency(previous, current) or 0, 3),
+                round((current[7] - previous[7]) / 1000 / elapsed, 2),
+            ])
+
+        return schemas.IOStats(
+            interval=self.interval,
+            duration=duration,
+            read_bytes=read_bytes,
+            write_bytes=write_bytes,
+            read_ios=read_ios,
+            write_ios=write_ios,
+            throughput=(read_bytes + write_bytes) / duration
+            if duration > 0 else 0,
+            iops=(read_ios + write_ios) / duration if duration > 0 else 0,
+            avg_latency=_latency(first, last) or 0,
+            peak_latency=self._peak_latency,
+            avg_queue_depth=(last[7] - first[7]) / 1000 / duration
+            if duration > 0 else 0,
+            peak_queue_depth=self._peak_queue_depth,
+            series=series,
+        )
+
+
+def _latency(previous: tuple, current: tuple) -> Optional[float]:
+    """Average milliseconds per request between two samples."""
+    ios = current[1] - previous[1] + current[4] - previous[4]
+    ticks = current[3] - previous[3] + current[6] - previous[6]
+    return ticks / ios if ios else None
@@ -0,0 +1,87 @@
+"""
+LUKS
+====
+
+The data of a LUKS volume is encrypted with a volume key that is only
+stored, encrypted by each passphrase, on the keyslots of the header.
+Destroying the header and the keyslot areas makes the data unrecoverable
+in seconds, so it is done before any slow overwrite.
+
+- LUKS1: the binary header is followed by the keyslots, the encrypted
+  data starts at the payload offset.
+- LUKS2: two copies of the binary header and JSON metadata, followed by
+  the keyslots area, the data starts at the offset of the segments. The
+  secondary header can be on several offsets.
+"""
+import json
+import logging
+import struct
+from typing import Optional
+
+from usody_sanitize import schemas
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"LUKS\xba\xbe"
+SECONDARY_MAGIC = b"SKUL\xba\xbe"
+# Offsets where LUKS2 can place its secondary header.
+SECONDARY_OFFSETS = [16 * 1024 << i for i in range(9)]
+# Header size used when it can not be read, the LUKS2 default.
+DEFAULT_HEADER_SIZE = 16 * 1024 * 1024
+SECTOR_SIZE = 512
+
+
+def _luks2_header_size(fh, hdr_size: int) -> int:
+    """Bytes before the first data segment, from the JSON metadata."""
+    fh.seek(4096)
+    metadata = json.loads(
+        fh.read(hdr_size - 4096).rstrip(b"\0").decode("utf-8"))
+    offsets = [int(s['offset']) for s in metadata.get('segments', {}).values()
+               if str(s.get('offset', '')).isdigit()]
+    if offsets:
+        return max(offsets)
+    config = metadata.get('config', {})
+    return 2 * int(config.get('json_size', 0)) \
+        + int(config.get('keyslots_size', 0)) or DEFAULT_HEADER_SIZE
+
+
+def read_header(dev_path: str) -> Optional[schemas.LuksHeader]:
+    """Reads the LUKS header of the device, None if there is none."""
+    try:
+        with open(dev_path, "rb") as fh:
+            header = fh.read(4096)
+            if header[:6] == MAGIC:
+                version = struct.unpack(">H", header[6:8])[0]
+                if version == 1:
+                    payload = struct.unpack(">I", header[104:108])[0]
+                    return schemas.LuksHeader(
+                        version=1,
+                        header_size=payload * SECTOR_SIZE
+                        or DEFAULT_HEADER_SIZE)
+                hdr_size = struct.unpack(">Q", header[8:16])[0]
+                return schemas.LuksHeader(
+                    version=version,
+                    header_size=_luks2_header_size(fh, hdr_size))
+
+            # Only the secondary LUKS2 header is left.
+            for offset in SECONDARY_OFFSETS:
+                fh.seek(offset)
+                if fh.read(6) == SECONDARY_MAGIC:
+                    return schemas.LuksHeader(
+                        version=2, header_size=DEFAULT_HEADER_SIZE)
+    except (OSError, ValueError, KeyError, struct.error) as ex:
+        logger.debug(f"{dev_path}: LUKS header not readable: {ex}")
+    return None
+
+
+def detect(
+        dev_path: str,
+        block: Optional[schemas.Block] = None,
+) -> Optional[schemas.LuksHeader]:
+    """Finds a LUKS volume from the header magic or from the file system
+    type detected by `lsblk`.
+    """
+    header = read_header(dev_path)
+    if header is None and block and block.fstype == "crypto_LUKS":
+        header = schemas.LuksHeader(header_size=DEFAULT_HEADER_SIZE)
+    return header
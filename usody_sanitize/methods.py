@@ -1,4 +1,6 @@
 """Pre-defined sanitize methods to erase disks securely."""
+from typing import List
+
 from usody_sanitize import schemas
 
 
@@ -37,42 +39,6 @@ BASELINE = schemas.Method(
     ],
 )
 
-CRYPTOGRAPHIC_ATA = schemas.Method(
-    name="Baseline Cryptographic",
-    standard="NIST, Infosec HGM Baseline",
-    description="Method for securely erasing data in compliance"
-                " with HMG Infosec Standard 5 guidelines includes"
-                " a single step of a random write process on the"
-                " full disk. This process overwrites all data with"
-                " a randomized pattern, ensuring that it cannot be"
-                " recovered. Built-in validation confirms that the"
-                " data has been written correctly, and a final"
-                " validation confirms that all data has been deleted.",
-    removal_process="Overwriting",
-    verification_enabled=False,
-    overwriting_steps=[
-        schemas.Execution(tool="hdparm"),
-    ],
-)
-
-CRYPTOGRAPHIC_NVME = schemas.Method(
-    name="Baseline Cryptographic",
-    standard="NIST, Infosec HGM Baseline",
-    description="Method for securely erasing data in compliance"
-                " with HMG Infosec Standard 5 guidelines includes"
-                " a single step of a random write process on the"
-                " full disk. This process overwrites all data with"
-                " a randomized pattern, ensuring that it cannot be"
-                " recovered. Built-in validation confirms that the"
-                " data has been written correctly, and a final"
-                " validation confirms that all data has been deleted.",
-    removal_process="Overwriting",
-    verification_enabled=False,
-    overwriting_steps=[
-        schemas.Execution(tool="nvme"),
-    ],
-)
-
 ENHANCED = schemas.Method(
     name="Enhanced Erasure",
     standard="HMG Infosec Standard 5",
@@ -93,3 +59,89 @@ ENHANCED = schemas.Method(
         schemas.Execution(tool="shred", pattern="zeros"),
     ],
 )
+
+
+# Multi-pass overwrite standards. Their fixed and seeded patterns are
+# written by the native engine from tables computed once, see `patterns`.
+
+def _passes(*specs: str) -> List[schemas.Execution]:
+    return [schemas.Execution(tool="native", pattern=spec) for spec in specs]
+
+
+DOD_5220_22_M = schemas.Method(
+    name="DoD 5220.22-M",
+    standard="US DoD 5220.22-M (E)",
+    description="Three overwrite passes: a character, its complement and"
+                " random data, with a final verification.",
+    removal_process="Overwriting",
+    verification_enabled=True,
+    overwriting_steps=_passes("zeros", "complement", "random"),
+)
+
+DOD_5220_22_M_ECE = schemas.Method(
+    name="DoD 5220.22-M ECE",
+    standard="US DoD 5220.22-M (ECE)",
+    description="Seven overwrite passes: the three passes of DoD"
+                " 5220.22-M (E), a random pass (C) and the three passes"
+                " of (E) again, with a final verification.",
+    removal_process="Overwriting",
+    verification_enabled=True,
+    overwriting_steps=_passes(
+        "zeros", "complement", "random",
+        "random",
+        "zeros", "complement", "random"),
+)
+
+GUTMANN = schemas.Method(
+    name="Gutmann",
+    standard="Peter Gutmann, Secure Deletion of Data from Magnetic and"
+             " Solid-State Memory (1996)",
+    description="35 overwrite passes: 4 random, the 27 patterns for the"
+                " MFM and RLL encodings of old drives in the order of the"
+                " paper, and 4 random.",
+    removal_process="Overwriting",
+    verification_enabled=True,
+    overwriting_steps=_passes(
+        "random", "random", "random", "random",
+        "hex:55", "hex:aa", "hex:924924", "hex:492492", "hex:249249",
+        "hex:00", "hex:11", "hex:22", "hex:33", "hex:44", "hex:55",
+        "hex:66", "hex:77", "hex:88", "hex:99", "hex:aa", "hex:bb",
+        "hex:cc", "hex:dd", "hex:ee", "hex:ff",
+        "hex:924924", "hex:492492", "hex:249249",
+        "hex:6db6db", "hex:b6db6d", "hex:db6db6",
+        "random", "random", "random", "random"),
+)
+
+VSITR = schemas.Method(
+    name="VSITR",
+    standard="German BSI VSITR",
+    description="Seven overwrite passes: zeros and ones alternated six"
+                " times and a final pass with 0xAA.",
+    removal_process="Overwriting",
+    verification_enabled=True,
+    overwriting_steps=_passes(
+        "zeros", "hex:ff", "zeros", "hex:ff", "zeros", "hex:ff", "hex:aa"),
+)
+
+SCHNEIER = schemas.Method(
+    name="Schneier",
+    standard="Bruce Schneier, Applied Cryptography",
+    description="Seven overwrite passes: ones, zeros and five random"
+                " passes.",
+    removal_process="Overwriting",
+    verification_enabled=True,
+    overwriting_steps=_passes(
+        "hex:ff", "zeros", "random", "random", "random", "random", "random"),
+)
+
+RCMP_TSSIT_OPS_II = schemas.Method(
+    name="RCMP TSSIT OPS-II",
+    standard="Royal Canadian Mounted Police TSSIT OPS-II",
+    description="Seven overwrite passes: zeros and ones alternated six"
+                " times and a final random pass, with a final"
+                " verification.",
+    removal_process="Overwriting",
+    verification_enabled=True,
+    overwriting_steps=_passes(
+        "zeros", "hex:ff", "zeros", "hex:ff", "zeros", "hex:ff", "random"),
+)
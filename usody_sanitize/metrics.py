@@ -0,0 +1,283 @@
+"""
+Metrics
+=======
+
+In-memory counters of the running erasures exported with the
+Prometheus text format, from a local HTTP endpoint or written to a
+file for the node exporter textfile collector.
+
+The erasure paths only update plain attributes of `DeviceMetrics`, the
+text is rendered when the metrics are scraped.
+"""
+import asyncio
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class DeviceMetrics:
+    """Counters of the erasure of a single device."""
+
+    def __init__(self, device: str):
+        self.device = device
+        self.serial_number: Optional[str] = None
+        self.running = False
+        self.bytes_written = 0
+        self.pass_number = 0
+        self.passes_total = 0
+        self.pass_bytes_written = 0
+        self.pass_bytes_total = 0
+        self.throughput = 0.0
+        self.verification_result: Optional[bool] = None
+        self.errors = 0
+        self.stalls = 0
+        self.result: Optional[bool] = None
+        self.predicted_end: Optional[float] = None
+        self.temperature: Optional[float] = None
+        self._last_update: Optional[float] = None
+
+    def start_pass(self, number: int, total: int) -> None:
+        self.pass_number = number
+        self.passes_total = total
+        self.pass_bytes_written = 0
+        self.pass_bytes_total = 0
+        self.throughput = 0.0
+        self._last_update = time.monotonic()
+
+    def update_progress(
+            self,
+            pass_bytes_written: int,
+            pass_bytes_total: Optional[int] = None,
+    ) -> None:
+        """Updates the bytes written on the current pass reported by
+        the erasure tool.
+        """
+        now = time.monotonic()
+        written = pass_bytes_written - self.pass_bytes_written
+        if written > 0:
+            self.bytes_written += written
+            if self._last_update is not None and now > self._last_update:
+                self.throughput = written / (now - self._last_update)
+        self.pass_bytes_written = pass_bytes_written
+        if pass_bytes_total:
+            self.pass_bytes_total = pass_bytes_total
+        self._last_update = now
+
+    def seconds_since_update(self) -> float:
+        if self._last_update is None:
+            return 0.0
+        return time.monotonic() - self._last_update
+
+    def finish(self, result: bool) -> None:
+        self.running = False
+        self.result = result
+        self.throughput = 0.0
+
+
+class MetricsRegistry:
+    """Keeps the metrics of all the devices of the station."""
+
+    def __init__(self):
+        self.devices: Dict[str, DeviceMetrics] = {}
+
+    def device(self, device: str) -> DeviceMetrics:
+        if device not in self.devices:
+            self.devices[device] = DeviceMetrics(device)
+        return self.devices[device]
+
+    def render(self) -> str:
+        """Returns the metrics using the Prometheus text format."""
+        devices = list(self.devices.values())
+        lines = []
+
+        def _metric(name, kind, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                label_text = ",".join(
+                    f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{name}{{{label_text}}} {value}"
+                             if label_text else f"{name} {value}")
+
+        def _per_device(name, kind, help_text, attr):
+            samples = []
+            for d in devices:
+                value = attr(d)
+                if value is not None:
+                    samples.append((_labels(d), _number(value)))
+            _metric(name, kind, help_text, samples)
+
+        _per_device("sanitize_device_running", "gauge",
+                    "1 while the device erasure is running.",
+                    lambda d: d.running)
+        _per_device("sanitize_device_bytes_written_total", "counter",
+                    "Bytes written on the device by all the passes.",
+                    lambda d: d.bytes_written)
+        _per_device("sanitize_device_pass_bytes_written", "gauge",
+                    "Bytes written on the current pass.",
+                    lambda d: d.pass_bytes_written)
+        _per_device("sanitize_device_pass_bytes", "gauge",
+                    "Bytes to write on the current pass.",
+                    lambda d: d.pass_bytes_total)
+        _per_device("sanitize_device_throughput_bytes", "gauge",
+                    "Current write throughput in bytes per second.",
+                    lambda d: d.throughput)
+        _per_device("sanitize_device_pass", "gauge",
+                    "Number of the pass being executed.",
+                    lambda d: d.pass_number)
+        _per_device("sanitize_device_passes", "gauge",
+                    "Number of passes of the sanitize method.",
+                    lambda d: d.passes_total)
+        _per_device("sanitize_device_verification_result", "gauge",
+                    "1 if the verification passed, 0 if it failed.",
+                    lambda d: d.verification_result)
+        _per_device("sanitize_device_errors_total", "counter",
+                    "Failed steps and commands of the erasure.",
+                    lambda d: d.errors)
+        _per_device("sanitize_device_stalls_total", "counter",
+                    "Times the erasure tool did not report progress"
+                    " in time.",
+                    lambda d: d.stalls)
+        _per_device("sanitize_device_temperature_celsius", "gauge",
+                    "Last temperature polled from the device.",
+                    lambda d: d.temperature)
+        _per_device("sanitize_device_predicted_end_timestamp_seconds",
+                    "gauge",
+                    "Unix time when the erasure is expected to finish.",
+                    lambda d: d.predicted_end and round(d.predicted_end))
+
+        # Station totals.
+        _metric("sanitize_devices_running", "gauge",
+                "Devices being erased.",
+                [({}, sum(d.running for d in devices))])
+        _metric("sanitize_bytes_written_total", "counter",
+                "Bytes written on all the devices.",
+                [({}, sum(d.bytes_written for d in devices))])
+        _metric("sanitize_throughput_bytes", "gauge",
+                "Aggregated write throughput in bytes per second.",
+                [({}, _number(sum(d.throughput for d in devices)))])
+        _metric("sanitize_erasures_total", "counter",
+                "Finished erasures by result.",
+                [({'result': 'pass'},
+                  sum(d.result is True for d in devices)),
+                 ({'result': 'fail'},
+                  sum(d.result is False for d in devices))])
+
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, path: Union[str, Path]) -> None:
+        """Writes the metrics into a file for the textfile collector.
+        The file is replaced atomically so it is never read half written.
+        """
+        path = Path(path)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.render())
+        tmp_path.replace(path)
+
+
+def _labels(device: DeviceMetrics) -> dict:
+    labels = {'device': device.device}
+    if device.serial_number:
+        labels['serial'] = device.serial_number
+    return labels
+
+
+def _number(value) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, float):
+        return f"{value:.6g}"
+    return str(value)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"') \
+        .replace("\n", "\\n")
+
+
+registry = MetricsRegistry()
+
+
+async def watch_stalls(device: DeviceMetrics, timeout: float) -> None:
+    """Counts a stall each time the device has not reported progress
+    for `timeout` seconds. Runs until it is cancelled.
+    """
+    while True:
+        await asyncio.sleep(timeout)
+        if device.seconds_since_update() >= timeout:
+            device.stalls += 1
+            logger.warning(f"{device.device}: No progress reported in"
+                           f" the last {timeout} seconds.")
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        if self.path not in ("/", "/metrics"):
+            self.send_error(404)
+            return
+        body = registry.render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logger.debug(f"Metrics request: {format % args}")
+
+
+def start_http_server(
+        port: int,
+        address: str = "127.0.0.1",
+) -> ThreadingHTTPServer:
+    """Serves the metrics on `http://<address>:<port>/metrics` from a
+    daemon thread.
+    """
+    server = ThreadingHTTPServer((address, port), _MetricsHandler)
+    thread = threading.Thread(
+        target=server.serve_forever, name="metrics-http", daemon=True)
+    thread.start()
+    logger.info(f"Serving metrics on http://{address}:{port}/metrics")
+    return server
+
+
+class TextfileWriter:
+    """Writes the metrics periodically into a file from a daemon
+    thread, and a last time when it is stopped.
+    """
+
+    def __init__(self, path: Union[str, Path], interval: float = 5):
+        self.path = Path(path)
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._run, name="metrics-textfile", daemon=True)
+
+    def start(self) -> "TextfileWriter":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._write()
+            self._stop.wait(self.interval)
+        self._write()
+
+    def _write(self):
+        try:
+            registry.write_textfile(self.path)
+        except OSError as ex:
+            logger.warning(f"Metrics file {self.path} not written: {ex}")
@@ -0,0 +1,87 @@
+"""
+Multipath
+=========
+
+A dual-ported SAS drive behind two HBAs is seen as two SCSI disks, and
+with dm-multipath also as a device mapper device on top of them.
+Erasing every path would erase the same drive twice at the same time,
+each at half speed and with conflicting reports.
+
+- The paths of a dm-multipath map are replaced by the map device.
+- The paths without dm-multipath are collapsed by WWN or serial number
+  after the probe, the other paths are kept to spread the writes of the
+  native engine across them when `multipath_striping` is enabled.
+"""
+import glob
+import logging
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from usody_sanitize import schemas
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# `dm/uuid` prefix of the maps created by multipathd.
+UUID_PREFIX = "mpath-"
+
+
+def maps() -> Dict[str, List[str]]:
+    """dm-multipath devices with their paths, like
+    `{'/dev/dm-0': ['/dev/sdb', '/dev/sdc']}`.
+    """
+    result = {}
+    for uuid_path in sorted(glob.glob("/sys/block/dm-*/dm/uuid")):
+        try:
+            with open(uuid_path) as _fh:
+                uuid = _fh.read().strip()
+        except OSError:
+            continue
+        if not uuid.startswith(UUID_PREFIX):
+            continue
+        block = Path(uuid_path).parent.parent
+        slaves = sorted(os.listdir(block / "slaves")) \
+            if (block / "slaves").is_dir() else []
+        result[f"/dev/{block.name}"] = [f"/dev/{s}" for s in slaves]
+    return result
+
+
+def slaves(dev_path: str) -> List[str]:
+    """Paths of a dm-multipath device, [] for the other devices."""
+    return maps().get(Path(dev_path).as_posix(), [])
+
+
+def collapse(disks: List[str]) -> List[str]:
+    """Replaces the paths of the dm-multipath maps by the map device,
+    keeping the order of the disks.
+    """
+    owners = {path: dm for dm, paths in maps().items() for path in paths}
+    result = []
+    for disk in (Path(d).as_posix() for d in disks):
+        if disk in owners:
+            logger.info(f"{disk}: Path of {owners[disk]}, using the"
+                        f" dm-multipath device.")
+            disk = owners[disk]
+        if disk not in result:
+            result.append(disk)
+    return result
+
+
+def identity(device: schemas.Device) -> Optional[str]:
+    """Key shared by all the paths of the same drive."""
+    if device.wwn:
+        return f"wwn:{device.wwn.lower()}"
+    if device.serial_number:
+        return f"serial:{device.model}:{device.serial_number}"
+    return None
+
+
+def stripe_paths(dev_path: str, device: schemas.Device) -> List[str]:
+    """Paths to spread the writes of the device across, dm-multipath
+    already balances the writes of its device.
+    """
+    if not settings.multipath_striping or not device \
+            or Path(dev_path).name.startswith("dm-"):
+        return [dev_path]
+    return [dev_path] + device.paths
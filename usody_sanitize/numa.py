@@ -0,0 +1,132 @@
+"""
+NUMA
+====
+
+Placement of the erasure of each device on the NUMA node of its
+controller. On dual-socket stations each HBA is attached to one socket,
+the writes from the CPUs and the memory of the other socket cross the
+interconnect and lower the throughput when many drives are written at
+once.
+
+- The node is the `numa_node` of the PCI device of the controller, found
+  walking up from `/sys/block/<dev>/device`, or `numa_nodes` to override
+  it by device.
+- The threads of the native engine and the erasure tools are pinned to
+  the CPUs of the node. The engine buffers are first touched by the
+  pinned threads, so the kernel allocates them on the same node, and
+  they are only reused by devices of that node.
+- Machines with a single node, or `numa_affinity` disabled, keep the
+  default placement of the kernel.
+"""
+import contextvars
+import logging
+import os
+from pathlib import Path
+from typing import List, Optional
+
+from usody_sanitize import schemas
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+SYS_NODES = "/sys/devices/system/node"
+
+
+def parse_cpulist(text: str) -> List[int]:
+    """CPUs of a list like `0-7,16-23`."""
+    cpus = []
+    for part in (text or "").strip().split(","):
+        if not part:
+            continue
+        first, _, last = part.partition("-")
+        cpus.extend(range(int(first), int(last or first) + 1))
+    return cpus
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def nodes(sys_nodes: str = SYS_NODES) -> List[int]:
+    """Online NUMA nodes of the machine."""
+    return parse_cpulist(_read(Path(sys_nodes) / "online") or "0")
+
+
+def cpus(node: int, sys_nodes: str = SYS_NODES) -> List[int]:
+    """CPUs of the node allowed to this process."""
+    cpulist = parse_cpulist(
+        _read(Path(sys_nodes) / f"node{node}" / "cpulist") or "")
+    allowed = os.sched_getaffinity(0)
+    return [cpu for cpu in cpulist if cpu in allowed]
+
+
+def device_node(dev_path: str, sys_block: str = "/sys/block") -> Optional[int]:
+    """NUMA node of the controller of the device, None if the firmware
+    does not report it.
+    """
+    device = Path(sys_block) / Path(dev_path).name / "device"
+    try:
+        device = device.resolve(strict=True)
+    except OSError:
+        return None
+    for path in [device] + list(device.parents):
+        value = _read(path / "numa_node")
+        if value is not None:
+            node = int(value)
+            return node if node >= 0 else None
+    return None
+
+
+def placement(
+        dev_path: str,
+        sys_block: str = "/sys/block",
+        sys_nodes: str = SYS_NODES,
+) -> Optional[schemas.NumaPlacement]:
+    """Node and CPUs where the erasure of the device runs, None to keep
+    the default placement.
+    """
+    if not settings.numa_affinity or len(nodes(sys_nodes)) < 2:
+        return None
+    node = settings.numa_nodes.get(dev_path)
+    source = "config"
+    if node is None:
+        node = device_node(dev_path, sys_block)
+        source = "sysfs"
+    if node is None:
+        logger.debug(f"{dev_path}: NUMA node unknown.")
+        return None
+    node_cpus = cpus(node, sys_nodes)
+    if not node_cpus:
+        logger.warning(f"{dev_path}: No CPUs allowed on NUMA node {node}.")
+        return None
+    logger.info(f"{dev_path}: Placed on NUMA node {node}.")
+    return schemas.NumaPlacement(node=node, cpus=node_cpus, source=source)
+
+
+def pin(pid: int, place: Optional[schemas.NumaPlacement]) -> None:
+    """Pins the process, or the calling thread with pid 0, to the CPUs
+    of the placement.
+    """
+    if place is None:
+        return
+    try:
+        os.sched_setaffinity(pid, place.cpus)
+    except OSError as ex:
+        logger.debug(f"Affinity of {pid or 'thread'} not set: {ex}")
+
+
+current_placement = contextvars.ContextVar("current_placement", default=None)
+
+
+def activate(place: Optional[schemas.NumaPlacement]) -> None:
+    """Sets the placement of the erasure on the current context, call it
+    from the task running the erasure of the device.
+    """
+    current_placement.set(place)
+
+
+def current() -> Optional[schemas.NumaPlacement]:
+    return current_placement.get()
@@ -0,0 +1,257 @@
+"""
+NVMe
+====
+
+Firmware erasures of NVMe controllers. The identify controller data
+(`nvme id-ctrl`) tells which of them are supported:
+
+- `SANICAP` (sanitize capabilities): bit 0 crypto erase, bit 1 block
+  erase, bit 2 overwrite.
+- `FNA` (format NVM attributes): bit 2 crypto erase on format.
+- `OACS` (optional admin commands): bit 1 format NVM.
+
+The sanitize command runs in the background on the controller, so it is
+started and then its progress is polled from the sanitize log. It erases
+all the namespaces of the controller, when several of them are selected
+the controller is only sanitized once.
+"""
+import asyncio
+import json
+import logging
+import re
+from typing import Dict, List, Optional
+
+from usody_sanitize import schemas, commands, metrics
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+SANITIZE_CRYPTO = "sanitize-crypto"
+SANITIZE_BLOCK = "sanitize-block"
+SANITIZE_OVERWRITE = "sanitize-overwrite"
+FORMAT_CRYPTO = "format-crypto"
+FORMAT_USER_DATA = "format-user-data"
+
+# `nvme sanitize --sanact` and `nvme format --ses` values.
+SANACT = {
+    SANITIZE_BLOCK: 2,
+    SANITIZE_OVERWRITE: 3,
+    SANITIZE_CRYPTO: 4,
+}
+SES = {
+    FORMAT_USER_DATA: 1,
+    FORMAT_CRYPTO: 2,
+}
+
+# Sanitize log fields with the time estimate of each action.
+ESTIMATE_FIELDS = {
+    SANITIZE_CRYPTO: "time_crypto_erase",
+    SANITIZE_BLOCK: "time_block_erase",
+    SANITIZE_OVERWRITE: "time_over_write",
+}
+# Seconds used when the controller does not report the estimate.
+DEFAULT_ESTIMATES = {
+    SANITIZE_CRYPTO: 10,
+    FORMAT_CRYPTO: 10,
+    SANITIZE_BLOCK: 60,
+    FORMAT_USER_DATA: 600,
+    SANITIZE_OVERWRITE: 24 * 60 * 60,
+}
+# Preferred order when the estimates are equal: crypto erases first.
+RANK = [
+    SANITIZE_CRYPTO,
+    FORMAT_CRYPTO,
+    SANITIZE_BLOCK,
+    FORMAT_USER_DATA,
+    SANITIZE_OVERWRITE,
+]
+NO_ESTIMATE = 0xFFFFFFFF
+
+# Sanitize status (SSTAT bits 2:0).
+STATUS_NEVER = 0
+STATUS_SUCCESS = 1
+STATUS_IN_PROGRESS = 2
+STATUS_FAILED = 3
+STATUS_SUCCESS_NO_DEALLOCATE = 4
+
+# Sanitizes running on each controller.
+_running: Dict[str, asyncio.Task] = {}
+
+
+def controller_path(dev_path: str) -> str:
+    """`/dev/nvme0n1` -> `/dev/nvme0`."""
+    return re.sub(r"(nvme\d+)n\d+$", r"\1", dev_path)
+
+
+def get_capabilities(dev_path: str) -> Optional[schemas.NvmeCapabilities]:
+    """Reads the erasure features of the controller of the device, None
+    if they are not available.
+    """
+    controller = controller_path(dev_path)
+    id_ctrl = commands.get_nvme_id_ctrl(controller)
+    if not isinstance(id_ctrl, dict) or not id_ctrl:
+        return None
+
+    sanicap = int(id_ctrl.get("sanicap", 0))
+    fna = int(id_ctrl.get("fna", 0))
+    oacs = int(id_ctrl.get("oacs", 0))
+    return schemas.NvmeCapabilities(
+        controller=controller,
+        sanicap=sanicap,
+        fna=fna,
+        oacs=oacs,
+        crypto_erase=bool(sanicap & 0x1),
+        block_erase=bool(sanicap & 0x2),
+        overwrite=bool(sanicap & 0x4),
+        format=bool(oacs & 0x2),
+        format_crypto=bool(oacs & 0x2 and fna & 0x4),
+    )
+
+
+def parse_sanitize_log(output: str) -> dict:
+    """Parses `nvme sanitize-log --output-format=json`. Old versions of
+    `nvme-cli` nest the log under the controller name.
+    """
+    try:
+        log = json.loads(output or "{}")
+    except ValueError:
+        return {}
+    if isinstance(log, dict) and "sstat" not in log and len(log) == 1:
+        log = next(iter(log.values()))
+    return log if isinstance(log, dict) else {}
+
+
+def sanitize_status(log: dict) -> int:
+    return int(log.get("sstat", 0)) & 0x7
+
+
+def estimates(log: dict) -> Dict[str, int]:
+    """Seconds of each sanitize action reported by the controller."""
+    values = {}
+    for action, field in ESTIMATE_FIELDS.items():
+        seconds = log.get(field)
+        if seconds is not None and int(seconds) != NO_ESTIMATE:
+            values[action] = int(seconds)
+    return values
+
+
+def plan_actions(
+        capabilities: Optional[schemas.NvmeCapabilities],
+        log: Optional[dict] = None,
+) -> List[str]:
+    """Supported erasure actions, the fastest first. Without the
+    identify data only the format with user data erase is tried, as
+    before knowing the capabilities.
+    """
+    if capabilities is None:
+        return [FORMAT_USER_DATA]
+
+    supported = {
+        SANITIZE_CRYPTO: capabilities.crypto_erase,
+        SANITIZE_BLOCK: capabilities.block_erase,
+        SANITIZE_OVERWRITE: capabilities.overwrite,
+        FORMAT_CRYPTO: capabilities.format_crypto,
+        FORMAT_USER_DATA: capabilities.format,
+    }
+    reported = estimates(log or {})
+    actions = [action for action in RANK if supported[action]]
+    return sorted(actions, key=lambda a: (
+        reported.get(a, DEFAULT_ESTIMATES[a]), RANK.index(a)))
+
+
+async def sanitize(
+        dev_path: str,
+        action: str,
+        step_commands: List[schemas.Exec],
+        poll_interval: float = settings.nvme_poll_interval,
+        timeout: float = settings.nvme_sanitize_timeout,
+) -> bool:
+    """Runs a sanitize action on the controller of the device, only once
+    when several namespaces of the same controller are erased at the
+    same time.
+    """
+    controller = controller_path(dev_path)
+    task = _running.get(controller)
+    if task is None:
+        task = asyncio.ensure_future(_sanitize(
+            dev_path, controller, action, poll_interval, timeout))
+        _running[controller] = task
+        task.add_done_callback(lambda _: _running.pop(controller, None))
+    else:
+        logger.info(f"{dev_path}: Sanitize already running on"
+                    f" {controller}, waiting for it.")
+
+    cmds = await asyncio.shield(task)
+    step_commands.extend(c.model_copy() for c in cmds)
+    return bool(cmds) and all(c.success for c in cmds)
+
+
+async def _sanitize(
+        dev_path: str,
+        controller: str,
+        action: str,
+        poll_interval: float,
+        timeout: float,
+) -> List[schemas.Exec]:
+    device_metrics = metrics.registry.device(dev_path)
+    cmds = []
+    cmd = await commands.erasure_command(
+        f"nvme sanitize {controller} --sanact={SANACT[action]}")
+    cmd.description = f"Start the sanitize {action} on the controller."
+    cmds.append(cmd)
+    if not cmd.success:
+        return cmds
+
+    # Only the first and the last poll are kept on the report.
+    first_poll = last_poll = None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        await asyncio.sleep(poll_interval)
+        last_poll = await commands.erasure_command(
+            f"nvme sanitize-log {controller} --output-format=json")
+        first_poll = first_poll or last_poll
+        log = parse_sanitize_log(last_poll.stdout)
+        status = sanitize_status(log)
+
+        if status == STATUS_IN_PROGRESS:
+            # SPROG is the numerator of a fraction of 65536.
+            device_metrics.update_progress(int(log.get("sprog", 0)), 65536)
+            if loop.time() > deadline:
+                last_poll.success = False
+                last_poll.description = "Sanitize timed out."
+                break
+            continue
+
+        last_poll.success = last_poll.success and status in (
+            STATUS_SUCCESS, STATUS_SUCCESS_NO_DEALLOCATE)
+        last_poll.description = "Sanitize finished with status" \
+                                f" {status}."
+        break
+
+    if first_poll is not last_poll:
+        first_poll.description = "Sanitize progress."
+        cmds.append(first_poll)
+    cmds.append(last_poll)
+    return cmds
+
+
+async def format_nvm(
+        dev_path: str,
+        action: str,
+        step_commands: List[schemas.Exec],
+) -> bool:
+    """Formats the namespace with a secure erase setting."""
+    ses = SES[action]
+    cmd = await commands.erasure_command(
+        f"nvme format --force --ses={ses} {dev_path}")
+    cmd.description = "Erase all contents from the disks with secure" \
+                      f" erasure enabled (--ses={ses})."
+    step_commands.append(cmd)
+    return cmd.success
+
+
+async def read_sanitize_log(controller: str) -> dict:
+    cmd = await commands.erasure_command(
+        f"nvme sanitize-log {controller} --output-format=json")
+    return parse_sanitize_log(cmd.stdout) if cmd.success else {}
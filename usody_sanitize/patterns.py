@@ -0,0 +1,216 @@
+"""
+Patterns
+========
+
+Specification of the data written by each pass of a method, the
+`pattern` of `schemas.Execution`:
+
+- `zeros`: all the bytes set to zero.
+- `random`: random data from the kernel CSPRNG, different on each run.
+- `hex:<bytes>`: a byte sequence repeated over the whole device, like
+  `hex:55` or `hex:924924`.
+- `random:seed=<n>`: pseudo-random data generated from the seed and the
+  position, the same on every run so a pass can be verified or
+  complemented.
+- `complement`: the bitwise complement of the previous pass, which must
+  have a fixed or a seeded pattern. It is resolved by the planner to
+  `hex:<bytes>` or `random:seed=<n>:complement`.
+
+The fixed patterns are precomputed once into page aligned buffers, a
+multiple of the pattern length, and shared read-only by all the writers
+of the native engine. The buffers are reserved on the buffer pool,
+charged to its memory budget, and unmapped when the last pass writing
+them ends.
+"""
+import collections
+import contextlib
+import hashlib
+import mmap
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from usody_sanitize import buffers
+
+ZEROS = "zeros"
+RANDOM = "random"
+COMPLEMENT = "complement"
+
+PAGE_SIZE = mmap.PAGESIZE
+# Bytes of the seeded patterns generated from each position.
+SEED_BLOCK_SIZE = 64 * 1024
+# Complement of each byte.
+INVERT = bytes(255 - i for i in range(256))
+
+HEX_RE = re.compile(r"^hex:((?:[0-9a-fA-F]{2})+)$")
+SEED_RE = re.compile(r"^random:seed=(\d+)(:complement)?$")
+
+# `data` of the fixed patterns, `seed` of the seeded ones.
+Pattern = collections.namedtuple(
+    "Pattern", ["spec", "data", "seed", "complement"])
+
+
+def parse(spec: Optional[str]) -> Pattern:
+    """Parses a resolved pattern spec, raises ValueError if it is not
+    valid. None is `random`, the default of the tools.
+    """
+    if spec is None or spec == RANDOM:
+        return Pattern(RANDOM, None, None, False)
+    if spec == ZEROS:
+        return Pattern(spec, b"\0", None, False)
+    match = HEX_RE.match(spec)
+    if match:
+        return Pattern(spec, bytes.fromhex(match.group(1)), None, False)
+    match = SEED_RE.match(spec)
+    if match:
+        return Pattern(spec, None, int(match.group(1)), bool(match.group(2)))
+    raise ValueError(f"Invalid pattern `{spec}`, expected zeros, random,"
+                     f" hex:<bytes>, random:seed=<n> or complement.")
+
+
+def validate(spec: Optional[str]) -> Optional[str]:
+    """Checks the syntax of a pattern spec, `complement` included."""
+    if spec != COMPLEMENT:
+        parse(spec)
+    return spec
+
+
+def complement(previous: Optional[str]) -> str:
+    """Spec of the complement of the previous pattern."""
+    pattern = parse(previous)
+    if pattern.data is not None:
+        return f"hex:{pattern.data.translate(INVERT).hex()}"
+    if pattern.seed is not None:
+        suffix = "" if pattern.complement else ":complement"
+        return f"random:seed={pattern.seed}{suffix}"
+    raise ValueError(f"The complement of a `{previous}` pass can not be"
+                     f" written, it needs a fixed or a seeded pattern.")
+
+
+def resolve(specs: List[Optional[str]]) -> List[Optional[str]]:
+    """Replaces each `complement` by the spec of the previous pass."""
+    result = []
+    for spec in specs:
+        if spec == COMPLEMENT:
+            if not result:
+                raise ValueError("The first pass can not be a complement.")
+            spec = complement(result[-1])
+        result.append(spec)
+    return result
+
+
+def is_generated(spec: Optional[str]) -> bool:
+    """True for the patterns only written by the native engine, `shred`
+    and `badblocks` only write zeros and random data.
+    """
+    return spec not in (None, ZEROS, RANDOM)
+
+
+def chunk_size(pattern: Pattern, preferred: int) -> int:
+    """Chunk size aligned to the pages and to the pattern length, so the
+    pattern continues across the chunks.
+    """
+    if not pattern.data:
+        return preferred
+    unit = PAGE_SIZE * len(pattern.data)
+    return max(preferred // unit, 1) * unit
+
+
+class _Table:
+    """Buffer of a fixed pattern and the writers using it."""
+
+    def __init__(self):
+        self.users = 1
+        self.view: Optional[memoryview] = None
+        self.ready = threading.Event()
+        self.stack = contextlib.ExitStack()
+
+
+_tables: Dict[Tuple[bytes, int], _Table] = {}
+_lock = threading.Lock()
+
+
+@contextlib.contextmanager
+def table(
+        pattern: Pattern,
+        size: int,
+        cancelled: Optional[threading.Event] = None,
+):
+    """Read-only page aligned buffer of `size` bytes with the fixed
+    pattern, computed once for all the writers of the same pattern and
+    size. It yields None if `cancelled` is set while waiting for the
+    budget of the buffer pool.
+    """
+    key = (pattern.data, size)
+    while True:
+        with _lock:
+            entry = _tables.get(key)
+            creator = entry is None
+            if creator:
+                entry = _tables[key] = _Table()
+            else:
+                entry.users += 1
+        if creator:
+            _fill_table(key, entry, pattern, size, cancelled)
+        else:
+            while not entry.ready.wait(1):
+                if cancelled is not None and cancelled.is_set():
+                    break
+        if entry.view is not None or creator \
+                or cancelled is not None and cancelled.is_set():
+            break
+        # Not reserved by a cancelled writer, try to reserve it.
+        _release_table(key, entry)
+
+    try:
+        yield entry.view
+    finally:
+        _release_table(key, entry)
+
+
+def _fill_table(key: Tuple[bytes, int], entry: _Table, pattern: Pattern,
+                size: int, cancelled: Optional[threading.Event]) -> None:
+    try:
+        buffer = entry.stack.enter_context(
+            buffers.pool.reserve(size, cancelled))
+        if buffer is None:
+            with _lock:
+                # The next writers reserve their own.
+                _tables.pop(key, None)
+            return
+        repeats = -(-size // len(pattern.data))
+        buffer.write((pattern.data * repeats)[:size])
+        # Views of the same map, released with it.
+        entry.view = memoryview(buffer).toreadonly()
+    finally:
+        entry.ready.set()
+
+
+def _release_table(key: Tuple[bytes, int], entry: _Table) -> None:
+    with _lock:
+        entry.users -= 1
+        if entry.users:
+            return
+        if _tables.get(key) is entry:
+            del _tables[key]
+    if entry.view is not None:
+        entry.view.release()
+    # Unmaps the buffer and returns its bytes to the budget.
+    entry.stack.close()
+
+
+def fill(pattern: Pattern, view: memoryview, offset: int) -> None:
+    """Fills the view with the seeded pattern of the device position,
+    the same data on every run whatever the chunk size.
+    """
+    seed = pattern.seed.to_bytes(8, "little")
+    filled = 0
+    while filled < len(view):
+        block, start = divmod(offset + filled, SEED_BLOCK_SIZE)
+        length = min(SEED_BLOCK_SIZE - start, len(view) - filled)
+        data = hashlib.shake_128(seed + block.to_bytes(8, "little")).digest(
+            SEED_BLOCK_SIZE)[start:start + length]
+        if pattern.complement:
+            data = data.translate(INVERT)
+        view[filled:filled + length] = data
+        filled += length
@@ -0,0 +1,238 @@
+"""
+Planner
+=======
+
+Turns a `schemas.Method` and the capabilities of a device into an
+explicit execution plan. Several tools erase a device in an equivalent
+way, the planner chooses the cheapest one for each step and keeps the
+others as fallback:
+
+- Overwrites: `shred`, the `native` engine, or `blkzeroout` offloaded to
+  the device for zeros passes. Zoned devices are always overwritten
+  zone by zone with the `zoned` engine. The fixed and seeded patterns
+  of the standards are only written by the engines.
+- Firmware erasures: TCG revert (`sedutil`), `nvme`, `scsi` or `hdparm`,
+  then the block layer (`blksecdiscard`, `blkzeroout`) when all of them
+  fail.
+
+SSDs are always erased by their firmware, overwriting them damages the
+flash and does not reach the over-provisioned blocks. HDDs use a crypto
+erase of their firmware only for single pass methods without bad
+sectors checks. The verification of the method is always kept.
+"""
+import logging
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from usody_sanitize import schemas, nvme, ata, scsi, sed, patterns
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Tools that overwrite the whole device in the same way.
+OVERWRITE_TOOLS = ('shred', 'native')
+# Seconds of the erasures that only destroy a key.
+KEY_DESTRUCTION_SECONDS = 10
+# Tools that can not write the sequential zones of a zoned device.
+ZONED_UNSUPPORTED = ('shred', 'badblocks', 'native', 'blkzeroout')
+# badblocks writes and then reads back each pattern.
+COST_FACTOR = {
+    'badblocks': 2,
+}
+
+
+def _throughput(device: schemas.Device) -> float:
+    if device.storage_medium == "HDD":
+        return settings.planner_hdd_throughput
+    return settings.planner_ssd_throughput
+
+
+def _overwrite_cost(
+        size: int,
+        rate: float,
+        tool: str,
+        rotational: bool = False,
+) -> float:
+    if tool == 'blkzeroout':
+        # WRITE SAME still writes the platters at the speed of the disk.
+        return size / (rate if rotational
+                       else settings.planner_write_zeroes_throughput)
+    if tool == 'blksecdiscard':
+        return size / settings.planner_discard_throughput
+    return size / rate * COST_FACTOR.get(tool, 1)
+
+
+def _firmware_tools(
+        dev_path: str,
+        device: schemas.Device,
+        size: int,
+        rate: float,
+        crypto_only: bool,
+) -> List[Tuple[float, str]]:
+    """Firmware erasures supported by the device with their cost. With
+    `crypto_only` only the ones destroying a key, for HDDs.
+    """
+    capabilities = device.capabilities
+    tools = []
+    if sed.plan_actions(capabilities.sed):
+        tools.append((KEY_DESTRUCTION_SECONDS, 'sedutil'))
+
+    if Path(dev_path).name.startswith("nvme"):
+        actions = nvme.plan_actions(capabilities.nvme)
+        crypto = [a for a in actions
+                  if a in (nvme.SANITIZE_CRYPTO, nvme.FORMAT_CRYPTO)]
+        if crypto or (actions and not crypto_only):
+            tools.append((nvme.DEFAULT_ESTIMATES[(crypto or actions)[0]],
+                          'nvme'))
+
+    elif capabilities.scsi:
+        actions = scsi.plan_actions(capabilities.scsi)
+        if capabilities.scsi.reported and capabilities.scsi.crypto_erase:
+            tools.append((KEY_DESTRUCTION_SECONDS, 'scsi'))
+        elif actions and not crypto_only:
+            tools.append((_overwrite_cost(size, rate, 'scsi'), 'scsi'))
+
+    else:
+        actions = ata.plan_actions(capabilities.ata)
+        if ata.SANITIZE_CRYPTO in actions:
+            tools.append((ata.estimate(capabilities.ata, ata.SANITIZE_CRYPTO),
+                          'hdparm'))
+        elif actions and not crypto_only:
+            estimate = ata.estimate(capabilities.ata, actions[0]) \
+                if capabilities.ata else ata.DEFAULT_ESTIMATES[actions[0]]
+            tools.append((estimate, 'hdparm'))
+
+    return sorted(tools)
+
+
+def _plan_overwrite(
+        execution: schemas.Execution,
+        device: schemas.Device,
+        size: int,
+        rate: float,
+) -> schemas.PlannedStep:
+    """Chooses the cheapest tool equivalent to the one of the method,
+    the tool of the method wins on equal costs.
+    """
+    queue = device.capabilities.queue
+    if queue and queue.is_zoned and execution.tool in ZONED_UNSUPPORTED:
+        # Random writes and write zeroes are rejected by the zones.
+        return schemas.PlannedStep(
+            tool='zoned',
+            pattern=execution.pattern,
+            predicted_duration=_overwrite_cost(size, rate, 'zoned'),
+            reason="sequential overwrite of each zone",
+        )
+
+    candidates = [execution.tool]
+    if patterns.is_generated(execution.pattern) \
+            and execution.tool in OVERWRITE_TOOLS + ('badblocks',):
+        # Fixed and seeded patterns are only written by the engine.
+        candidates = ['native']
+    elif execution.tool in OVERWRITE_TOOLS:
+        candidates += [t for t in OVERWRITE_TOOLS if t != execution.tool]
+        if execution.pattern == 'zeros' and queue and queue.write_zeroes:
+            candidates.append('blkzeroout')
+
+    rotational = device.storage_medium == "HDD"
+    costs = sorted(
+        (_overwrite_cost(size, rate, tool, rotational), index, tool)
+        for index, tool in enumerate(candidates))
+    cost, _, tool = costs[0]
+    return schemas.PlannedStep(
+        tool=tool,
+        pattern=execution.pattern,
+        fallback=[t for _, _, t in costs[1:]],
+        predicted_duration=cost,
+        reason="offloaded to the device" if tool == 'blkzeroout'
+        else f"overwrite with {execution.pattern or 'the default'} pattern",
+    )
+
+
+def plan(
+        dev_path: str,
+        method: schemas.Method,
+        device: schemas.Device,
+        size: Optional[int] = None,
+        throughput: Optional[float] = None,
+) -> schemas.Plan:
+    """Plans the steps of the method for the device.
+
+    :param str dev_path: Path to the device.
+    :param schemas.Method method: Method selected by the user.
+    :param schemas.Device device: Device info with its capabilities.
+    :param int size: Bytes of the device, to estimate the costs.
+    :param float throughput: Bytes per second measured on the device,
+        the `planner_*_throughput` settings are used without it.
+    :return: schemas.Plan
+
+    Example:
+    >>> plan("/dev/sda", BASIC, device, 320072933376).predicted_duration
+    """
+    size = size or 0
+    rate = throughput or _throughput(device)
+    result = schemas.Plan(verification_enabled=method.verification_enabled)
+
+    # Destroying the keys of a LUKS volume makes it unrecoverable at
+    # once, before the erasure of the method.
+    if device.capabilities.luks:
+        result.steps.append(schemas.PlannedStep(
+            tool='luks',
+            predicted_duration=KEY_DESTRUCTION_SECONDS
+            + device.capabilities.luks.header_size / rate,
+            reason="LUKS volume",
+        ))
+
+    # The complements are resolved to the pattern of each pass.
+    specs = patterns.resolve([e.pattern for e in method.overwriting_steps])
+    overwrites = [
+        _plan_overwrite(e.model_copy(update={'pattern': spec}),
+                        device, size, rate)
+        for e, spec in zip(method.overwriting_steps, specs)]
+    single_pass = len(method.overwriting_steps) == 1 \
+        and not method.bad_sectors_enabled
+
+    if device.storage_medium == "SSD":
+        firmware = _firmware_tools(
+            dev_path, device, size, rate, crypto_only=False)
+        queue = device.capabilities.queue
+        if queue and queue.is_zoned:
+            block_layer = ['zoned']
+        else:
+            block_layer = (['blksecdiscard'] if queue and queue.discard
+                           else []) + ['blkzeroout']
+        tools = [tool for _, tool in firmware] + block_layer
+        result.steps.append(schemas.PlannedStep(
+            tool=tools[0],
+            fallback=tools[1:],
+            predicted_duration=firmware[0][0] if firmware
+            else _overwrite_cost(size, rate, tools[0]),
+            reason="firmware erasure of the flash",
+        ))
+
+    elif device.storage_medium == "HDD":
+        firmware = _firmware_tools(
+            dev_path, device, size, rate, crypto_only=True)
+        overwrite_cost = sum(s.predicted_duration for s in overwrites)
+        if single_pass and firmware and firmware[0][0] < overwrite_cost:
+            overwrite = overwrites[0]
+            result.steps.append(schemas.PlannedStep(
+                tool=firmware[0][1],
+                fallback=[tool for _, tool in firmware[1:]]
+                + [overwrite.tool] + overwrite.fallback,
+                pattern=overwrite.pattern,
+                predicted_duration=firmware[0][0],
+                reason="crypto erase of the firmware",
+            ))
+        else:
+            result.steps.extend(overwrites)
+
+    else:
+        # Todo: Research about more types.
+        raise Exception("Unknown method.")
+
+    result.predicted_duration = sum(
+        s.predicted_duration for s in result.steps)
+    logger.info(f"{dev_path}: Planned {[s.tool for s in result.steps]},"
+                f" predicted {round(result.predicted_duration)}s.")
+    return result
@@ -0,0 +1,276 @@
+"""
+Producers
+=========
+
+Random patterns generated by a pool of worker processes, for the native
+overwrite engine of many drives at once. Generated on the writing
+threads, the random data of all the drives is limited by a single core
+and the GIL of the process.
+
+- The producers fill the slots of an arena of shared memory with data
+  from the kernel CSPRNG, reading `/dev/urandom` straight into the slot.
+- Each writer gets a ring of slots: it writes a filled slot from the
+  shared memory without copying it, and gives it back to be filled again
+  by any producer.
+- The slots are shared fairly: the rings give the slots over their share
+  to the rings under it as more writers open rings, and take the free
+  slots as other rings close. The writers beyond one per slot fill their
+  own buffers.
+- The slots are page aligned, as required by `O_DIRECT`.
+
+Enabled with `pattern_producers`, the processes are started before the
+erasures and stopped after them.
+"""
+import collections
+import contextlib
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional
+
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+SOURCE = "/dev/urandom"
+
+
+def _fill(source, view: memoryview) -> None:
+    filled = 0
+    while filled < len(view):
+        filled += source.readinto(view[filled:])
+
+
+def _produce(name: str, slot_size: int, work, done) -> None:
+    """Loop of a producer process, it fills the slots given on `work`
+    until it gets None.
+    """
+    arena = shared_memory.SharedMemory(name)
+    try:
+        with open(SOURCE, "rb", buffering=0) as source:
+            for ring, slot in iter(work.get, None):
+                with arena.buf[slot * slot_size:(slot + 1) * slot_size] \
+                        as view:
+                    _fill(source, view)
+                done.put((ring, slot))
+    finally:
+        arena.close()
+
+
+class Ring:
+    """Slots of the arena filled for a single writer."""
+
+    def __init__(self, producers: "PatternProducers", number: int,
+                 depth: int):
+        self.producers = producers
+        self.number = number
+        self.depth = depth
+        # Slots of the ring, filled, being filled or being written.
+        self.slots: List[int] = []
+        self.closed = False
+        self.filled: "queue.Queue[int]" = queue.Queue()
+
+    def get(self, cancelled: Optional[threading.Event] = None
+            ) -> Optional[int]:
+        """Next filled slot, None if `cancelled` is set while waiting."""
+        while True:
+            try:
+                return self.filled.get(timeout=1)
+            except queue.Empty:
+                if cancelled is not None and cancelled.is_set():
+                    return None
+
+    def view(self, slot: int) -> memoryview:
+        """Slot on the shared memory, it must be released before the
+        slot is given back.
+        """
+        size = self.producers.slot_size
+        return self.producers.buffer[slot * size:(slot + 1) * size]
+
+    def release(self, slot: int) -> None:
+        """Gives the written slot back to be filled again, or to another
+        ring when the ring is over its share.
+        """
+        self.producers._rebalance(self, slot)
+
+
+class PatternProducers:
+    """Pool of processes filling rings of random data.
+
+    :param int processes: Producer processes, one per core by default.
+    :param int size: Bytes of the shared memory of all the rings.
+    :param int slot_size: Bytes of each slot, the size of the writes.
+
+    Example:
+    >>> producers = PatternProducers(processes=8)
+    >>> producers.start()
+    >>> with producers.ring(depth=4) as ring:
+    ...     # None when all the slots are taken.
+    ...     slot = ring.get()
+    ...     with ring.view(slot) as view:
+    ...         os.pwrite(fd, view, offset)
+    ...     ring.release(slot)
+    >>> producers.stop()
+    """
+
+    def __init__(
+            self,
+            processes: Optional[int] = None,
+            size: int = settings.pattern_arena_size,
+            slot_size: int = settings.engine_chunk_size,
+    ):
+        self.processes = processes or os.cpu_count() or 1
+        self.slot_size = slot_size
+        self.slots = max(size // slot_size, 1)
+        self.buffer: Optional[memoryview] = None
+        self.work = None
+        self._done = None
+        self._arena: Optional[shared_memory.SharedMemory] = None
+        self._workers: List[multiprocessing.Process] = []
+        self._dispatcher: Optional[threading.Thread] = None
+        self._rings: Dict[int, Ring] = {}
+        self._next_ring = 0
+        self._free = collections.deque(range(self.slots))
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        # Spawned, the erasures may have started threads already.
+        context = multiprocessing.get_context("spawn")
+        self._arena = shared_memory.SharedMemory(
+            create=True, size=self.slots * self.slot_size)
+        self.buffer = self._arena.buf
+        self.work = context.Queue()
+        self._done = context.Queue()
+        self._workers = [
+            context.Process(
+                target=_produce, daemon=True,
+                name=f"pattern-producer-{i}",
+                args=(self._arena.name, self.slot_size, self.work,
+                      self._done))
+            for i in range(self.processes)]
+        for worker in self._workers:
+            worker.start()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch, name="pattern-dispatcher", daemon=True)
+        self._dispatcher.start()
+        logger.info(f"{self.processes} pattern producers started with"
+                    f" {self.slots} slots of {self.slot_size} bytes.")
+
+    def stop(self) -> None:
+        for _ in self._workers:
+            self.work.put(None)
+        for worker in self._workers:
+            worker.join(10)
+            if worker.is_alive():
+                worker.kill()
+        self._done.put(None)
+        self._dispatcher.join()
+        self.buffer = None
+        self._arena.close()
+        self._arena.unlink()
+        self._workers = []
+
+    def share(self, depth: int) -> int:
+        """Slots of each ring while the arena is shared by the open
+        rings, at least one.
+        """
+        return max(1, min(depth, self.slots // max(len(self._rings), 1)))
+
+    @contextlib.contextmanager
+    def ring(self, depth: int = settings.pattern_ring_depth):
+        """Ring of up to `depth` slots, less while the arena is shared by
+        many writers. It yields None when there are more writers than
+        slots, the writer must fill its own buffers.
+        """
+        with self._lock:
+            ring = None
+            if len(self._rings) < self.slots:
+                ring = Ring(self, self._next_ring, depth)
+                self._rings[ring.number] = ring
+                self._next_ring += 1
+                while self._free and len(ring.slots) < self.share(depth):
+                    self._assign(ring, self._free.popleft())
+        if ring is None:
+            yield None
+            return
+        try:
+            yield ring
+        finally:
+            self._close(ring)
+
+    def _assign(self, ring: Ring, slot: int) -> None:
+        if slot not in ring.slots:
+            ring.slots.append(slot)
+        self.work.put((ring.number, slot))
+
+    def _give(self, slot: int) -> None:
+        """Gives the slot to a ring under its share, or to the free
+        slots.
+        """
+        for ring in self._rings.values():
+            if not ring.closed and len(ring.slots) < self.share(ring.depth):
+                self._assign(ring, slot)
+                return
+        self._free.append(slot)
+
+    def _rebalance(self, ring: Ring, slot: int) -> None:
+        with self._lock:
+            if len(ring.slots) > self.share(ring.depth):
+                ring.slots.remove(slot)
+                self._give(slot)
+            else:
+                self._assign(ring, slot)
+                while self._free \
+                        and len(ring.slots) < self.share(ring.depth):
+                    self._assign(ring, self._free.popleft())
+
+    def _dispatch(self) -> None:
+        """Routes the filled slots to their rings, or to other rings when
+        the ring is closed.
+        """
+        for number, slot in iter(self._done.get, None):
+            with self._lock:
+                ring = self._rings.get(number)
+                if ring is None or ring.closed:
+                    self._give(slot)
+                else:
+                    ring.filled.put(slot)
+
+    def _close(self, ring: Ring) -> None:
+        with self._lock:
+            ring.closed = True
+            self._rings.pop(ring.number)
+            # The slots being filled are given by the dispatcher.
+            while not ring.filled.empty():
+                self._give(ring.filled.get())
+
+
+_producers: Optional[PatternProducers] = None
+
+
+def start(processes: Optional[int] = None) -> None:
+    """Starts the producers used by the overwrite engines, `processes`
+    0 does nothing and -1 starts one per core, `pattern_producers` by
+    default.
+    """
+    global _producers
+    if processes is None:
+        processes = settings.pattern_producers
+    if not processes or _producers is not None:
+        return
+    _producers = PatternProducers(processes if processes > 0 else None)
+    _producers.start()
+
+
+def stop() -> None:
+    global _producers
+    if _producers is not None:
+        _producers.stop()
+        _producers = None
+
+
+def current() -> Optional[PatternProducers]:
+    return _producers
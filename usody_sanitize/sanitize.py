@@ -1,16 +1,39 @@
+import asyncio
+import contextlib
 import json
 import logging
 import sys
+import time
 from pathlib import Path
 from typing import Union, Optional
 
-from usody_sanitize import schemas, steps, commands, utils, exceptions
-from usody_sanitize.config import settings
-from usody_sanitize.methods import (
-    BASIC,
-    CRYPTOGRAPHIC_ATA,  # SSD
-    CRYPTOGRAPHIC_NVME,  # M.2
+from usody_sanitize import (
+    schemas,
+    steps,
+    commands,
+    utils,
+    exceptions,
+    metrics,
+    tracing,
+    iostats,
+    blkdev,
+    nvme,
+    ata,
+    scsi,
+    sed,
+    luks,
+    planner,
+    throughput,
+    health,
+    thermal,
+    multipath,
+    tuning,
+    write_cache,
+    numa,
 )
+from usody_sanitize.config import settings
+from usody_sanitize.methods import BASIC
+from usody_sanitize.store import JobStore
 
 logger = logging.getLogger(__name__)
 mounted_volumes = commands.MountedVolumes()  # Cache mounted volumes.
@@ -31,30 +54,46 @@ class ErasureProcess:
             self.error = "Mounted volume."
             return
 
-        # Init disk schema.
-        try:
-            self._device = schemas.Device(
-                # Export data from disk.
-                export_data=schemas.ExportData(
-                    smart=commands.get_smart_info(self.__path.as_posix()),
-                    block=commands.get_lsblk_info(self.__path.as_posix()),
+        self._tracer = tracing.Tracer(self.__path.as_posix())
+        with self._tracer.span("probe"):
+            # `smartctl` can not read the dm-multipath devices, only
+            # their paths.
+            paths = multipath.slaves(self.__path.as_posix())
+            self._smart_path = paths[0] if paths else self.__path.as_posix()
+            # Init disk schema.
+            try:
+                self._device = schemas.Device(
+                    # Export data from disk.
+                    export_data=schemas.ExportData(
+                        smart=commands.get_smart_info(self._smart_path),
+                        block=commands.get_lsblk_info(self.__path.as_posix()),
+                    ),
+                    paths=paths,
                 )
+            except exceptions.DiskNotFoundError as e:
+                self._device = None
+                self.error = e.message
+                logger.error(self.error)
+                return
+
+            logger.debug(f"{self.__path.as_posix()}: Data successful exported.")
+
+            self._sanitize = schemas.Sanitize(
+                device_info=self._device,
+                validation=schemas.SanitizeValidation(),
             )
-        except exceptions.DiskNotFoundError as e:
-            self._device = None
-            self.error = e.message
-            logger.error(self.error)
-            return
+            # --> HERE SET THE DEFAULT ERASURE METHOD <--
+            self._sanitize.method = BASIC if method is None else method
+            self._extract_device_info()
 
-        logger.debug(f"{self.__path.as_posix()}: Data successful exported.")
+        with self._tracer.span("plan"):
+            self._sanitize.plan = planner.plan(
+                self.__path.as_posix(), self._sanitize.method, self._device,
+                self.size)
 
-        self._sanitize = schemas.Sanitize(
-            device_info=self._device,
-            validation=schemas.SanitizeValidation(),
-        )
-        # --> HERE SET THE DEFAULT ERASURE METHOD <--
-        self._sanitize.method = BASIC if method is None else method
-        self._extract_device_info()
+        self._metrics = metrics.registry.device(self.__path.as_posix())
+        self._metrics.serial_number = self._device.serial_number
+        self._write_cache: Optional[write_cache.WriteCache] = None
 
     @property
     def path(self) -> Path:
@@ -75,6 +114,10 @@ class ErasureProcess:
                    f" [Type: {self._device.storage_medium}]"
         return f"Device {self.path}: {self.error or 'Unknown error'}."
 
+    @property
+    def device(self) -> Optional[schemas.Device]:
+        return self._device
+
     @property
     def blk(self) -> Optional[schemas.Block]:
         return self._device.export_data.block
@@ -83,8 +126,75 @@ class ErasureProcess:
     def smart(self) -> Optional[schemas.Smart]:
         return self._device.export_data.smart
 
+    @property
+    def size(self) -> Optional[int]:
+        """Bytes of the device."""
+        if self.smart.user_capacity and self.smart.user_capacity.bytes:
+            return self.smart.user_capacity.bytes
+        return utils.parse_size(self.blk.size)
+
     def export(self) -> dict:
-        return self._sanitize.dict()
+        with self._tracer.span("export"):
+            return self._sanitize.dict()
+
+    async def is_cool(self) -> bool:
+        """False while the drive is too hot to start its erasure."""
+        temperature = await thermal.read_temperature(self._smart_path)
+        return temperature is None \
+            or temperature < settings.thermal_max_temperature
+
+    def predict_duration(self, history: Optional[JobStore] = None) -> float:
+        """Predicts the seconds of the erasure from the throughput of the
+        past erasures of the same drive model and method, the estimate
+        of the plan is kept without history.
+
+        :param Optional[JobStore] history: Job store with the history.
+        :return: Predicted seconds of the erasure.
+        """
+        plan = self._sanitize.plan
+        if history is None or not self.size:
+            return plan.predicted_duration
+
+        rate, samples = history.throughput(
+            self._device.model, self.smart.firmware_version,
+            self._device.connector, self._sanitize.method.name)
+        if rate:
+            plan.predicted_duration = self.size / rate
+            plan.history_samples = samples
+            logger.debug(f"{self.path}: Predicted"
+                         f" {round(plan.predicted_duration)}s from"
+                         f" {samples} past erasures.")
+        return plan.predicted_duration
+
+    async def dry_run(self, history: Optional[JobStore] = None) -> dict:
+        """Measures the read throughput of the device and plans the
+        method with it, nothing is written to the device. The history of
+        the drive model is preferred to predict the duration.
+
+        :param Optional[JobStore] history: Job store with the history.
+        :return: dict with the device, the measured throughput and the
+            plan with its predicted duration.
+        """
+        tracing.activate(self._tracer)
+        with tracing.span("dry_run"):
+            measured = await throughput.measure_read_throughput(
+                self.path.as_posix())
+            rate = sum(measured.values()) / len(measured) if measured else 0
+            plan = planner.plan(
+                self.path.as_posix(), self._sanitize.method, self._device,
+                self.size, throughput=rate or None)
+        self._sanitize.plan = plan
+        self.predict_duration(history)
+        return {
+            'path': self.path.as_posix(),
+            'model': self._device.model,
+            'serial_number': self._device.serial_number,
+            'size': self.size,
+            'read_throughput': measured,
+            'plan': plan.dict(),
+            'predicted_duration': plan.predicted_duration,
+            'history_samples': plan.history_samples,
+        }
 
     def _extract_device_info(self):
         """Extract the data from the disk and process it to get the
@@ -100,6 +210,7 @@ class ErasureProcess:
         self._device.model = self.blk.model or self.smart.model_name
         self._device.serial_number = self.blk.serial \
                                      or self.smart.serial_number
+        self._device.wwn = self.blk.wwn or utils.format_wwn(self.smart.wwn)
         self._device.connector = self.blk.subsystems
         self._device.size = self.blk.size
 
@@ -107,6 +218,24 @@ class ErasureProcess:
         with open(f"/sys/block/{self.path.name}/queue/rotational") as _fh:
             rotation = int(_fh.read())
         self._device.storage_medium = "HDD" if rotation else "SSD"
+        self._device.capabilities.queue = \
+            blkdev.get_queue_capabilities(self.path)
+        if self._device.capabilities.queue.zoned == "none" and self.blk.zoned:
+            self._device.capabilities.queue.zoned = self.blk.zoned
+        if self.path.name.startswith("nvme"):
+            self._device.capabilities.nvme = \
+                nvme.get_capabilities(self.path.as_posix())
+        elif scsi.is_scsi(self.blk, self.smart):
+            self._device.capabilities.scsi = \
+                scsi.get_capabilities(self.path.as_posix())
+        else:
+            self._device.capabilities.ata = \
+                ata.get_capabilities(self.path.as_posix())
+        self._device.capabilities.luks = \
+            luks.detect(self.path.as_posix(), self.blk)
+        if sed.security_supported(self._device.capabilities):
+            self._device.capabilities.sed = sed.get_capabilities(
+                self.path.as_posix(), self._device.serial_number)
 
         if self.smart.rotation_rate == 0:  # Is SSD.
             if rotation == 1:
@@ -123,11 +252,81 @@ class ErasureProcess:
         if not self._device:
             raise exceptions.DiskNotFoundError(self.path)
 
+        tracing.activate(self._tracer)
+        self._sanitize.numa = numa.placement(self.path.as_posix())
+        numa.activate(self._sanitize.numa)
+        self._metrics.running = True
+        plan = self._sanitize.plan
+        plan.predicted_end = time.time() + plan.predicted_duration
+        self._metrics.predicted_end = plan.predicted_end
+        end = time.localtime(plan.predicted_end)
+        logger.info(f"{self.path}: Expected to finish at"
+                    f" {time.strftime('%Y-%m-%d %H:%M:%S', end)}.")
+        monitor = health.HealthMonitor(
+            self._smart_path, self.smart.model_dump())
+        thermal_monitor = thermal.ThermalMonitor(
+            self.path.as_posix(),
+            thermal.parse_temperature(self.smart.model_dump()),
+            source=self._smart_path)
+        thermal.activate(thermal_monitor)
+        thermal_task = asyncio.create_task(thermal_monitor.run())
+        tuner = tuning.QueueTuner(self.path) if settings.queue_tuning \
+            else None
+        self._write_cache = write_cache.WriteCache(
+            self.path.as_posix(), self._device) if settings.write_cache \
+            else None
+        try:
+            async with contextlib.AsyncExitStack() as stack:
+                if tuner:
+                    stack.enter_context(tuner)
+                if self._write_cache:
+                    await stack.enter_async_context(self._write_cache)
+                await self._run_monitored(monitor)
+        except Exception:
+            self._metrics.errors += 1
+            raise
+        finally:
+            thermal_task.cancel()
+            if tuner:
+                self._sanitize.queue_tuning = tuner.summary()
+            if self._write_cache:
+                self._sanitize.write_cache = self._write_cache.summary()
+            self._sanitize.health = monitor.samples
+            self._sanitize.thermal = thermal_monitor.summary()
+            self._metrics.finish(self._sanitize.result)
+            self._sanitize.spans = self._tracer.phases()
+
+    async def _run_monitored(self, monitor: health.HealthMonitor):
+        """Runs the sanitize process while the SMART counters are polled,
+        a failing drive aborts the process.
+        """
+        process = asyncio.create_task(self._run_process())
+        watcher = asyncio.create_task(monitor.run())
+        try:
+            await asyncio.wait({process, watcher},
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            watcher.cancel()
+
+        if not process.done():
+            process.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await process
+            self._sanitize.aborted = watcher.result()
+            self._sanitize.physical_destruction = True
+            self._sanitize.result = False
+            logger.error(f"{self.path}: Erasure aborted, the drive must be"
+                         f" physically destroyed.")
+            return
+        process.result()
+
+    async def _run_process(self):
         logger.debug(f"{self.path}: Running sanitize process.")
 
-        if self._sanitize.method.verification_enabled:
+        if self._sanitize.plan.verification_enabled:
             # Pre validation steps before erasure.
-            await self._pre_validation()
+            with tracing.span("pre_validation"):
+                await self._pre_validation()
 
             logger.debug(self._sanitize.validation)
             # noinspection PySimplifyBooleanCheck
@@ -137,36 +336,19 @@ class ErasureProcess:
                 return
 
 
-        if self._sanitize.device_info.storage_medium == 'HDD':
-            logger.info(f"{self.path}: Detected as HDD.")
-
-        elif self._sanitize.device_info.storage_medium == 'SSD':
-            # Overwriting erasures damages the disk.
-
-            if self.path.name.startswith("nvme"):
-                # M.2 needs to use another command for PCIe interface.
-                # Todo: Keep the validation method before changing the method.
-                self._sanitize.method = CRYPTOGRAPHIC_NVME
-                logger.info(f"{self.path}: Detected as NVME.")
-            else:
-                # SSD can be erased via ATA interface.
-                # Todo: Keep the validation method before changing the method.
-                self._sanitize.method = CRYPTOGRAPHIC_ATA
-                logger.info(f"{self.path}: Detected as SSD.")
-
-        else:
-            # Todo: Research about more types.
-            raise Exception("Unknown method.")
+        logger.info(f"{self.path}: Detected as"
+                    f" {self._sanitize.device_info.storage_medium}.")
 
-        # Now run the method execution steps.
+        # Now run the planned steps.
         await self._run_erase_steps()
 
         # If validation was enabled, finish the validation.
-        if self._sanitize.method.verification_enabled:
-            await self._validation()
+        if self._sanitize.plan.verification_enabled:
+            with tracing.span("verification"):
+                await self._validation()
 
         # The result depends on the validation
-        if self._sanitize.method.verification_enabled:
+        if self._sanitize.plan.verification_enabled:
             self._sanitize.result = self._sanitize.validation.result
         elif self._sanitize.steps:
             # IF validation is disabled, check the erase command.
@@ -269,39 +451,63 @@ class ErasureProcess:
 
             if cmd.stdout == self._sanitize.validation.data[sector]:
                 self._sanitize.validation.result = False
+                self._metrics.verification_result = False
                 logger.warning(f"{self.path}: Erasure validation failed.")
                 return
 
         self._sanitize.validation.result = True
+        self._metrics.verification_result = True
         logger.debug(f"Validation passed.")
 
     async def _run_erase_steps(self):
-        """Runs the commands described on the overwriting_steps of the
-        current method. Automatically runs them in the same order.
+        """Runs the steps of the plan in the same order. When the tool
+        of a step fails, its fallback tools are tried in order.
         """
-        for execution in self._sanitize.method.overwriting_steps:
-            logger.debug(f"{self.path}: Running new step: {execution}")
-
-            if execution.tool == 'shred':
-                step = await steps.erase_hdd_shred(
-                    self.path.as_posix(), pattern=execution.pattern)
-                step.step_number = 1
-                self._sanitize.steps.append(step)
-
-            elif execution.tool == 'badblocks':
-                step = await steps.erase_hdd_badblocks(
-                    self.path.as_posix(), pattern=execution.pattern)
-                self._sanitize.steps.append(step)
-
-            elif execution.tool == 'nvme':
-                step = await steps.erase_nvme_nvmecli(self.path.as_posix())
-                self._sanitize.steps.append(step)
-
-            elif execution.tool == 'hdparm':
-                step = await steps.erase_ssd_hdparm(self.path.as_posix())
-                self._sanitize.steps.append(step)
-
-            else:
-                raise Exception(f"Unknown tool {execution.tool}.")
+        planned_steps = self._sanitize.plan.steps
+        for number, planned in enumerate(planned_steps, start=1):
+            logger.debug(f"{self.path}: Running new step: {planned}")
+            self._metrics.start_pass(number, len(planned_steps))
+
+            for tool in [planned.tool] + planned.fallback:
+                step = await self._run_step(number, tool, planned.pattern)
+                if step.success:
+                    break
+                self._metrics.errors += 1
+                logger.warning(f"{self.path}: Step {number} failed with"
+                               f" `{tool}`.")
+
+            if tool == 'luks' and step.success:
+                self._sanitize.luks_destroyed_at = step.end_time
 
         logger.debug(f"{self.path}: Erasure steps finished.")
+
+    async def _run_step(
+            self,
+            number: int,
+            tool: str,
+            pattern: Optional[str],
+    ) -> schemas.Step:
+        if tool not in steps.TOOLS:
+            raise Exception(f"Unknown tool {tool}.")
+
+        with tracing.span(f"pass {number}", tool=tool, pattern=pattern):
+            async with iostats.DiskStatsSampler(self.path) as sampler:
+                if self._write_cache:
+                    # The pass is durable once the cache is flushed.
+                    async with self._write_cache.checkpoints() as flushes:
+                        step = await steps.TOOLS[tool](
+                            self.path.as_posix(), pattern, self._device)
+                    step.commands += flushes
+                    await self._write_cache.barrier(step)
+                else:
+                    step = await steps.TOOLS[tool](
+                        self.path.as_posix(), pattern, self._device)
+            step.step_number = number
+            step.io_stats = sampler.summary()
+            self._sanitize.steps.append(step)
+
+        if step.heatmap and step.heatmap.degraded:
+            logger.warning(f"{self.path}: Degraded zones found on"
+                           f" step {number}.")
+            self._sanitize.degraded_zones = True
+        return step
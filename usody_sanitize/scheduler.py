@@ -0,0 +1,102 @@
+"""
+Scheduler
+=========
+
+Limits the number of erasures running at the same time on a station,
+the rest wait for a free slot. When the duration of the erasures is
+predicted the longest ones start first, so a long erasure does not
+start alone at the end of the batch.
+
+Jobs not ready to start, like the erasures of hot drives, are deferred
+and the next ones take their slot.
+"""
+import asyncio
+import heapq
+import logging
+from typing import Awaitable, Callable, List, Optional, Sequence
+
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """Runs jobs with at most `jobs` of them at the same time, 0 means
+    no limit and None the `max_jobs` setting.
+
+    Example:
+    >>> await Scheduler(jobs=4).run([erasure.run() for erasure in erasures])
+    """
+
+    def __init__(
+            self,
+            jobs: Optional[int] = None,
+            defer_interval: float = settings.thermal_defer_interval,
+    ):
+        self.jobs = (settings.max_jobs if jobs is None else jobs) or None
+        self.defer_interval = defer_interval
+
+    async def run(
+            self,
+            jobs: Sequence[Awaitable],
+            durations: Optional[Sequence[float]] = None,
+            ready: Optional[Callable[[int], Awaitable[bool]]] = None,
+    ) -> List:
+        """Runs the jobs and returns their results in the given order.
+
+        :param jobs: Awaitables to run.
+        :param durations: Predicted seconds of each job, to start the
+            longest ones first.
+        :param ready: Async function telling if the job with the given
+            index can start, it is deferred while it returns False.
+        """
+        semaphore = asyncio.Semaphore(self.jobs or len(jobs) or 1)
+
+        async def _limited(index):
+            while True:
+                async with semaphore:
+                    if ready is None or await ready(index):
+                        return await jobs[index]
+                logger.info(f"Job {index} deferred"
+                            f" {self.defer_interval} seconds.")
+                await asyncio.sleep(self.defer_interval)
+
+        # Tasks acquire the semaphore in creation order.
+        order = longest_first(durations) if durations and self.jobs \
+            else range(len(jobs))
+        tasks = {i: asyncio.ensure_future(_limited(i)) for i in order}
+        try:
+            return [await tasks[i] for i in range(len(jobs))]
+        except BaseException:
+            # Like on `SIGTERM`, every erasure must stop its commands
+            # and restore its device, not only the awaited one.
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            for job in jobs:
+                if asyncio.iscoroutine(job):
+                    # The jobs that never started.
+                    job.close()
+            raise
+
+
+def longest_first(durations: Sequence[float]) -> List[int]:
+    """Indexes of the jobs from the longest to the shortest one, with a
+    greedy scheduler it gives a makespan close to the optimal one.
+    """
+    return sorted(range(len(durations)), key=lambda i: -durations[i])
+
+
+def makespan(durations: Sequence[float], jobs: Optional[int] = None) -> float:
+    """Seconds to run all the jobs in the given order with the limit of
+    the scheduler, each one starts on the first free slot.
+    """
+    if not durations:
+        return 0
+    if not jobs:
+        return max(durations)
+
+    slots = [0.0] * min(jobs, len(durations))
+    for duration in durations:
+        heapq.heapreplace(slots, slots[0] + duration)
+    return max(slots)
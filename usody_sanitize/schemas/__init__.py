@@ -1,12 +1,32 @@
 from .definition import (
     Method,
     Execution,
+    PlannedStep,
+    Plan,
+)
+from .devices import (
+    Device,
+    Capabilities,
+    QueueCapabilities,
+    NvmeCapabilities,
+    AtaCapabilities,
+    ScsiCapabilities,
+    SedCapabilities,
+    LuksHeader,
 )
-from .devices import Device
 from .export_data import Block, Smart, ExportData
 from .sanitize import (
     SanitizeValidation,
     Sanitize,
     Step,
+    IOStats,
+    RegionHeatmap,
     Exec,
+    ResourceUsage,
+    Span,
+    HealthSample,
+    Thermal,
+    QueueTuning,
+    WriteCache,
+    NumaPlacement,
 )
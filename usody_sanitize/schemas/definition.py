@@ -1,12 +1,26 @@
 from typing import Optional, List
 
-from pydantic import BaseModel, Field, ConfigDict
+from pydantic import BaseModel, Field, ConfigDict, field_validator, \
+    model_validator
+
+from usody_sanitize import patterns
 
 
 class Execution(BaseModel):
     tool: str = Field(
-        default=..., description="None / shred / badblocks / hdparm / nvme")
-    pattern: str = Field(default=None, description="erasure pattern")
+        default=..., description="None / shred / badblocks / native / zoned"
+                                  " / hdparm"
+                                  " / nvme / scsi / sedutil / luks"
+                                  " / blksecdiscard / blkzeroout")
+    pattern: str = Field(
+        default=None, description="erasure pattern: zeros / random /"
+                                  " hex:<bytes> / random:seed=<n> /"
+                                  " complement")
+
+    @field_validator("pattern")
+    @classmethod
+    def _validate_pattern(cls, value: Optional[str]) -> Optional[str]:
+        return patterns.validate(value)
 
 
 class Method(BaseModel):
@@ -35,3 +49,39 @@ class Method(BaseModel):
         default=None, description="Summary of the check (no / Bad sectors)")
     overwriting_steps: List[Execution] = Field(
         default=[], description="a list of execution steps")
+
+    @model_validator(mode="after")
+    def _validate_complements(self) -> "Method":
+        # Each complement needs a fixed or seeded previous pass.
+        patterns.resolve([e.pattern for e in self.overwriting_steps])
+        return self
+
+
+class PlannedStep(BaseModel):
+    """A step of the execution plan, with the implementation chosen."""
+    tool: str = Field(default=..., description="tool chosen for the step")
+    pattern: Optional[str] = Field(default=None, description="erasure pattern")
+    fallback: List[str] = Field(
+        default=[], description="tools tried in order if the chosen one"
+                                " fails")
+    predicted_duration: float = Field(
+        default=0, description="estimated seconds of the chosen tool")
+    reason: Optional[str] = Field(
+        default=None, description="why this tool was chosen")
+
+
+class Plan(BaseModel):
+    """Execution plan of a method for a specific device."""
+    steps: List[PlannedStep] = Field(
+        default=[], description="steps to run in order")
+    verification_enabled: bool = Field(
+        default=False, description="verification required by the method")
+    predicted_duration: float = Field(
+        default=0, description="estimated seconds of all the steps, or of"
+                               " the past erasures of the same drive")
+    history_samples: int = Field(
+        default=0, description="past erasures of the same model and"
+                               " method used to predict the duration")
+    predicted_end: Optional[float] = Field(
+        default=None, description="time when the erasure is expected to"
+                                  " finish, set when it starts")
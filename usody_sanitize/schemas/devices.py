@@ -6,22 +6,163 @@ This module contains the schema of the disk data, `Device.export_data`
 contains the output of each command when extracting data. The other
 values are duplicated from this `export_data` variable.
 """
-from typing import Optional
+from typing import Optional, List
 
 from pydantic import BaseModel, Field
 
 from .export_data import ExportData
 
 
+class QueueCapabilities(BaseModel):
+    """Limits of the device queue from `/sys/block/<dev>/queue`."""
+    logical_block_size: int = Field(default=0)
+    discard_granularity: int = Field(default=0)
+    discard_max_bytes: int = Field(
+        default=0, description="0 if the device does not support discard")
+    discard_max_hw_bytes: int = Field(default=0)
+    write_zeroes_max_bytes: int = Field(
+        default=0, description="0 if zeroing is not offloaded to the"
+                               " device")
+    zoned: str = Field(
+        default="none", description="none / host-aware / host-managed")
+    nr_zones: int = Field(default=0)
+    chunk_sectors: int = Field(
+        default=0, description="sectors of each zone on zoned devices")
+
+    @property
+    def discard(self) -> bool:
+        return self.discard_max_bytes > 0
+
+    @property
+    def write_zeroes(self) -> bool:
+        return self.write_zeroes_max_bytes > 0
+
+    @property
+    def is_zoned(self) -> bool:
+        """Host-managed and host-aware devices must be written
+        sequentially on each zone."""
+        return self.zoned in ("host-managed", "host-aware")
+
+
+class NvmeCapabilities(BaseModel):
+    """Erasure features of a NVMe controller from `nvme id-ctrl`."""
+    controller: str = Field(default=..., description="E.G.: /dev/nvme0")
+    sanicap: int = Field(default=0, description="Sanitize capabilities")
+    fna: int = Field(default=0, description="Format NVM attributes")
+    oacs: int = Field(default=0,
+                      description="Optional admin command support")
+    crypto_erase: bool = Field(
+        default=False, description="Sanitize crypto erase supported")
+    block_erase: bool = Field(
+        default=False, description="Sanitize block erase supported")
+    overwrite: bool = Field(
+        default=False, description="Sanitize overwrite supported")
+    format: bool = Field(
+        default=False, description="Format NVM command supported")
+    format_crypto: bool = Field(
+        default=False, description="Format NVM supports crypto erase"
+                                   " (--ses=2)")
+
+
+class AtaCapabilities(BaseModel):
+    """Erasure features of an ATA device from `hdparm -I`."""
+    security: bool = Field(
+        default=False, description="Security feature set supported")
+    frozen: bool = Field(
+        default=False, description="Security commands are frozen")
+    enhanced_erase: bool = Field(
+        default=False, description="Enhanced security erase supported")
+    security_erase_time: Optional[int] = Field(
+        default=None, description="Seconds estimated by the device for"
+                                  " SECURITY ERASE UNIT")
+    enhanced_erase_time: Optional[int] = Field(
+        default=None, description="Seconds estimated by the device for"
+                                  " ENHANCED SECURITY ERASE UNIT")
+    security_erase_time_capped: bool = Field(
+        default=False, description="The device reports more than"
+                                   " `security_erase_time`, the real time"
+                                   " is unknown")
+    enhanced_erase_time_capped: bool = Field(
+        default=False, description="The device reports more than"
+                                   " `enhanced_erase_time`, the real time"
+                                   " is unknown")
+    sanitize: bool = Field(
+        default=False, description="Sanitize feature set supported")
+    crypto_scramble: bool = Field(
+        default=False, description="Sanitize CRYPTO SCRAMBLE supported")
+    block_erase: bool = Field(
+        default=False, description="Sanitize BLOCK ERASE supported")
+    overwrite: bool = Field(
+        default=False, description="Sanitize OVERWRITE supported")
+    trusted_computing: bool = Field(
+        default=False, description="Trusted computing feature set"
+                                   " supported")
+
+
+class ScsiCapabilities(BaseModel):
+    """Erasure features of a SCSI device from `sg_opcodes`."""
+    reported: bool = Field(
+        default=True, description="The device reports its operation codes,"
+                                  " otherwise all of them are assumed")
+    crypto_erase: bool = Field(
+        default=False, description="SANITIZE crypto erase supported")
+    block_erase: bool = Field(
+        default=False, description="SANITIZE block erase supported")
+    overwrite: bool = Field(
+        default=False, description="SANITIZE overwrite supported")
+    format_unit: bool = Field(
+        default=False, description="FORMAT UNIT supported")
+    security_protocol: bool = Field(
+        default=False, description="SECURITY PROTOCOL IN supported")
+
+
+class SedCapabilities(BaseModel):
+    """TCG feature sets of a self encrypting drive from the Level 0
+    discovery of `sedutil-cli`.
+    """
+    feature_sets: List[str] = Field(
+        default_factory=list, description="E.G.: Opal 2.0, Enterprise")
+    crypto_erase: bool = Field(
+        default=False, description="Reverting it destroys the media key")
+    psid: bool = Field(
+        default=False, description="The PSID of the drive is known")
+
+
+class LuksHeader(BaseModel):
+    """LUKS volume found on the device."""
+    version: Optional[int] = Field(
+        default=None, description="LUKS version, unknown if the header"
+                                  " could not be read")
+    header_size: int = Field(
+        default=..., description="Bytes of the header and keyslots areas,"
+                                 " before the encrypted data")
+
+
+class Capabilities(BaseModel):
+    """Erasure features supported by the device."""
+    queue: Optional[QueueCapabilities] = Field(default=None)
+    nvme: Optional[NvmeCapabilities] = Field(default=None)
+    ata: Optional[AtaCapabilities] = Field(default=None)
+    scsi: Optional[ScsiCapabilities] = Field(default=None)
+    sed: Optional[SedCapabilities] = Field(default=None)
+    luks: Optional[LuksHeader] = Field(default=None)
+
+
 class Device(BaseModel):
     """Information of the device."""
     manufacturer: Optional[str] = Field(default=None)
     model: Optional[str] = Field(default=None)
     serial_number: Optional[str] = Field(default=None)
+    wwn: Optional[str] = Field(default=None,
+                               description="World Wide Name of the disk")
     connector: Optional[str] = Field(default=None,
                                      description="IDE/SATA/SCSI/SAS/M.2/U.2")
     size: Optional[str] = Field(default=None, description="Disk size in bites")
     storage_medium: Optional[str] = Field(default=None,
                                           description="HDD/SSD/SSDHD")
+    capabilities: Capabilities = Field(default_factory=Capabilities)
+    paths: List[str] = Field(
+        default=[], description="other paths to the same drive, like the"
+                                " second port of a SAS drive")
 
     export_data: Optional[ExportData] = Field(default=None)
@@ -24,6 +24,7 @@ class Block(BaseModel):
 
     ptuuid: Optional[str] = Field(default=None)
     serial: Optional[str] = Field(default=None)
+    wwn: Optional[str] = Field(default=None)
 
     name: Optional[str] = Field(default=None)
     size: Optional[str] = Field(default=None)
@@ -39,6 +40,13 @@ class Block(BaseModel):
     phy_sec: Optional[int] = Field(default=None, alias='phy-sec')
 
     subsystems: Optional[str] = Field(default=None)
+    fstype: Optional[str] = Field(default=None,
+                                  description="E.G.: ext4, crypto_LUKS")
+    zoned: Optional[str] = Field(default=None,
+                                 description="none / host-aware /"
+                                             " host-managed")
+    tran: Optional[str] = Field(default=None,
+                                description="Transport: sata, sas, usb...")
     mountpoint: Optional[str] = Field(default=None)
 
     children: Optional[List["Block"]] = Field(default=None)
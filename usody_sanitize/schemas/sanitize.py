@@ -1,13 +1,32 @@
 import time
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 from pydantic import BaseModel, Field
 
 from usody_sanitize import __version__ as app_version
-from usody_sanitize.schemas.definition import Method
+from usody_sanitize.schemas.definition import Method, Plan
 from usody_sanitize.schemas.devices import Device
 
 
+class ResourceUsage(BaseModel):
+    """Resources used by an executed command and its child processes,
+    sampled from `/proc` while the command was running. The values are
+    lower bounds, the usage after the last sample is not counted.
+    """
+    cpu_user_time: float = Field(
+        default=0, description="CPU time in user mode (seconds)")
+    cpu_system_time: float = Field(
+        default=0, description="CPU time in kernel mode (seconds)")
+    max_rss: int = Field(
+        default=0, description="Maximum resident set size (bytes)")
+    read_bytes: int = Field(
+        default=0, description="Bytes read from the storage layer")
+    write_bytes: int = Field(
+        default=0, description="Bytes written to the storage layer")
+    samples: int = Field(
+        default=0, description="Number of samples taken")
+
+
 class Exec(BaseModel):
     """Define the data collected while executing each command, this is
     used to prove the execution of all commands and steps to properly
@@ -34,6 +53,144 @@ class Exec(BaseModel):
     end_time: Optional[float] = Field(
         default=None, description="Exact time when the command ended")
 
+    resource_usage: Optional[ResourceUsage] = Field(
+        default=None, description="Resources used by the command")
+
+
+class Span(BaseModel):
+    """Timing of a phase of the sanitize process."""
+    name: str = Field(default=..., description="phase name")
+    category: str = Field(
+        default="phase", description="phase / command")
+    start_time: float = Field(
+        default_factory=time.time, description="start time of the span")
+    end_time: Optional[float] = Field(
+        default=None, description="end time of the span")
+    duration: Optional[float] = Field(
+        default=None, description="span duration time")
+    cpu_time: Optional[float] = Field(
+        default=None, description="CPU time used by the whole process"
+                                  " while the span was open")
+    memory_allocated: Optional[int] = Field(
+        default=None, description="Bytes allocated while the span was"
+                                  " open, only when profiling")
+    attributes: dict = Field(
+        default={}, description="extra information of the span")
+
+    def end(self):
+        self.end_time = time.time()
+        self.duration = self.end_time - self.start_time
+
+
+class IOStats(BaseModel):
+    """Block layer statistics of the device sampled during a step."""
+    interval: float = Field(
+        default=..., description="seconds between samples")
+    duration: float = Field(default=..., description="sampled seconds")
+    read_bytes: int = Field(default=0)
+    write_bytes: int = Field(default=0)
+    read_ios: int = Field(default=0)
+    write_ios: int = Field(default=0)
+    throughput: float = Field(
+        default=0, description="average bytes per second")
+    iops: float = Field(
+        default=0, description="average requests per second")
+    avg_latency: float = Field(
+        default=0, description="average milliseconds per request")
+    peak_latency: float = Field(
+        default=0, description="highest average latency of an interval")
+    avg_queue_depth: float = Field(
+        default=0, description="average requests in the queue")
+    peak_queue_depth: int = Field(
+        default=0, description="highest requests in flight sampled")
+    series_columns: List[str] = Field(
+        default=["time", "throughput", "iops", "latency", "queue_depth"],
+        description="columns of each point of the series")
+    series: List[List[float]] = Field(
+        default=[], description="time series of the sampled intervals")
+
+
+class RegionHeatmap(BaseModel):
+    """Write performance per LBA region of the device."""
+    buckets: int = Field(default=..., description="number of regions")
+    bucket_size: int = Field(default=..., description="bytes per region")
+    throughput: List[Optional[float]] = Field(
+        default=[], description="bytes per second written on each region")
+    max_latency: List[Optional[float]] = Field(
+        default=[], description="slowest write of each region in"
+                                " milliseconds, when the tool reports it")
+    degraded: bool = Field(
+        default=False, description="some regions are much slower than"
+                                   " expected for their position")
+    degraded_regions: List[int] = Field(
+        default=[], description="index of the degraded regions")
+
+
+class HealthSample(BaseModel):
+    """SMART counters of the device polled during the erasure, None
+    when the device does not report them.
+    """
+    time: float = Field(
+        default_factory=time.time, description="time of the poll")
+    reallocated: Optional[int] = Field(
+        default=None, description="reallocated sectors or grown defects")
+    pending: Optional[int] = Field(
+        default=None, description="sectors pending to be reallocated")
+    crc_errors: Optional[int] = Field(
+        default=None, description="interface CRC errors")
+    media_errors: Optional[int] = Field(
+        default=None, description="NVMe media and data integrity errors")
+    passed: Optional[bool] = Field(
+        default=None, description="SMART overall health self-assessment")
+
+
+class Thermal(BaseModel):
+    """Temperature of the device during the erasure."""
+    max_temperature: float = Field(
+        default=..., description="highest Celsius degrees polled")
+    pauses: int = Field(
+        default=0, description="times the writes were paused to cool down")
+    paused_seconds: float = Field(
+        default=0, description="seconds the writes were paused")
+    series_columns: List[str] = Field(
+        default=["time", "temperature"],
+        description="columns of each point of the series")
+    series: List[List[float]] = Field(
+        default=[], description="time series of the polled temperatures")
+
+
+class QueueTuning(BaseModel):
+    """Block queue values set while the device was erased."""
+    applied: Dict[str, str] = Field(
+        default={}, description="values set on /sys/block/<dev>/queue")
+    original: Dict[str, str] = Field(
+        default={}, description="values before the erasure")
+    restored: bool = Field(
+        default=False, description="the original values were restored")
+
+
+class NumaPlacement(BaseModel):
+    """NUMA node where the erasure of the device ran."""
+    node: int = Field(
+        default=..., description="node of the controller of the device")
+    cpus: List[int] = Field(
+        default=[], description="CPUs the erasure was pinned to")
+    source: str = Field(
+        default="sysfs", description="sysfs / config")
+
+
+class WriteCache(BaseModel):
+    """Volatile write cache of the device during the erasure."""
+    original: Optional[bool] = Field(
+        default=None, description="setting before the erasure, None if the"
+                                  " device did not report it")
+    enabled: bool = Field(
+        default=False, description="the cache was enabled for the erasure")
+    restored: bool = Field(
+        default=False, description="the original setting was restored")
+    commands: List[Exec] = Field(
+        default=[], description="commands reading and setting the cache")
+
 
 class Step(BaseModel):
     """Main and base class to define a collection of steps to proceed.
@@ -47,6 +204,13 @@ class Step(BaseModel):
         default=None, description="step duration time")
     commands: List[Exec] = Field(
         default=[], description="a list of commands executed for current step")
+    io_stats: Optional[IOStats] = Field(
+        default=None, description="device I/O statistics during the step")
+    heatmap: Optional[RegionHeatmap] = Field(
+        default=None, description="write performance per disk region")
+    durable: Optional[bool] = Field(
+        default=None, description="the write cache was flushed at the end"
+                                  " of the step, None without barriers")
     success: bool = Field(
         default=False, description="Tells if the step has"
                                    " been executed correctly")
@@ -88,6 +252,52 @@ class Sanitize(BaseModel):
     method: Optional[Method] = Field(
         default=None, description="erasure method")
 
+    plan: Optional[Plan] = Field(
+        default=None, description="steps chosen for the method and the"
+                                  " device, with the predicted duration")
+
+    luks_destroyed_at: Optional[float] = Field(
+        default=None, description="time when the LUKS header and keyslots"
+                                  " were destroyed, the data is"
+                                  " unrecoverable since then")
+
+    degraded_zones: bool = Field(
+        default=False, description="true if any step found disk regions"
+                                   " much slower than expected, the drive"
+                                   " works but may be degraded")
+
+    health: List[HealthSample] = Field(
+        default=[], description="SMART counters polled during the erasure,"
+                                " the first ones are from the probe")
+
+    queue_tuning: Optional[QueueTuning] = Field(
+        default=None, description="block queue tuning applied during the"
+                                  " erasure")
+
+    numa: Optional[NumaPlacement] = Field(
+        default=None, description="NUMA placement of the erasure, None on"
+                                  " single node machines")
+
+    write_cache: Optional[WriteCache] = Field(
+        default=None, description="volatile write cache enabled during the"
+                                  " erasure")
+
+    thermal: Optional[Thermal] = Field(
+        default=None, description="temperature of the device during the"
+                                  " erasure")
+
+    aborted: Optional[str] = Field(
+        default=None, description="why the erasure was aborted before it"
+                                  " finished")
+
+    physical_destruction: bool = Field(
+        default=False, description="true if the drive is failing and must"
+                                   " be physically destroyed, its erasure"
+                                   " can not be certified")
+
+    spans: List[Span] = Field(
+        default=[], description="timing of each phase of the process")
+
     result: bool = Field(
         default=False, description="true means erasure has been pass"
                                    " correctly, False means something"
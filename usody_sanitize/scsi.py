@@ -0,0 +1,179 @@
+"""
+SCSI
+====
+
+Firmware erasures of SCSI/SAS devices with `sg3_utils`. `hdparm` does not
+work through SAS HBAs, so these devices are erased with the SCSI
+commands instead:
+
+- `SANITIZE` (`sg_sanitize`): crypto erase, block erase or overwrite.
+- `FORMAT UNIT` (`sg_format`): initializes the whole medium.
+
+Both are started with the immediate bit (`--early`) and their progress
+is polled from the sense data with `sg_requests --progress`. The
+operation codes supported by the device are read with `sg_opcodes`.
+"""
+import asyncio
+import logging
+import re
+from typing import List, Optional
+
+from usody_sanitize import schemas, commands, metrics
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+SANITIZE_CRYPTO = "sanitize-crypto"
+SANITIZE_BLOCK = "sanitize-block"
+SANITIZE_OVERWRITE = "sanitize-overwrite"
+FORMAT_UNIT = "format-unit"
+
+# Commands of each action, `--quick` skips the 15 seconds countdown.
+ACTIONS = {
+    SANITIZE_CRYPTO: "sg_sanitize --quick --early --crypto",
+    SANITIZE_BLOCK: "sg_sanitize --quick --early --block",
+    SANITIZE_OVERWRITE: "sg_sanitize --quick --early --overwrite --zero",
+    FORMAT_UNIT: "sg_format --format --quick --early",
+}
+# Fastest first: a crypto erase takes seconds, the others depend on the
+# size of the device.
+RANK = [
+    SANITIZE_CRYPTO,
+    SANITIZE_BLOCK,
+    FORMAT_UNIT,
+    SANITIZE_OVERWRITE,
+]
+# Transports of `lsblk` that only talk SCSI.
+TRANSPORTS = ('sas', 'fc', 'iscsi', 'spi', 'srp')
+
+# SANITIZE operation code (0x48) service actions.
+SERVICE_ACTIONS = {
+    1: SANITIZE_OVERWRITE,
+    2: SANITIZE_BLOCK,
+    3: SANITIZE_CRYPTO,
+}
+
+
+def is_scsi(
+        block: Optional[schemas.Block],
+        smart: Optional[schemas.Smart],
+) -> bool:
+    """True if `smartctl` talks SCSI to the device or, when it does not
+    know it, if `lsblk` transport is a SCSI one. SATA disks behind a SAS
+    HBA have a `sas` transport but `smartctl` talks ATA to them.
+    """
+    protocol = smart.device.protocol if smart and smart.device else None
+    if protocol:
+        return protocol.upper() == "SCSI"
+    return bool(block and (block.tran or "").lower() in TRANSPORTS)
+
+
+def parse_opcodes(output: str) -> Optional[schemas.ScsiCapabilities]:
+    """Parses the supported operation codes of `sg_opcodes`, None if
+    the device does not report them.
+    """
+    if not output or "Opcode" not in output:
+        return None
+
+    actions = set()
+    security_protocol = False
+    for line in output.splitlines():
+        sanitize = re.match(r"\s*48\s+([0-9a-fA-F]+)\s", line)
+        if sanitize and int(sanitize.group(1), 16) in SERVICE_ACTIONS:
+            actions.add(SERVICE_ACTIONS[int(sanitize.group(1), 16)])
+        elif re.match(r"\s*04\s", line):
+            actions.add(FORMAT_UNIT)
+        elif re.match(r"\s*a2\s", line, re.IGNORECASE):
+            security_protocol = True
+
+    return schemas.ScsiCapabilities(
+        crypto_erase=SANITIZE_CRYPTO in actions,
+        block_erase=SANITIZE_BLOCK in actions,
+        overwrite=SANITIZE_OVERWRITE in actions,
+        format_unit=FORMAT_UNIT in actions,
+        security_protocol=security_protocol,
+    )
+
+
+def get_capabilities(dev_path: str) -> schemas.ScsiCapabilities:
+    """Reads the supported operation codes, when the device does not
+    report them all the actions are assumed and the unsupported ones
+    fail at once with an illegal request.
+    """
+    capabilities = parse_opcodes(commands.get_sg_opcodes(dev_path))
+    if capabilities is None:
+        return schemas.ScsiCapabilities(
+            reported=False,
+            crypto_erase=True,
+            block_erase=True,
+            overwrite=True,
+            format_unit=True,
+            security_protocol=True,
+        )
+    return capabilities
+
+
+def plan_actions(capabilities: schemas.ScsiCapabilities) -> List[str]:
+    """Supported erasure actions, the fastest first."""
+    supported = {
+        SANITIZE_CRYPTO: capabilities.crypto_erase,
+        SANITIZE_BLOCK: capabilities.block_erase,
+        SANITIZE_OVERWRITE: capabilities.overwrite,
+        FORMAT_UNIT: capabilities.format_unit,
+    }
+    return [action for action in RANK if supported[action]]
+
+
+def parse_progress(output: str) -> Optional[float]:
+    """Percentage done of `sg_requests --progress`, None if there is no
+    operation in progress.
+    """
+    progress = re.search(r"([0-9.]+)\s*%", output or "")
+    return float(progress.group(1)) if progress else None
+
+
+async def erase(
+        dev_path: str,
+        action: str,
+        step_commands: List[schemas.Exec],
+        poll_interval: float = settings.scsi_poll_interval,
+        timeout: float = settings.scsi_timeout,
+) -> bool:
+    """Starts an erasure action and waits polling its progress."""
+    device_metrics = metrics.registry.device(dev_path)
+    cmd = await commands.erasure_command(f"{ACTIONS[action]} {dev_path}")
+    cmd.description = f"Start the {action} on the device."
+    step_commands.append(cmd)
+    if not cmd.success:
+        return False
+
+    # Only the first and the last poll are kept on the report.
+    first_poll = last_poll = None
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        await asyncio.sleep(poll_interval)
+        last_poll = await commands.erasure_command(
+            f"sg_requests --progress {dev_path}")
+        first_poll = first_poll or last_poll
+        progress = parse_progress(last_poll.stdout)
+
+        if progress is not None:
+            device_metrics.update_progress(int(progress * 100), 10000)
+            if loop.time() > deadline:
+                last_poll.success = False
+                last_poll.description = f"{action} timed out."
+                break
+            continue
+
+        # The sense data reports the failure of the last operation.
+        output = f"{last_poll.stdout}\n{last_poll.stderr}".lower()
+        last_poll.success = last_poll.success and "failed" not in output
+        last_poll.description = f"{action} finished."
+        break
+
+    if first_poll is not last_poll:
+        first_poll.description = "Erasure progress."
+        step_commands.append(first_poll)
+    step_commands.append(last_poll)
+    return last_poll.success
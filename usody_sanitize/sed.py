@@ -0,0 +1,138 @@
+"""
+Self Encrypting Drives
+======================
+
+TCG Opal / Enterprise drives encrypt all the data with a media key, the
+data is unrecoverable in seconds once that key is destroyed. The
+identify data of the device tells if it supports the security protocols
+(ATA trusted computing, NVMe security send/receive, SCSI SECURITY
+PROTOCOL IN), and then the Level 0 discovery of `sedutil-cli` tells
+which TCG feature sets it has.
+
+The key is destroyed with a revert of the TPer:
+
+- PSID revert, with the PSID printed on the label of the drive. It works
+  even when the drive is owned by someone else. The PSIDs are given per
+  serial number with the `sed_psids` setting or `--psid`.
+- Otherwise, a drive not owned yet is taken with a temporal password,
+  its locking is activated and then reverted. If the revert fails the
+  drive stays locked with that password, it is only written to the log.
+
+The PSID and the password are replaced by `<psid>` and `<password>` in
+the commands of the report and the trace.
+"""
+import logging
+import re
+import secrets
+from typing import List, Optional
+
+from usody_sanitize import schemas, commands, nvme
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+PSID_REVERT = "psid-revert"
+REVERT_TPER = "revert-tper"
+
+# Level 0 discovery flags printed by `sedutil-cli`.
+FEATURE_SETS = {
+    '1': "Opal 1.0",
+    '2': "Opal 2.0",
+    'E': "Enterprise",
+    'L': "Opalite",
+    'p': "Pyrite",
+    'r': "Ruby",
+}
+# Pyrite drives do not encrypt the data, reverting them does not erase it.
+ENCRYPTING = ('1', '2', 'E', 'L', 'r')
+
+
+def parse_discovery(output: str) -> Optional[schemas.SedCapabilities]:
+    """Parses `sedutil-cli --isValidSED`, like
+    `/dev/nvme0 SED -2- Samsung SSD 960 EVO 250GB 2B7QCXE7 S3ESNX0J`.
+    None if it is not a SED.
+    """
+    discovery = re.search(r"\sSED\s+([-12ELpr]+)", output or "")
+    if not discovery:
+        return None
+
+    flags = discovery.group(1).replace("-", "")
+    return schemas.SedCapabilities(
+        feature_sets=[FEATURE_SETS[f] for f in flags],
+        crypto_erase=any(f in ENCRYPTING for f in flags),
+    )
+
+
+def security_supported(capabilities: schemas.Capabilities) -> bool:
+    """The identify data says the device supports the TCG security
+    protocols, only then the Level 0 discovery is done.
+    """
+    return bool(
+        capabilities.nvme and capabilities.nvme.oacs & 0x1
+        or capabilities.ata and capabilities.ata.trusted_computing
+        or capabilities.scsi and capabilities.scsi.security_protocol
+    )
+
+
+def get_capabilities(
+        dev_path: str,
+        serial_number: Optional[str] = None,
+) -> Optional[schemas.SedCapabilities]:
+    """Runs the Level 0 discovery of the device, `sedutil-cli` talks to
+    the NVMe controllers.
+    """
+    capabilities = parse_discovery(
+        commands.get_sed_discovery(nvme.controller_path(dev_path)))
+    if capabilities:
+        capabilities.psid = bool(serial_number) \
+            and serial_number in settings.sed_psids
+    return capabilities
+
+
+def plan_actions(capabilities: Optional[schemas.SedCapabilities]) -> List[str]:
+    if not capabilities or not capabilities.crypto_erase:
+        return []
+    if capabilities.psid:
+        return [PSID_REVERT, REVERT_TPER]
+    return [REVERT_TPER]
+
+
+async def psid_revert(
+        dev_path: str,
+        psid: str,
+        step_commands: List[schemas.Exec],
+) -> bool:
+    cmd = await commands.erasure_command(
+        f"sedutil-cli --yesIreallywanttoERASEALLmydatausingthePSID"
+        f" {psid} {dev_path}", redact={psid: "<psid>"})
+    cmd.description = "Revert the drive to factory state with the PSID," \
+                      " destroying the media key."
+    step_commands.append(cmd)
+    return cmd.success
+
+
+async def revert_tper(
+        dev_path: str,
+        step_commands: List[schemas.Exec],
+) -> bool:
+    """Takes the ownership of a drive not owned yet and reverts it."""
+    password = secrets.token_hex(16)
+    cmd1 = await commands.erasure_command(
+        f"sedutil-cli --initialSetup {password} {dev_path}",
+        redact={password: "<password>"})
+    cmd1.description = "Take the ownership and activate the locking with" \
+                       " a temporal password."
+    step_commands.append(cmd1)
+    if not cmd1.success:
+        return False
+
+    cmd2 = await commands.erasure_command(
+        f"sedutil-cli --revertTPer {password} {dev_path}",
+        redact={password: "<password>"})
+    cmd2.description = "Revert the drive to factory state, destroying the" \
+                       " media key."
+    step_commands.append(cmd2)
+    if not cmd2.success:
+        logger.error(f"{dev_path}: Revert failed, the drive is locked with"
+                     f" the password `{password}`.")
+    return cmd2.success
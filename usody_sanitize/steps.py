@@ -6,128 +6,254 @@ Here you will
 
 """
 
+import functools
 import logging
-from typing import Optional
-
-from usody_sanitize import schemas, commands, utils
+import time
+from typing import List, Optional
+
+from usody_sanitize import (
+    schemas,
+    commands,
+    utils,
+    heatmap,
+    blkdev,
+    nvme,
+    ata,
+    scsi,
+    sed,
+    luks,
+    multipath,
+    zoned,
+)
+from usody_sanitize.config import settings
+from usody_sanitize.engine import OverwriteEngine
 
 logger = logging.getLogger(__name__)
 
 
 async def erase_ssd_hdparm(
         dev_path: str,
+        capabilities: Optional[schemas.AtaCapabilities] = None,
         step: Optional[int] = None,
 ) -> schemas.Step:
     """
-    Generates erasure step for deleting SSD using hdparm via ATA.
+    Generates erasure step for deleting SSD using hdparm via ATA. The
+    fastest erasure supported by the device is used: sanitize crypto
+    scramble, enhanced security erase, sanitize block erase, security
+    erase or sanitize overwrite. When an action fails the next one is
+    tried, unless a SECURITY ERASE UNIT was already sent to the drive.
 
     :param str dev_path: Path to the device.
+    :param capabilities: Features of the device from `hdparm -I`.
     :param Optional[str] step: Path to the device.
     :return: schemas.Step
 
     Example:
-    >>> erase_ssd_hdparm("/dev/sda")
+    >>> erase_ssd_hdparm("/dev/sda", ata.get_capabilities("/dev/sda"))
     """
     step = schemas.Step(device=dev_path, step=step)
 
-    # Start first command for this step.
-    logger.debug(f"{dev_path}: Start command 1.")
-    command1 = f"hdparm -I {dev_path}"
-    cmd1: schemas.Exec = await commands \
-        .erasure_command(command1)
-    cmd1.description = "Verify that the SSD disc is not frozen."
+    actions = ata.plan_actions(capabilities)
+    logger.info(f"{dev_path}: ATA erasure actions by estimated time:"
+                f" {actions}.")
+
+    for action in actions:
+        timeout = ata.timeout(capabilities, action)
+        logger.debug(f"{dev_path}: Running {action}, timeout {timeout}s.")
+        if action in ata.SANITIZE_OPTIONS:
+            success = await ata.sanitize(
+                dev_path, action, step.commands, timeout_seconds=timeout)
+        else:
+            success = await ata.security_erase(
+                dev_path, step.commands,
+                enhanced=action == ata.SECURITY_ERASE_ENHANCED,
+                timeout_seconds=timeout)
+        if success:
+            step.success = True
+            break
+        logger.warning(f"{dev_path}: {action} failed.")
+        if ata.erase_issued(step.commands):
+            # The drive may still be running it, busy and locked.
+            logger.error(f"{dev_path}: SECURITY ERASE UNIT was issued, no"
+                         f" other action is tried.")
+            break
 
-    if utils.find_text("(not[\t ]*frozen)", cmd1.stdout):
-        cmd1.success = True
-    else:
-        cmd1.success = False
+    # Write final values on the step schema.
+    step.end()
 
-    step.commands.append(cmd1)
-    logger.debug(f"{dev_path}: Command 1 finished. \n{cmd1}")
-    if cmd1.success is False:
-        return step
+    logger.debug(f"{dev_path}: hdparm erasure step finished.")
+    return step
 
-    # Second command for this step.
-    logger.debug(f"{dev_path}: Start command 2.")
-    command2 = f"hdparm --user-master u --security-set-pass Usody {dev_path}"
-    cmd2 = await commands.erasure_command(command2)
-    cmd2.description = "Set a temporal password to lock the device."
 
-    cmd2.success = cmd2.return_code == 0
+async def erase_nvme(
+        dev_path: str,
+        capabilities: Optional[schemas.NvmeCapabilities] = None,
+        step: Optional[int] = None,
+) -> schemas.Step:
+    """Erases the NVMe device with the fastest firmware erasure supported
+    by its controller: sanitize crypto erase, format with crypto erase,
+    sanitize block erase, format with user data erase or sanitize
+    overwrite. When an action fails the next one is tried.
 
-    step.commands.append(cmd2)
-    logger.debug(f"{dev_path}: Command 2 finished. \n{cmd2}")
-    if cmd2.success is False:
-        return step
+    :param str dev_path: Path to the device.
+    :param capabilities: Features of the controller from `nvme id-ctrl`.
+    :param int step: Set the step number.
+    :return: schemas.Step
 
-    # Third command.
-    logger.debug(f"{dev_path}: Start command 3.")
-    command3 = f"hdparm --user-master --security-erase Usody {dev_path}"
-    cmd3 = await commands.erasure_command(command3)
-    cmd3.description = "Erase the SSD changing the encryption key."
-    cmd3.success = cmd3.return_code == 0 or cmd3.return_code == 22
+    Example:
+    >>> erase_nvme("/dev/nvme0n1", nvme.get_capabilities("/dev/nvme0n1"))
+    """
+    step = schemas.Step(device=dev_path, step=step)
 
-    step.commands.append(cmd3)
-    logger.debug(f"{dev_path}: command 3 finished. \n{cmd3}")
-    if cmd3.success is False:
-        return step
+    log = {}
+    if capabilities and capabilities.sanicap:
+        # The sanitize log has the time estimates of each action.
+        log = await nvme.read_sanitize_log(capabilities.controller)
+    actions = nvme.plan_actions(capabilities, log)
+    logger.info(f"{dev_path}: NVMe erasure actions by estimated time:"
+                f" {actions}.")
+
+    for action in actions:
+        logger.debug(f"{dev_path}: Running {action}.")
+        if action in nvme.SANACT:
+            success = await nvme.sanitize(dev_path, action, step.commands)
+        else:
+            success = await nvme.format_nvm(dev_path, action, step.commands)
+        if success:
+            step.success = True
+            break
+        logger.warning(f"{dev_path}: {action} failed.")
+        if ata.erase_issued(step.commands):
+            # The drive may still be running it, busy and locked.
+            logger.error(f"{dev_path}: SECURITY ERASE UNIT was issued, no"
+                         f" other action is tried.")
+            break
 
-    # Fourth command.
-    logger.debug(f"{dev_path}: Start command 4.")
-    command4 = f"hdparm -I {dev_path}"
-    cmd4 = await commands.erasure_command(command4)
-    cmd4.description = "Check the drive security is set to disabled"
+    step.end()
+    logger.debug(f"{dev_path}: nvme erasure step finished.")
+    return step
 
-    # Todo: Enable this pre-validation.
-    # if utils.find_text(" *(not *enabled) *", cmd4.output):
-    #     cmd4.success = True
-    # else:
-    #     cmd4.success = False
 
-    step.commands.append(cmd4)
-    logger.debug(f"{dev_path}: Command 4 finished. {cmd4}")
+async def erase_scsi(
+        dev_path: str,
+        capabilities: Optional[schemas.ScsiCapabilities] = None,
+        step: Optional[int] = None,
+) -> schemas.Step:
+    """Erases the SCSI/SAS device with the fastest erasure supported:
+    SANITIZE crypto erase, block erase, FORMAT UNIT or SANITIZE
+    overwrite. When an action fails the next one is tried.
 
-    # Write final values on the step schema.
-    step.end()
-    step.success = all(cmd.success for cmd in step.commands)
+    :param str dev_path: Path to the device.
+    :param capabilities: Operation codes supported from `sg_opcodes`.
+    :param int step: Set the step number.
+    :return: schemas.Step
 
-    logger.debug(f"{dev_path}: hdparm erasure step finished.")
+    Example:
+    >>> erase_scsi("/dev/sdb", scsi.get_capabilities("/dev/sdb"))
+    """
+    step = schemas.Step(device=dev_path, step=step)
+
+    actions = scsi.plan_actions(
+        capabilities or scsi.get_capabilities(dev_path))
+    logger.info(f"{dev_path}: SCSI erasure actions: {actions}.")
+
+    for action in actions:
+        logger.debug(f"{dev_path}: Running {action}.")
+        if await scsi.erase(dev_path, action, step.commands):
+            step.success = True
+            break
+        logger.warning(f"{dev_path}: {action} failed.")
+
+    step.end()
+    logger.debug(f"{dev_path}: SCSI erasure step finished.")
     return step
 
 
-async def erase_nvme_nvmecli(
+async def erase_sed(
         dev_path: str,
+        capabilities: Optional[schemas.SedCapabilities] = None,
+        serial_number: Optional[str] = None,
         step: Optional[int] = None,
 ) -> schemas.Step:
-    """Creates the erasure step schema with the delete nvme step. This
-    steps executes 1 command `nvme` from `nvme-cli` package.
+    """Destroys the media key of a self encrypting drive reverting it,
+    with the PSID when it is known or taking the ownership otherwise.
 
     :param str dev_path: Path to the device.
+    :param capabilities: TCG feature sets from the Level 0 discovery.
+    :param str serial_number: Serial number to find the PSID.
     :param int step: Set the step number.
     :return: schemas.Step
 
     Example:
-    >>> erase_ssd_hdparm("/dev/sda")
+    >>> erase_sed("/dev/sda", sed.get_capabilities("/dev/sda"), "S3ESNX0J")
     """
     step = schemas.Step(device=dev_path, step=step)
+    sed_path = nvme.controller_path(dev_path)
+
+    for action in sed.plan_actions(capabilities):
+        logger.debug(f"{dev_path}: Running {action}.")
+        if action == sed.PSID_REVERT:
+            success = await sed.psid_revert(
+                sed_path, settings.sed_psids[serial_number], step.commands)
+        else:
+            success = await sed.revert_tper(sed_path, step.commands)
+        if success:
+            step.success = True
+            break
+        logger.warning(f"{dev_path}: {action} failed.")
+        if ata.erase_issued(step.commands):
+            # The drive may still be running it, busy and locked.
+            logger.error(f"{dev_path}: SECURITY ERASE UNIT was issued, no"
+                         f" other action is tried.")
+            break
 
-    # Start first command for this step.
-    logger.debug(f"{dev_path}: Erasing disk.")
-    command1 = f"nvme format --force --ses=1 {dev_path}"
-    cmd1: schemas.Exec = await commands.erasure_command(command1)
-    cmd1.description = "Erase all contents from the disks with secure" \
-                       "erasure enabled (--ses=1)."
     step.end()
+    logger.debug(f"{dev_path}: SED erasure step finished.")
+    return step
 
-    logger.debug(f"{dev_path}: Command 1 finished. \n{cmd1}")
-    if cmd1.success is False:
-        return step
 
-    # Write final values on the step schema.
-    step.success = all(cmd.success for cmd in step.commands)
+async def erase_luks(
+        dev_path: str,
+        header: Optional[schemas.LuksHeader] = None,
+        step: Optional[int] = None,
+) -> schemas.Step:
+    """Destroys the LUKS keyslots and overwrites the header area with
+    random data, then verifies that no LUKS header is left.
+
+    :param str dev_path: Path to the device.
+    :param header: LUKS header found on the device.
+    :param int step: Set the step number.
+    :return: schemas.Step
+
+    Example:
+    >>> erase_luks("/dev/sda", luks.detect("/dev/sda"))
+    """
+    step = schemas.Step(device=dev_path, step=step)
+    header_size = header.header_size if header else luks.DEFAULT_HEADER_SIZE
+
+    # Even if cryptsetup is not available the header is overwritten.
+    cmd1 = await commands.erasure_command(
+        f"cryptsetup erase --batch-mode {dev_path}")
+    cmd1.description = "Wipe all the LUKS keyslots."
     step.commands.append(cmd1)
 
-    logger.debug(f"{dev_path}: hdparm erasure step finished.")
+    mebibytes = -(-header_size // (1024 * 1024))
+    cmd2 = await commands.erasure_command(
+        f"dd if=/dev/urandom of={dev_path} bs=1M count={mebibytes}"
+        f" oflag=direct conv=fsync")
+    cmd2.description = "Overwrite the LUKS header and keyslots area" \
+                       f" ({mebibytes} MiB) with random data."
+    step.commands.append(cmd2)
+
+    cmd3 = await commands.erasure_command(f"cryptsetup isLuks {dev_path}")
+    cmd3.description = "Verify the device is not a LUKS volume anymore."
+    cmd3.success = cmd3.return_code != 0 \
+        and luks.read_header(dev_path) is None
+    step.commands.append(cmd3)
+
+    step.success = cmd2.success and cmd3.success
+    step.end()
+    logger.debug(f"{dev_path}: LUKS erasure step finished.")
     return step
 
 
@@ -161,10 +287,19 @@ async def erase_hdd_shred(
     logger.debug(f"{dev_path} command: {command}")
 
     # Run the command.
+    histogram = heatmap.RegionHistogram()
     cmd: schemas.Exec = await commands.erasure_command(
-        command=command, process_manager=utils.print_shred_progress)
+        command=command,
+        process_manager=functools.partial(
+            utils.print_shred_progress,
+            dev_path=dev_path,
+            histogram=histogram,
+        ),
+        pausable=True,
+    )
     cmd.description = "Write zeros to the disk with `shred`."
     step.end()
+    step.heatmap = histogram.summary()
 
     # Write final values on the step schema.
     step.success = cmd.return_code == 0
@@ -209,7 +344,10 @@ async def erase_hdd_badblocks(
 
     # Run the command.
     cmd: schemas.Exec = await commands.erasure_command(
-        command=command, process_manager=utils.print_badblocks_progress)
+        command=command,
+        process_manager=utils.print_badblocks_progress,
+        pausable=True,
+    )
     cmd.description = "Write random data into the disk with `badblocks`."
     step.end()
 
@@ -219,3 +357,164 @@ async def erase_hdd_badblocks(
 
     logger.debug(f"{dev_path}: Command badblocks erasure step finished.")
     return step
+
+
+async def erase_native(
+        dev_path: str,
+        pattern: str = "random",
+        step: Optional[int] = None,
+        paths: Optional[List[str]] = None,
+) -> schemas.Step:
+    """Runs an erasure step overwriting the whole disk in-process with
+    `OverwriteEngine`, recording the write performance of each disk
+    region.
+
+    :param str dev_path: Path to the device.
+    :param str pattern: Pattern to apply on the erasure.
+    :param int step: Step number to be set on the step schema.
+    :param List[str] paths: Paths to the device to spread the writes.
+    :return: schemas.Step
+
+    Example:
+    >>> erase_native("/dev/sda", pattern="zeros")
+    """
+    step = schemas.Step(device=dev_path, step=step)
+
+    engine = OverwriteEngine(dev_path, pattern=pattern, paths=paths)
+    cmd = schemas.Exec(command=f"overwrite --pattern={engine.pattern}"
+                               f" {' '.join(engine.paths)}")
+    cmd.description = "Overwrite the whole disk in-process with" \
+                      f" {engine.pattern} data."
+    logger.debug(f"{dev_path} command: {cmd.command}")
+
+    cmd.success = await engine.run()
+    cmd.end_time = time.time()
+    cmd.return_code = 0 if cmd.success else 1
+    cmd.stdout = f"{engine.bytes_written} of {engine.size} bytes written."
+    cmd.stderr = engine.error
+    step.end()
+
+    # Write final values on the step schema.
+    step.heatmap = engine.heatmap.summary()
+    step.success = cmd.success
+    step.commands.append(cmd)
+
+    logger.debug(f"{dev_path}: Native overwrite step finished.")
+    return step
+
+
+async def erase_zoned(
+        dev_path: str,
+        pattern: str = "random",
+        step: Optional[int] = None,
+) -> schemas.Step:
+    """Runs an erasure step overwriting each zone of a zoned device
+    sequentially from its write pointer with `ZonedOverwriteEngine`.
+
+    :param str dev_path: Path to the device.
+    :param str pattern: Pattern to apply on the erasure.
+    :param int step: Step number to be set on the step schema.
+    :return: schemas.Step
+
+    Example:
+    >>> erase_zoned("/dev/sdb", pattern="zeros")
+    """
+    step = schemas.Step(device=dev_path, step=step)
+
+    engine = zoned.ZonedOverwriteEngine(dev_path, pattern=pattern)
+    cmd = schemas.Exec(command=f"overwrite --zoned --pattern={engine.pattern}"
+                               f" {dev_path}")
+    cmd.description = "Reset and overwrite each zone of the disk" \
+                      f" sequentially with {engine.pattern} data."
+    logger.debug(f"{dev_path} command: {cmd.command}")
+
+    cmd.success = await engine.run()
+    cmd.end_time = time.time()
+    cmd.return_code = 0 if cmd.success else 1
+    cmd.stdout = f"{engine.bytes_written} of {engine.size} bytes written" \
+                 f" on {engine.zones_written} zones."
+    cmd.stderr = engine.error
+    step.end()
+
+    # Write final values on the step schema.
+    step.heatmap = engine.heatmap.summary()
+    step.success = cmd.success
+    step.commands.append(cmd)
+
+    logger.debug(f"{dev_path}: Zoned overwrite step finished.")
+    return step
+
+
+async def erase_blkdev_ioctl(
+        dev_path: str,
+        operation: str = "blkzeroout",
+        step: Optional[int] = None,
+) -> schemas.Step:
+    """Runs an erasure step offloaded to the device with a block layer
+    ioctl over the whole disk, see `blkdev`.
+
+    :param str dev_path: Path to the device.
+    :param str operation: `blksecdiscard` or `blkzeroout`.
+    :param int step: Step number to be set on the step schema.
+    :return: schemas.Step
+
+    Example:
+    >>> erase_blkdev_ioctl("/dev/sda", "blksecdiscard")
+    """
+    step = schemas.Step(device=dev_path, step=step)
+
+    operation = blkdev.RangeOperation(dev_path, operation)
+    cmd = schemas.Exec(
+        command=f"ioctl {operation.operation.upper()} {dev_path}")
+    cmd.description = {
+        'blksecdiscard': "Discard all the blocks of the disk securely,"
+                         " erasing any copy of them.",
+        'blkzeroout': "Write zeros to the disk, offloaded to the device"
+                      " when supported.",
+    }[operation.operation]
+    logger.debug(f"{dev_path} command: {cmd.command}")
+
+    cmd.success = await operation.run()
+    cmd.end_time = time.time()
+    cmd.return_code = 0 if cmd.success else 1
+    cmd.stdout = f"{operation.bytes_done} of {operation.size} bytes done."
+    cmd.stderr = operation.error
+    step.end()
+
+    # Write final values on the step schema.
+    step.success = cmd.success
+    step.commands.append(cmd)
+
+    logger.debug(f"{dev_path}: {operation.operation} erasure step finished.")
+    return step
+
+
+# Step of each `Execution.tool`, called with the path of the device, the
+# pattern and the device info.
+TOOLS = {
+    'shred': lambda dev_path, pattern, device: erase_hdd_shred(
+        dev_path, pattern=pattern),
+    'badblocks': lambda dev_path, pattern, device: erase_hdd_badblocks(
+        dev_path, pattern=pattern),
+    'native': lambda dev_path, pattern, device: erase_native(
+        dev_path, pattern=pattern,
+        paths=multipath.stripe_paths(dev_path, device)),
+    'zoned': lambda dev_path, pattern, device: erase_zoned(
+        dev_path, pattern=pattern),
+    'nvme': lambda dev_path, pattern, device: erase_nvme(
+        dev_path, device.capabilities.nvme),
+    'scsi': lambda dev_path, pattern, device: erase_scsi(
+        dev_path, device.capabilities.scsi),
+    'sedutil': lambda dev_path, pattern, device: erase_sed(
+        dev_path, device.capabilities.sed, device.serial_number),
+    'luks': lambda dev_path, pattern, device: erase_luks(
+        dev_path, device.capabilities.luks),
+    'hdparm': lambda dev_path, pattern, device: erase_ssd_hdparm(
+        dev_path, device.capabilities.ata),
+    # A plain discard only unmaps the blocks, they may still be read
+    # from the flash, it is not an erasure.
+    'blksecdiscard': lambda dev_path, pattern, device: erase_blkdev_ioctl(
+        dev_path, operation='blksecdiscard'),
+    'blkzeroout': lambda dev_path, pattern, device: erase_blkdev_ioctl(
+        dev_path, operation='blkzeroout'),
+}
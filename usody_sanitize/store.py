@@ -0,0 +1,286 @@
+"""
+Job Store
+=========
+
+Embedded SQLite database where each sanitize result is recorded. The
+full report is kept as JSON and the values used to look up the history
+of a drive (serial number, WWN, model, date and result) are stored in
+indexed columns, so queries do not need to scan the reports.
+
+The throughput achieved by each successful erasure is also recorded per
+model, firmware, connector and method, to predict how long the next
+erasure of the same kind of drive will take.
+"""
+import datetime
+import json
+import logging
+import sqlite3
+import time
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from usody_sanitize import utils
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS sanitizations (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    date TEXT NOT NULL,
+    serial_number TEXT,
+    wwn TEXT,
+    model TEXT,
+    method TEXT,
+    result INTEGER NOT NULL,
+    report TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_sanitizations_created_at
+    ON sanitizations (created_at);
+CREATE INDEX IF NOT EXISTS ix_sanitizations_serial_number
+    ON sanitizations (serial_number, created_at);
+CREATE INDEX IF NOT EXISTS ix_sanitizations_wwn
+    ON sanitizations (wwn, created_at);
+CREATE INDEX IF NOT EXISTS ix_sanitizations_model
+    ON sanitizations (model, created_at);
+CREATE INDEX IF NOT EXISTS ix_sanitizations_date
+    ON sanitizations (date, created_at);
+CREATE INDEX IF NOT EXISTS ix_sanitizations_result
+    ON sanitizations (result, created_at);
+CREATE TABLE IF NOT EXISTS throughputs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at REAL NOT NULL,
+    model TEXT,
+    firmware TEXT,
+    connector TEXT,
+    method TEXT,
+    bytes INTEGER NOT NULL,
+    seconds REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_throughputs_drive
+    ON throughputs (model, method, firmware, connector, created_at);
+"""
+
+INSERT = """
+INSERT INTO sanitizations
+    (created_at, date, serial_number, wwn, model, method, result, report)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_THROUGHPUT = """
+INSERT INTO throughputs
+    (created_at, model, firmware, connector, method, bytes, seconds)
+VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+SUMMARY_COLUMNS = (
+    "id", "created_at", "date", "serial_number", "wwn", "model", "method",
+    "result",
+)
+
+
+class JobStore:
+    """Stores the sanitize reports on a SQLite database.
+
+    Writes are buffered and inserted in a single transaction once
+    `batch_size` reports are pending, when `flush` is called or when
+    the store is closed.
+
+    Example:
+    >>> with JobStore("sanitize.db") as store:
+    ...     store.add(report)
+    ...     store.history(serial_number="152D00539000")
+    """
+
+    def __init__(
+            self,
+            path: Union[str, Path],
+            batch_size: int = settings.store_batch_size,
+    ):
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self._pending: List[tuple] = []
+        self._pending_throughputs: List[tuple] = []
+
+        self._conn = sqlite3.connect(self.path.as_posix())
+        self._conn.row_factory = sqlite3.Row
+        # WAL allows reading the history while a station is writing.
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, report: dict, created_at: Optional[float] = None) -> None:
+        """Queues a sanitize report (the output of
+        `ErasureProcess.export`) to be written on the database.
+
+        :param dict report: Sanitize report.
+        :param Optional[float] created_at: Timestamp of the report, by
+            default the current time.
+        """
+        created_at = created_at or time.time()
+        device = report.get('device_info') or {}
+        method = report.get('method') or {}
+
+        self._pending.append((
+            created_at,
+            datetime.date.fromtimestamp(created_at).isoformat(),
+            device.get('serial_number'),
+            device.get('wwn'),
+            device.get('model'),
+            method.get('name'),
+            int(bool(report.get('result'))),
+            json.dumps(report, default=str),
+        ))
+        throughput = _throughput_row(report, created_at)
+        if throughput:
+            self._pending_throughputs.append(throughput)
+
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def flush(self) -> None:
+        """Writes all the pending reports in a single transaction."""
+        if not self._pending:
+            return
+
+        with self._conn:
+            self._conn.executemany(INSERT, self._pending)
+            self._conn.executemany(INSERT_THROUGHPUT,
+                                   self._pending_throughputs)
+        logger.debug(f"{self.path}: {len(self._pending)} reports stored.")
+        self._pending = []
+        self._pending_throughputs = []
+
+    def close(self) -> None:
+        self.flush()
+        self._conn.close()
+
+    def history(
+            self,
+            serial_number: Optional[str] = None,
+            wwn: Optional[str] = None,
+            model: Optional[str] = None,
+            date: Optional[str] = None,
+            result: Optional[bool] = None,
+            limit: int = 50,
+    ) -> List[dict]:
+        """Returns the summary of the stored reports matching all the
+        given filters, newest first.
+
+        :param Optional[str] serial_number: Serial number of the disk.
+        :param Optional[str] wwn: World Wide Name of the disk.
+        :param Optional[str] model: Model of the disk.
+        :param Optional[str] date: Date as `YYYY-MM-DD`.
+        :param Optional[bool] result: Result of the sanitize process.
+        :param int limit: Maximum number of records returned.
+        :return: A list of dictionaries with the `SUMMARY_COLUMNS`.
+        """
+        filters = {
+            'serial_number': serial_number,
+            'wwn': wwn,
+            'model': model,
+            'date': date,
+            'result': None if result is None else int(result),
+        }
+        where = [f"{k} = ?" for k, v in filters.items() if v is not None]
+        params = [v for v in filters.values() if v is not None]
+
+        query = f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM sanitizations"
+        if where:
+            query += f" WHERE {' AND '.join(where)}"
+        query += " ORDER BY created_at DESC LIMIT ?"
+
+        self.flush()
+        rows = self._conn.execute(query, [*params, limit]).fetchall()
+        return [
+            dict(row, result=bool(row['result'])) for row in rows
+        ]
+
+    def report(self, record_id: int) -> Optional[dict]:
+        """Returns the full sanitize report stored with the given id.
+
+        :param int record_id: Value of the `id` column.
+        :return: The report or None if it does not exist.
+        """
+        self.flush()
+        row = self._conn.execute(
+            "SELECT report FROM sanitizations WHERE id = ?", (record_id,)
+        ).fetchone()
+        return json.loads(row['report']) if row else None
+
+    def throughput(
+            self,
+            model: Optional[str],
+            firmware: Optional[str],
+            connector: Optional[str],
+            method: Optional[str],
+            limit: int = settings.history_samples,
+    ) -> Tuple[Optional[float], int]:
+        """Returns the throughput of the last successful erasures of the
+        same drive model and method. The ones with the same firmware and
+        connector are used when there are any.
+
+        :param Optional[str] model: Model of the disk.
+        :param Optional[str] firmware: Firmware version of the disk.
+        :param Optional[str] connector: Connector of the disk.
+        :param Optional[str] method: Name of the sanitize method.
+        :param int limit: Maximum number of erasures used.
+        :return: Bytes per second, None without history, and the number
+            of erasures used.
+
+        Example:
+        >>> store.throughput("MK3259GSXP", "GS002D", "block:scsi:pci",
+        ...                  "Basic Erasure")
+        """
+        if not model or not method:
+            return None, 0
+
+        self.flush()
+        exact = {'model': model, 'method': method,
+                 'firmware': firmware, 'connector': connector}
+        for filters in (exact, {'model': model, 'method': method}):
+            where = " AND ".join(f"{k} IS ?" for k in filters)
+            row = self._conn.execute(
+                "SELECT SUM(bytes) AS bytes, SUM(seconds) AS seconds,"
+                " COUNT(*) AS samples FROM (SELECT bytes, seconds"
+                f" FROM throughputs WHERE {where}"
+                " ORDER BY created_at DESC LIMIT ?)",
+                [*filters.values(), limit]).fetchone()
+            if row['samples'] and row['seconds']:
+                return row['bytes'] / row['seconds'], row['samples']
+        return None, 0
+
+
+def _throughput_row(report: dict, created_at: float) -> Optional[tuple]:
+    """Bytes of the device and seconds of the erasure steps of a
+    successful report.
+    """
+    if not report.get('result'):
+        return None
+    device = report.get('device_info') or {}
+    export_data = device.get('export_data') or {}
+    smart = export_data.get('smart') or {}
+    block = export_data.get('block') or {}
+
+    size = (smart.get('user_capacity') or {}).get('bytes') \
+        or utils.parse_size(block.get('size') or device.get('size'))
+    seconds = sum(step.get('duration') or 0
+                  for step in report.get('steps') or [])
+    if not size or seconds <= 0:
+        return None
+    return (
+        created_at,
+        device.get('model'),
+        smart.get('firmware_version'),
+        device.get('connector'),
+        (report.get('method') or {}).get('name'),
+        size,
+        seconds,
+    )
@@ -0,0 +1,208 @@
+"""
+Thermal
+=======
+
+Temperature of the drives polled during the erasure. In dense chassis a
+drive overwritten at full speed for hours gets hot enough to throttle
+or fail, pausing its writes for a while keeps the sustained throughput
+of the station higher than the thermal throttling and the retries.
+
+- The temperature is read from the `hwmon` of the device when the kernel
+  exposes it, or from `smartctl`.
+- Above `thermal_max_temperature` the writes of the device are paused
+  until it cools down to `thermal_resume_temperature`: the overwrite
+  tools (`shred`, `badblocks`) are stopped with `SIGSTOP` and the native
+  engine waits between chunks.
+- The scheduler defers the start of the erasures of hot drives.
+
+Firmware erasures can not be paused, only recorded.
+"""
+import asyncio
+import contextlib
+import contextvars
+import glob
+import logging
+import os
+import signal
+import threading
+import time
+from typing import Callable, List, Optional
+
+from usody_sanitize import schemas, metrics, health
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# `hwmon` of SATA/SAS disks (drivetemp) and of NVMe controllers.
+HWMON_PATHS = (
+    "/sys/block/{name}/device/hwmon/hwmon*/temp1_input",
+    "/sys/block/{name}/device/hwmon*/temp1_input",
+)
+
+
+def parse_temperature(smart: Optional[dict]) -> Optional[float]:
+    """Current Celsius degrees from the `smartctl -aj` output."""
+    current = ((smart or {}).get('temperature') or {}).get('current')
+    return float(current) if isinstance(current, (int, float)) else None
+
+
+def read_hwmon(dev_path: str) -> Optional[float]:
+    name = os.path.basename(dev_path)
+    for pattern in HWMON_PATHS:
+        for path in glob.glob(pattern.format(name=name)):
+            try:
+                with open(path) as _fh:
+                    return int(_fh.read()) / 1000
+            except (OSError, ValueError):
+                continue
+    return None
+
+
+async def read_temperature(dev_path: str) -> Optional[float]:
+    """Current Celsius degrees of the device, None if not reported."""
+    temperature = read_hwmon(dev_path)
+    if temperature is None:
+        temperature = parse_temperature(await health.read_smart(dev_path))
+    return temperature
+
+
+def _signal(pids: List[int], signum: int) -> None:
+    for pid in pids:
+        try:
+            os.kill(pid, signum)
+        except OSError:
+            pass
+
+
+class ThermalMonitor:
+    """Polls the temperature of a device and pauses its writes while it
+    is too hot.
+
+    Example:
+    >>> monitor = ThermalMonitor("/dev/sda", temperature=38)
+    >>> activate(monitor)
+    >>> task = asyncio.create_task(monitor.run())
+    >>> report.thermal = monitor.summary()
+    """
+
+    def __init__(
+            self,
+            dev_path: str,
+            temperature: Optional[float] = None,
+            interval: float = settings.thermal_poll_interval,
+            max_points: int = settings.thermal_max_points,
+            source: Optional[str] = None,
+    ):
+        self.dev_path = dev_path
+        # Device where the temperature is read, a path of a multipath one.
+        self.source = source or dev_path
+        self.interval = interval
+        self.max_points = max_points
+        self.series: List[List[float]] = []
+        self.pauses = 0
+        self.paused_seconds = 0.0
+        # Set while the writes are allowed, waited by the native engine.
+        self.cool = threading.Event()
+        self.cool.set()
+        self._paused_at: Optional[float] = None
+        self._processes: List[Callable[[], List[int]]] = []
+        self._metrics = metrics.registry.device(dev_path)
+        if temperature is not None:
+            self.record(temperature)
+
+    async def run(self) -> None:
+        """Polls the temperature until it is cancelled."""
+        try:
+            while True:
+                await asyncio.sleep(self.interval)
+                temperature = await read_temperature(self.source)
+                if temperature is not None:
+                    self.record(temperature)
+        finally:
+            if not self.cool.is_set():
+                self._resume()
+
+    def record(self, temperature: float) -> None:
+        self.series.append([round(time.time(), 3), temperature])
+        if len(self.series) > 2 * self.max_points:
+            self.series = self.series[:-1:2] + self.series[-1:]
+        self._metrics.temperature = temperature
+
+        if self.cool.is_set() \
+                and temperature >= settings.thermal_max_temperature:
+            logger.warning(f"{self.dev_path}: {temperature}°C, pausing the"
+                           f" writes until it cools down.")
+            self._pause()
+        elif not self.cool.is_set() \
+                and temperature <= settings.thermal_resume_temperature:
+            logger.info(f"{self.dev_path}: {temperature}°C, resuming the"
+                        f" writes.")
+            self._resume()
+
+    def _pause(self) -> None:
+        self.cool.clear()
+        self.pauses += 1
+        self._paused_at = time.monotonic()
+        for pids in self._processes:
+            _signal(pids(), signal.SIGSTOP)
+
+    def _resume(self) -> None:
+        for pids in self._processes:
+            _signal(pids(), signal.SIGCONT)
+        self.paused_seconds += time.monotonic() - self._paused_at
+        self.cool.set()
+
+    @contextlib.contextmanager
+    def pausable(self, pids: Callable[[], List[int]]):
+        """Pauses the processes returned by `pids` while the device is
+        hot, they are resumed when the context ends.
+        """
+        self._processes.append(pids)
+        if not self.cool.is_set():
+            _signal(pids(), signal.SIGSTOP)
+        try:
+            yield
+        finally:
+            self._processes.remove(pids)
+            if not self.cool.is_set():
+                _signal(pids(), signal.SIGCONT)
+
+    def wait_cool(self, cancelled: threading.Event) -> None:
+        """Blocks the calling thread while the device is hot."""
+        while not self.cool.wait(1):
+            if cancelled.is_set():
+                return
+
+    def summary(self) -> Optional[schemas.Thermal]:
+        if not self.series:
+            return None
+        return schemas.Thermal(
+            max_temperature=max(t for _, t in self.series),
+            pauses=self.pauses,
+            paused_seconds=round(self.paused_seconds, 3),
+            series=self.series,
+        )
+
+
+current_monitor = contextvars.ContextVar("current_thermal", default=None)
+
+
+def activate(monitor: ThermalMonitor) -> None:
+    """Sets the monitor paused by `pausable` on the current context, call
+    it from the task running the erasure of the device.
+    """
+    current_monitor.set(monitor)
+
+
+def current() -> Optional[ThermalMonitor]:
+    return current_monitor.get()
+
+
+def pausable(pids: Callable[[], List[int]]):
+    """Pauses the processes while the device of the current context is
+    hot, it does nothing if there is no monitor activated.
+    """
+    monitor: Optional[ThermalMonitor] = current_monitor.get()
+    if monitor is None:
+        return contextlib.nullcontext()
+    return monitor.pausable(pids)
@@ -0,0 +1,96 @@
+"""
+Throughput
+==========
+
+Short read-only measurement of the sequential throughput of a device at
+the start, the middle and the end of its LBA space. HDDs are much
+faster on the outer tracks, the average of the three positions is close
+to the average of a whole pass. Nothing is written to the device.
+"""
+import asyncio
+import errno
+import logging
+import os
+import time
+from typing import Dict
+
+from usody_sanitize import buffers
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+POSITIONS = ('start', 'middle', 'end')
+
+
+def _open(dev_path: str) -> int:
+    try:
+        return os.open(dev_path, os.O_RDONLY | getattr(os, "O_DIRECT", 0))
+    except OSError as ex:
+        # Some devices and file systems do not support `O_DIRECT`.
+        if ex.errno != errno.EINVAL:
+            raise
+        return os.open(dev_path, os.O_RDONLY)
+
+
+def _measure(
+        dev_path: str,
+        sample_size: int,
+        chunk_size: int,
+) -> Dict[str, float]:
+    fd = _open(dev_path)
+    try:
+        with buffers.pool.lease(chunk_size) as lease:
+            return _measure_positions(fd, lease.get(), sample_size,
+                                      chunk_size)
+    finally:
+        os.close(fd)
+
+
+def _measure_positions(
+        fd: int,
+        buffer,
+        sample_size: int,
+        chunk_size: int,
+) -> Dict[str, float]:
+    size = os.lseek(fd, 0, os.SEEK_END)
+    sample_size = min(sample_size, size)
+    # Offsets aligned to the chunk size.
+    offsets = {
+        'start': 0,
+        'middle': (size - sample_size) // 2 // chunk_size * chunk_size,
+        'end': (size - sample_size) // chunk_size * chunk_size,
+    }
+
+    results = {}
+    for position in POSITIONS:
+        offset = offsets[position]
+        end = offset + sample_size
+        start = time.perf_counter()
+        while offset < end:
+            read = os.preadv(fd, [buffer], offset)
+            if not read:
+                break
+            offset += read
+        elapsed = time.perf_counter() - start
+        results[position] = \
+            (offset - offsets[position]) / elapsed if elapsed > 0 else 0
+    return results
+
+
+async def measure_read_throughput(
+        dev_path: str,
+        sample_size: int = settings.dry_run_sample_size,
+        chunk_size: int = settings.engine_chunk_size,
+) -> Dict[str, float]:
+    """Bytes per second read at the start, middle and end of the device.
+
+    :param str dev_path: Path to the device.
+    :param int sample_size: Bytes read on each position.
+    :param int chunk_size: Bytes of each read request.
+
+    Example:
+    >>> await measure_read_throughput("/dev/sda")
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        None, _measure, dev_path, sample_size, chunk_size)
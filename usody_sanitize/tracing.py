@@ -0,0 +1,162 @@
+"""
+Tracing
+=======
+
+Lightweight timing spans around the phases of the sanitize process
+(probing, pre-validation, each overwrite pass, verification and the
+report serialization) and around every executed command.
+
+Each `ErasureProcess` owns a `Tracer`, it is activated on the task
+running the erasure so `span` finds it without passing it around. The
+phase spans are stored on the report and all of them can be exported
+as a Chrome trace (`chrome://tracing` or https://ui.perfetto.dev).
+
+When profiling is enabled, `cProfile` runs for the whole process and
+`tracemalloc` measures the memory allocated on each span.
+"""
+import contextlib
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List, Optional, Union
+
+from usody_sanitize import schemas
+
+logger = logging.getLogger(__name__)
+
+PHASE = "phase"
+COMMAND = "command"
+
+
+class Tracer:
+    """Records the spans of a single device or of the whole station."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.spans: List[schemas.Span] = []
+        registry.append(self)
+
+    @contextlib.contextmanager
+    def span(self, name: str, category: str = PHASE, **attributes):
+        """Times the code inside the context as a new span.
+
+        Example:
+        >>> with tracer.span("verification"):
+        ...     await self._validation()
+        """
+        span = schemas.Span(name=name, category=category,
+                            attributes=attributes)
+        memory_start = tracemalloc.get_traced_memory()[0] \
+            if tracemalloc.is_tracing() else None
+        cpu_start = time.process_time()
+        try:
+            yield span
+        finally:
+            span.end()
+            span.cpu_time = time.process_time() - cpu_start
+            if memory_start is not None and tracemalloc.is_tracing():
+                span.memory_allocated = \
+                    tracemalloc.get_traced_memory()[0] - memory_start
+            self.spans.append(span)
+
+    def phases(self) -> List[schemas.Span]:
+        """Spans to be stored on the report."""
+        return [s for s in self.spans if s.category == PHASE]
+
+
+registry: List[Tracer] = []
+current_tracer = contextvars.ContextVar("current_tracer", default=None)
+
+
+def activate(tracer: Tracer) -> None:
+    """Sets the tracer used by `span` on the current context, call it
+    from the task running the erasure of the device.
+    """
+    current_tracer.set(tracer)
+
+
+def span(name: str, category: str = PHASE, **attributes):
+    """Times the code inside the context on the current tracer, it does
+    nothing if there is no tracer activated.
+    """
+    tracer: Optional[Tracer] = current_tracer.get()
+    if tracer is None:
+        return contextlib.nullcontext()
+    return tracer.span(name, category, **attributes)
+
+
+def write_chrome_trace(path: Union[str, Path]) -> None:
+    """Writes all the recorded spans as a Chrome trace JSON file, each
+    tracer (device) is shown as a different thread.
+    """
+    pid = os.getpid()
+    events = []
+    for tid, tracer in enumerate(registry, start=1):
+        events.append({
+            "name": "thread_name", "ph": "M", "pid": pid, "tid": tid,
+            "args": {"name": tracer.name},
+        })
+        for s in tracer.spans:
+            events.append({
+                "name": s.name,
+                "cat": s.category,
+                "ph": "X",
+                "ts": int(s.start_time * 1_000_000),
+                "dur": int((s.duration or 0) * 1_000_000),
+                "pid": pid,
+                "tid": tid,
+                "args": {
+                    **s.attributes,
+                    "cpu_time": s.cpu_time,
+                    "memory_allocated": s.memory_allocated,
+                },
+            })
+
+    with open(path, 'w') as _fh:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, _fh)
+    logger.info(f"Trace saved in `{path}`.")
+
+
+class Profiler:
+    """Runs `cProfile` and `tracemalloc` while it is active.
+
+    Only one `cProfile` profiler can be active at a time and the
+    erasures run concurrently, so a single profile covers the whole
+    run; the time and memory of each phase are found on its spans.
+    """
+
+    def __init__(self, output_path: Union[str, Path], top: int = 25):
+        self.output_path = Path(output_path)
+        self.top = top
+        self._profile = cProfile.Profile()
+
+    def __enter__(self):
+        tracemalloc.start()
+        self._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._profile.disable()
+        snapshot = tracemalloc.take_snapshot()
+        tracemalloc.stop()
+
+        self.output_path.mkdir(parents=True, exist_ok=True)
+        stats_path = self.output_path / "profile.pstats"
+        self._profile.dump_stats(stats_path.as_posix())
+
+        memory_path = self.output_path / "profile_memory.txt"
+        with open(memory_path, 'w') as _fh:
+            for stat in snapshot.statistics("lineno")[:self.top]:
+                _fh.write(f"{stat}\n")
+
+        with open(self.output_path / "profile.txt", 'w') as _fh:
+            stats = pstats.Stats(self._profile, stream=_fh)
+            stats.sort_stats(pstats.SortKey.CUMULATIVE).print_stats(self.top)
+
+        logger.info(f"Profile saved in `{stats_path}` and `{memory_path}`.")
@@ -0,0 +1,166 @@
+"""
+Queue Tuning
+============
+
+Opt-in tuning of the block queue of a device while it is erased. Long
+sequential passes are faster with no I/O scheduler, the largest
+requests accepted by the device, more requests in flight and no
+read-ahead.
+
+The original values are always restored:
+
+- When the erasure ends, fails or is cancelled, like on `SIGTERM`.
+- At exit of the process, for the tunings still applied.
+- After a crash, from the state file saved before tuning the device,
+  the next run restores it before tuning the device again.
+"""
+import atexit
+import json
+import logging
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+from usody_sanitize import schemas
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Special value of `max_sectors_kb`, the limit of the hardware.
+MAX = "max"
+
+# Tunings applied right now, restored at exit.
+_applied: Dict[str, "QueueTuner"] = {}
+
+
+def _read(path: Path) -> Optional[str]:
+    try:
+        return path.read_text().strip()
+    except OSError:
+        return None
+
+
+def _current(queue: Path, name: str) -> Optional[str]:
+    value = _read(queue / name)
+    if value and name == 'scheduler':
+        # The active scheduler is between brackets: `mq-deadline [none]`.
+        for scheduler in value.split():
+            if scheduler.startswith("["):
+                return scheduler.strip("[]")
+    return value
+
+
+def _write(queue: Path, name: str, value: str) -> bool:
+    try:
+        (queue / name).write_text(value)
+        return True
+    except OSError as ex:
+        logger.warning(f"{queue}: Can not set {name} to {value}: {ex}")
+        return False
+
+
+class QueueTuner:
+    """Applies a tuning profile to the queue of a device and restores
+    its original values.
+
+    Example:
+    >>> with QueueTuner("/dev/sda") as tuner:
+    ...     await erasure.run()
+    >>> report.queue_tuning = tuner.summary()
+    """
+
+    def __init__(
+            self,
+            dev_path: Union[str, Path],
+            profile: Optional[Dict[str, str]] = None,
+            state_dir: Union[str, Path] = settings.queue_tuning_state_dir,
+            sys_block: Union[str, Path] = "/sys/block",
+    ):
+        self.name = Path(dev_path).name
+        self.profile = settings.queue_tuning_profile if profile is None \
+            else profile
+        self.queue = Path(sys_block) / self.name / "queue"
+        self.state_file = Path(state_dir) / f"queue-{self.name}.json"
+        self.original: Dict[str, str] = {}
+        self.applied: Dict[str, str] = {}
+        self.restored = False
+
+    def __enter__(self):
+        self.apply()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.restore()
+
+    def apply(self) -> None:
+        # Left by a previous run that crashed.
+        restore_state(self.state_file)
+
+        values = {}
+        for name, value in self.profile.items():
+            original = _current(self.queue, name)
+            if value == MAX:
+                value = _read(self.queue / "max_hw_sectors_kb")
+            if original is not None and value and value != original:
+                values[name] = value
+                self.original[name] = original
+
+        # Saved before changing anything, to restore it after a crash.
+        self._save_state()
+        _applied[self.name] = self
+        for name, value in values.items():
+            if _write(self.queue, name, value):
+                self.applied[name] = value
+        logger.info(f"{self.name}: Queue tuned {self.applied}.")
+
+    def restore(self) -> None:
+        if self.restored:
+            return
+        for name, value in self.original.items():
+            _write(self.queue, name, value)
+        self.restored = True
+        _applied.pop(self.name, None)
+        try:
+            self.state_file.unlink()
+        except OSError:
+            pass
+        logger.debug(f"{self.name}: Queue restored {self.original}.")
+
+    def _save_state(self) -> None:
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            self.state_file.write_text(json.dumps(
+                {'queue': self.queue.as_posix(), 'original': self.original}))
+        except OSError as ex:
+            logger.warning(f"{self.name}: Tuning state not saved: {ex}")
+
+    def summary(self) -> schemas.QueueTuning:
+        return schemas.QueueTuning(
+            applied=self.applied,
+            original={k: self.original[k] for k in self.applied},
+            restored=self.restored,
+        )
+
+
+def restore_state(state_file: Path) -> None:
+    """Restores the queue values saved on the state file of a tuning
+    that was never restored.
+    """
+    try:
+        state = json.loads(state_file.read_text())
+        queue = Path(state['queue'])
+    except (OSError, ValueError, KeyError):
+        return
+    for name, value in (state.get('original') or {}).items():
+        _write(queue, name, value)
+    logger.warning(f"{queue}: Restored the queue values of a previous run"
+                   f" {state.get('original')}.")
+    state_file.unlink()
+
+
+def restore_all() -> None:
+    """Restores the tunings still applied by this process."""
+    for tuner in list(_applied.values()):
+        tuner.restore()
+
+
+atexit.register(restore_all)
@@ -1,10 +1,12 @@
 import asyncio
 import logging
 import re
+import time
 from enum import Enum
-from typing import Optional
+from typing import Optional, Tuple
 
-from usody_sanitize import schemas
+from usody_sanitize import schemas, metrics, heatmap
+from usody_sanitize.config import settings
 
 logger = logging.getLogger(__name__)
 
@@ -19,13 +21,96 @@ def get_spaced_numbers(max_num: int, items: int):
     return [int(i * step) for i in range(items)]
 
 
+SIZE_UNITS = "KMGTPE"
+
+
+def parse_size(text: Optional[str]) -> Optional[int]:
+    """Converts a human readable size as printed by `shred` or `lsblk`
+    into bytes. Sizes without `B` or with `iB` use powers of 1024.
+
+    :param Optional[str] text: Size like `350MiB`, `298.1G` or `1.2TB`.
+    :return: The size in bytes or None if it is not a valid size.
+
+    Example:
+    >>> parse_size("1.5KiB")
+    """
+    match = re.fullmatch(r"\s*([0-9.]+)\s*([KMGTPE]?)(i?)(B?)\s*",
+                         text or "", re.IGNORECASE)
+    if not match:
+        return None
+    number, unit, binary, suffix = match.groups()
+    base = 1000 if suffix and not binary else 1024
+    exponent = SIZE_UNITS.index(unit.upper()) + 1 if unit else 0
+    try:
+        return int(float(number) * base ** exponent)
+    except ValueError:
+        return None
+
+
+def parse_shred_progress(line: str) -> Optional[Tuple[int, Optional[int]]]:
+    """Parses a progress line of `shred`, like
+    `shred: /dev/sda: pass 1/1 (random)...1.1GiB/299GiB 0%`.
+
+    :param str line: Line printed by `shred --verbose`.
+    :return: The bytes written and the total bytes of the pass, or None
+        if it is not a progress line.
+    """
+    progress = re.search(r"pass \d+/\d+ \(\w+\)\.\.\.(?:(\S+)/(\S+))?", line)
+    if not progress:
+        return None
+    written, total = progress.groups()
+    return parse_size(written) or 0, parse_size(total)
+
+
+def update_shred_progress(
+        device: metrics.DeviceMetrics,
+        line: str,
+) -> None:
+    """Updates the device metrics with a progress line of `shred`."""
+    progress = parse_shred_progress(line)
+    if progress:
+        device.update_progress(*progress)
+
+
 async def print_shred_progress(
         cmd: schemas.Exec,
-        process: asyncio.subprocess.Process
+        process: asyncio.subprocess.Process,
+        dev_path: Optional[str] = None,
+        histogram: Optional[heatmap.RegionHistogram] = None,
 ):
-    """Example how to process `shred` output."""
-    async for line in process.stderr:
-        logger.debug(f"{cmd.command}: {line}")
+    """Process the `shred` output, the progress is reported on the
+    metrics of the device when `dev_path` is given, and on the
+    `histogram` of the disk regions when given.
+
+    `shred` prints rounded sizes every few seconds, so the histogram
+    is an approximation.
+    """
+    device = metrics.registry.device(dev_path) if dev_path else None
+    watchdog = asyncio.create_task(metrics.watch_stalls(
+        device, settings.metrics_stall_seconds)) if device else None
+    last_written, last_time = 0, time.monotonic()
+
+    try:
+        async for line in process.stderr:
+            clean_line = line.decode('UTF-8').strip()
+            logger.debug(f"{cmd.command}: {clean_line}")
+
+            progress = parse_shred_progress(clean_line)
+            if progress is None:
+                continue
+            written, total = progress
+            if device:
+                device.update_progress(written, total)
+
+            if histogram is not None and written > last_written:
+                now = time.monotonic()
+                histogram.size = histogram.size or total
+                histogram.record(
+                    last_written, written - last_written, now - last_time)
+                last_written, last_time = written, now
+    finally:
+        if watchdog:
+            watchdog.cancel()
 
 
 async def print_badblocks_progress(
@@ -52,3 +137,21 @@ def find_text(re_expression: str, string: str) -> Optional[str]:
     text = re.search(re_expression, string)
     if text:
         return text.groups()[0]
+
+
+def format_wwn(wwn: Optional[dict]) -> Optional[str]:
+    """Formats the `wwn` object returned by `smartctl` as the hex string
+    used by `lsblk`.
+
+    :param Optional[dict] wwn: Dictionary with `naa`, `oui` and `id` keys.
+    :return: The WWN like `0x5000c500a1b2c3d4` or None.
+
+    Example:
+    >>> format_wwn({"naa": 5, "oui": 3152, "id": 2712847316})
+    """
+    if not wwn:
+        return None
+    try:
+        return f"0x{wwn['naa']:x}{wwn['oui']:06x}{wwn['id']:09x}"
+    except (KeyError, TypeError, ValueError):
+        return None
@@ -0,0 +1,302 @@
+"""
+Write Cache
+===========
+
+Opt-in management of the volatile write cache of the drive during the
+erasure. With the cache enabled the overwrite passes run at the cached
+speed of the drive, but a pass is only complete when the cache has been
+flushed to the media, so explicit flush barriers are issued and recorded
+on the steps:
+
+- At the end of each pass, a failed flush fails the step.
+- At checkpoints during long passes, every `write_cache_flush_interval`.
+
+The cache is set with the tool of the device protocol, `hdparm -W` for
+ATA, `sdparm WCE` for SCSI and the volatile write cache feature of NVMe,
+without saving it on the drive. The original setting is restored:
+
+- When the erasure ends, fails or is cancelled, like on `SIGTERM`.
+- At exit of the process, for the caches still enabled.
+- After a crash, from the state file saved before enabling the cache,
+  the next run flushes and disables it before reading the setting.
+
+A barrier is a `fsync` of the block device: the kernel writes its page
+cache and sends a cache flush command to the drive.
+"""
+import asyncio
+import atexit
+import contextlib
+import json
+import logging
+import os
+import re
+import shlex
+import subprocess
+import time
+from pathlib import Path
+from typing import Dict, List, Optional, Union
+
+from usody_sanitize import schemas, commands
+from usody_sanitize.config import settings
+
+logger = logging.getLogger(__name__)
+
+ATA = "ata"
+SCSI = "scsi"
+NVME = "nvme"
+
+# Caches enabled right now, restored at exit.
+_enabled: Dict[str, "WriteCache"] = {}
+
+
+def protocol(dev_path: str, device: Optional[schemas.Device]) -> str:
+    """Tool family used to set the write cache of the device."""
+    if os.path.basename(dev_path).startswith("nvme"):
+        return NVME
+    if device and device.capabilities.ata:
+        return ATA
+    return SCSI
+
+
+def parse_setting(kind: str, output: str) -> Optional[bool]:
+    """Write cache enabled from the output of the get command, None if
+    it is not reported.
+    """
+    if kind == ATA:
+        # ` write-caching =  1 (on)`
+        match = re.search(r"write-caching\s*=\s*(\d)", output or "")
+    elif kind == NVME:
+        # `get-feature:0x06 (Volatile Write Cache), Current value:0x00000001`
+        match = re.search(r"[Cc]urrent value:\s*(?:0x)?([0-9a-fA-F]+)",
+                          output or "")
+        if match:
+            return bool(int(match.group(1), 16) & 1)
+    else:
+        # `    WCE         1  [cha: y, def:  1, sav:  1]`
+        match = re.search(r"^\s*WCE\s+(\d)", output or "", re.MULTILINE)
+    return bool(int(match.group(1))) if match else None
+
+
+def _get_command(kind: str, dev_path: str) -> str:
+    return {
+        ATA: f"hdparm -W {dev_path}",
+        SCSI: f"sdparm --get=WCE {dev_path}",
+        NVME: f"nvme get-feature {dev_path} --feature-id=6",
+    }[kind]
+
+
+def _set_command(kind: str, dev_path: str, enabled: bool) -> str:
+    value = int(enabled)
+    return {
+        ATA: f"hdparm -W{value} {dev_path}",
+        SCSI: f"sdparm --set=WCE={value} {dev_path}",
+        NVME: f"nvme set-feature {dev_path} --feature-id=6 --value={value}",
+    }[kind]
+
+
+def _fsync(dev_path: str) -> None:
+    fd = os.open(dev_path, os.O_WRONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _disable(dev_path: str, kind: str) -> bool:
+    """Flushes and disables the cache out of the event loop, at exit or
+    after a crash.
+    """
+    with contextlib.suppress(OSError):
+        _fsync(dev_path)
+    try:
+        result = subprocess.run(
+            shlex.split(_set_command(kind, dev_path, False)),
+            capture_output=True)
+    except OSError as ex:
+        logger.error(f"{dev_path}: Write cache setting not restored: {ex}")
+        return False
+    return result.returncode == 0
+
+
+async def flush(dev_path: str, description: str) -> schemas.Exec:
+    """Flush barrier: the data written on the device is on its media
+    when the returned command succeeds.
+    """
+    cmd = schemas.Exec(command=f"fsync {dev_path}", description=description)
+    try:
+        await asyncio.get_running_loop().run_in_executor(
+            None, _fsync, dev_path)
+        cmd.return_code = 0
+    except OSError as ex:
+        cmd.return_code = ex.errno or 1
+        cmd.stderr = str(ex)
+        logger.error(f"{dev_path}: Write cache flush failed: {ex}")
+    cmd.end_time = time.time()
+    cmd.success = cmd.return_code == 0
+    return cmd
+
+
+class WriteCache:
+    """Enables the volatile write cache of a device during the erasure
+    and restores its original setting.
+
+    Example:
+    >>> async with WriteCache("/dev/sda", device) as cache:
+    ...     async with cache.checkpoints() as flushes:
+    ...         step = await run_step()
+    ...     step.commands += flushes
+    ...     await cache.barrier(step)
+    >>> report.write_cache = cache.summary()
+    """
+
+    def __init__(
+            self,
+            dev_path: str,
+            device: Optional[schemas.Device] = None,
+            interval: float = settings.write_cache_flush_interval,
+            state_dir: Union[str, Path] = settings.write_cache_state_dir,
+    ):
+        self.dev_path = dev_path
+        self.kind = protocol(dev_path, device)
+        self.interval = interval
+        self.state_file = Path(state_dir) / \
+            f"write-cache-{os.path.basename(dev_path)}.json"
+        self.original: Optional[bool] = None
+        self.enabled = False
+        self.restored = False
+        self.commands: List[schemas.Exec] = []
+
+    async def __aenter__(self):
+        await self.enable()
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.restore()
+
+    async def enable(self) -> None:
+        # Left enabled by a previous run that crashed.
+        restore_state(self.state_file)
+
+        cmd = await commands.erasure_command(
+            _get_command(self.kind, self.dev_path))
+        cmd.description = "Read the volatile write cache setting."
+        self.commands.append(cmd)
+        self.original = parse_setting(self.kind, cmd.stdout)
+        if self.original is None:
+            logger.warning(f"{self.dev_path}: Write cache setting unknown,"
+                           f" it is not changed.")
+            return
+        if self.original:
+            self.enabled = True
+            return
+
+        # Saved before enabling it, to restore it after a crash.
+        self._save_state()
+        _enabled[self.dev_path] = self
+        cmd = await commands.erasure_command(
+            _set_command(self.kind, self.dev_path, True))
+        cmd.description = "Enable the volatile write cache for the erasure."
+        self.commands.append(cmd)
+        self.enabled = cmd.success
+        logger.info(f"{self.dev_path}: Write cache enabled: {self.enabled}.")
+
+    async def restore(self) -> None:
+        if self.restored:
+            return
+        self.restored = True
+        if self.original is False and self.enabled:
+            # Nothing cached must be lost when the cache is disabled.
+            self.commands.append(await flush(
+                self.dev_path, "Flush the write cache before disabling it."))
+            cmd = await commands.erasure_command(
+                _set_command(self.kind, self.dev_path, False))
+            cmd.description = "Restore the original write cache setting."
+            self.commands.append(cmd)
+            self.restored = cmd.success
+            if not cmd.success:
+                logger.error(f"{self.dev_path}: Write cache setting not"
+                             f" restored: {cmd.stderr}")
+                return
+        self._forget()
+
+    def _save_state(self) -> None:
+        try:
+            self.state_file.parent.mkdir(parents=True, exist_ok=True)
+            self.state_file.write_text(json.dumps(
+                {'dev_path': self.dev_path, 'kind': self.kind}))
+        except OSError as ex:
+            logger.warning(f"{self.dev_path}: Write cache state not saved:"
+                           f" {ex}")
+
+    def _forget(self) -> None:
+        _enabled.pop(self.dev_path, None)
+        with contextlib.suppress(OSError):
+            self.state_file.unlink()
+
+    @contextlib.asynccontextmanager
+    async def checkpoints(self):
+        """Issues flush barriers every `interval` seconds while the pass
+        runs, it yields the list of the recorded barriers.
+        """
+        flushes: List[schemas.Exec] = []
+        task = asyncio.create_task(self._checkpoints(flushes)) \
+            if self.interval else None
+        try:
+            yield flushes
+        finally:
+            if task:
+                task.cancel()
+                with contextlib.suppress(asyncio.CancelledError):
+                    await task
+
+    async def _checkpoints(self, flushes: List[schemas.Exec]) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            flushes.append(
+                await flush(self.dev_path, "Checkpoint flush barrier."))
+
+    async def barrier(self, step: schemas.Step) -> None:
+        """Flushes the cache at the end of the pass, the writes of the
+        step are durable when the flush is confirmed, otherwise the step
+        fails.
+        """
+        cmd = await flush(self.dev_path, "Flush the write cache at the end"
+                                         " of the pass.")
+        step.commands.append(cmd)
+        step.durable = cmd.success
+        if not cmd.success:
+            step.success = False
+
+    def summary(self) -> schemas.WriteCache:
+        return schemas.WriteCache(
+            original=self.original,
+            enabled=self.enabled,
+            restored=self.restored,
+            commands=self.commands,
+        )
+
+
+def restore_state(state_file: Path) -> None:
+    """Flushes and disables the cache enabled by a previous run that was
+    never restored, from its state file.
+    """
+    try:
+        state = json.loads(state_file.read_text())
+        dev_path, kind = state['dev_path'], state['kind']
+    except (OSError, ValueError, KeyError):
+        return
+    if _disable(dev_path, kind):
+        logger.warning(f"{dev_path}: Disabled the write cache enabled by"
+                       f" a previous run.")
+        state_file.unlink()
+
+
+def restore_all() -> None:
+    """Restores the caches still enabled by this process."""
+    for cache in list(_enabled.values()):
+        if _disable(cache.dev_path, cache.kind):
+            cache.restored = True
+            cache._forget()
+
+
+atexit.register(restore_all)
@@ -0,0 +1,182 @@
+"""
+Zoned
+=====
+
+Host-managed SMR disks and NVMe ZNS drives are divided in zones that
+must be written sequentially from their write pointer, random writes are
+rejected. `shred` and `badblocks` fail on them, and the block layer does
+not accept `BLKZEROOUT` on the sequential zones.
+
+`ZonedOverwriteEngine` overwrites every zone compliant with this:
+
+- Each sequential zone is reset, so its write pointer is at the start,
+  and written sequentially up to its capacity by a single thread.
+- Several zones are written at the same time, `zoned_zones_in_flight`.
+- Conventional zones are written as a normal device.
+- Offline zones have no readable data, read-only zones can not be
+  erased and fail the step.
+
+A zone reset alone only deallocates the zone like a discard, it is not a
+compliant erasure. The fast compliant erasure of a ZNS drive is its NVMe
+sanitize or format, preferred by the planner.
+
+The zone operations are the kernel ioctls of `linux/blkzoned.h` on
+`BlockZones`, other implementations of the same methods, like a file
+backed emulation, can be given to the engine.
+"""
+import collections
+import fcntl
+import logging
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from usody_sanitize.config import settings
+from usody_sanitize.engine import OverwriteEngine
+
+logger = logging.getLogger(__name__)
+
+# linux/blkzoned.h
+BLKREPORTZONE = 0xC0101282
+BLKRESETZONE = 0x40101283
+BLK_ZONE_REP_CAPACITY = 1
+
+ZONE_TYPE_CONVENTIONAL = 1
+
+ZONE_COND_READONLY = 0xD
+ZONE_COND_OFFLINE = 0xF
+
+REPORT_HEADER = struct.Struct("=QII")
+ZONE = struct.Struct("=QQQBBBB4xQ24x")
+SECTOR_SIZE = 512
+
+# Offsets in bytes.
+Zone = collections.namedtuple(
+    "Zone", ["start", "length", "wp", "type", "cond", "capacity"])
+
+
+class BlockZones:
+    """Zone operations of a zoned block device with the kernel ioctls."""
+
+    def __init__(self, batch: int = 128):
+        self.batch = batch
+
+    def report(self, fd: int) -> List[Zone]:
+        zones = []
+        sector = 0
+        size = os.lseek(fd, 0, os.SEEK_END) // SECTOR_SIZE
+        while sector < size:
+            buffer = bytearray(REPORT_HEADER.size + self.batch * ZONE.size)
+            REPORT_HEADER.pack_into(buffer, 0, sector, self.batch, 0)
+            fcntl.ioctl(fd, BLKREPORTZONE, buffer, True)
+            _, count, flags = REPORT_HEADER.unpack_from(buffer, 0)
+            if not count:
+                break
+
+            for index in range(count):
+                start, length, wp, zone_type, cond, _, _, capacity = \
+                    ZONE.unpack_from(
+                        buffer, REPORT_HEADER.size + index * ZONE.size)
+                if not flags & BLK_ZONE_REP_CAPACITY:
+                    capacity = length
+                zones.append(Zone(
+                    start * SECTOR_SIZE, length * SECTOR_SIZE,
+                    wp * SECTOR_SIZE, zone_type, cond,
+                    capacity * SECTOR_SIZE))
+                sector = start + length
+        return zones
+
+    def reset(self, fd: int, zone: Zone) -> None:
+        fcntl.ioctl(fd, BLKRESETZONE, struct.pack(
+            "QQ", zone.start // SECTOR_SIZE, zone.length // SECTOR_SIZE))
+
+    def write(self, fd: int, data, offset: int) -> int:
+        return os.pwrite(fd, data, offset)
+
+
+class ZonedOverwriteEngine(OverwriteEngine):
+    """Overwrites a zoned device with a pattern, zone by zone.
+
+    :param str dev_path: Path to the device.
+    :param str pattern: Pattern spec, see `patterns`.
+    :param int chunk_size: Bytes written on each request.
+    :param int zones_in_flight: Zones written at the same time.
+    :param zones: Zone operations, `BlockZones` by default.
+
+    Example:
+    >>> engine = ZonedOverwriteEngine("/dev/sdb", pattern="zeros")
+    >>> await engine.run()
+    """
+
+    def __init__(
+            self,
+            dev_path: str,
+            pattern: str = "random",
+            chunk_size: int = settings.engine_chunk_size,
+            zones_in_flight: int = settings.zoned_zones_in_flight,
+            zones=None,
+    ):
+        super().__init__(dev_path, pattern=pattern, chunk_size=chunk_size)
+        self.zones_in_flight = zones_in_flight
+        self.zones = zones or BlockZones()
+        self.zones_written = 0
+
+    def _overwrite(self) -> bool:
+        try:
+            fd = self._open(self.dev_path)
+        except OSError as ex:
+            self.error = str(ex)
+            logger.error(f"{self.dev_path}: {ex}")
+            return False
+
+        try:
+            zones = self.zones.report(fd)
+            readonly = [z for z in zones if z.cond == ZONE_COND_READONLY]
+            zones = [z for z in zones
+                     if z.cond not in (ZONE_COND_READONLY, ZONE_COND_OFFLINE)]
+            self.heatmap.size = os.lseek(fd, 0, os.SEEK_END)
+            # Only the capacity of the zones is writable.
+            self.size = sum(z.capacity for z in zones)
+
+            with ThreadPoolExecutor(
+                    max_workers=self.zones_in_flight) as executor:
+                for future in [executor.submit(self._overwrite_zone, fd, z)
+                               for z in zones]:
+                    future.result()
+            os.fsync(fd)
+        except OSError as ex:
+            self.error = str(ex)
+            logger.error(f"{self.dev_path}: Zoned overwrite failed after"
+                         f" {self.bytes_written} bytes: {ex}")
+            return False
+        finally:
+            os.close(fd)
+
+        if self._cancelled.is_set():
+            self.error = "Cancelled."
+            return False
+        if readonly:
+            self.error = f"{len(readonly)} read-only zones can not be" \
+                         f" erased."
+            logger.error(f"{self.dev_path}: {self.error}")
+            return False
+        return True
+
+    def _overwrite_zone(self, fd: int, zone: Zone) -> None:
+        if self._cancelled.is_set():
+            return
+        if zone.type != ZONE_TYPE_CONVENTIONAL:
+            # The write pointer goes back to the start of the zone.
+            try:
+                self.zones.reset(fd, zone)
+            except OSError:
+                self._cancelled.set()
+                raise
+        self._overwrite_range(fd, zone.start, zone.start + zone.capacity)
+        with self._lock:
+            self.zones_written += 1
+
+    def _write(self, fd: int, data, offset: int) -> int:
+        return self.zones.write(fd, data, offset)
+